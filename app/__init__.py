@@ -2,18 +2,45 @@ from flask import Flask, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
+from app.cache import PredictionCache, UserStateCache
+from app.compression import ResponseCompression
+from app.profiling import RequestProfiler
+from app.security import LoginGuard
 
 db = SQLAlchemy()
 jwt = JWTManager()
+prediction_cache = PredictionCache()
+user_state_cache = UserStateCache()
+login_guard = LoginGuard()
+profiler = RequestProfiler()
+compression = ResponseCompression()
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    # За обратным прокси адрес клиента берется из X-Forwarded-For (ограничение входа по IP)
+    if app.config.get('PROXY_FIX_X_FOR'):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+    
+    from app.serialization import json_provider_class
+    ensure_ascii = app.config.get('JSON_ENSURE_ASCII')
+    app.json = json_provider_class(app.config.get('JSON_BACKEND', 'auto'), ensure_ascii)(app)
+    # Не задано - значение по умолчанию провайдера (экранирует только стандартный json)
+    if ensure_ascii is not None:
+        app.json.ensure_ascii = ensure_ascii
+    
+    from app.database import engine_options
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
     db.init_app(app)
     jwt.init_app(app)
-    CORS(app)
+    prediction_cache.init_app(app)
+    user_state_cache.init_app(app)
+    login_guard.init_app(app)
+    compression.init_app(app)
+    CORS(app, expose_headers=['X-Next-Cursor', 'Link', 'Server-Timing'])
     
     # Обработчики ошибок JWT
     @jwt.expired_token_loader
@@ -32,8 +59,13 @@ def create_app(config_class=Config):
     app.register_blueprint(api_bp, url_prefix='/api')
     app.register_blueprint(web_bp)
     
+    # После регистрации маршрутов и настройки JSON-провайдера
+    profiler.init_app(app)
+    
+    from app.commands import register_commands
+    register_commands(app)
+    
     with app.app_context():
         db.create_all()
     
     return app
-
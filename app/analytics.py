@@ -0,0 +1,272 @@
+from datetime import date
+from itertools import chain
+from sqlalchemy import Float, func, literal, select, union_all
+from app import db
+from app.models import Vehicle, Maintenance, Repair, MileageLog, MileageRollup
+
+try:
+    import numpy as np
+except ImportError:  # Необязательная зависимость: без нее отчеты недоступны
+    np = None
+
+# Число строк, переносимых из курсора БД в массивы за один раз
+ANALYTICS_FETCH_CHUNK_SIZE = 100000
+
+_EPOCH = date(1970, 1, 1)
+# Юлианская дата 1970-01-01 (SQLite julianday)
+_EPOCH_JULIAN_DAY = 2440587.5
+
+class AnalyticsUnavailable(RuntimeError):
+    """Отчеты недоступны: не установлен NumPy"""
+
+def _epoch_days(column):
+    """Дата колонки в виде числа дней с 1970-01-01"""
+    if db.engine.dialect.name == 'sqlite':
+        return func.julianday(column) - _EPOCH_JULIAN_DAY
+    return column - literal(_EPOCH)
+
+def fetch_columns(statement, dtypes, chunk_size=ANALYTICS_FETCH_CHUNK_SIZE):
+    """
+    Колонки результата statement в массивах NumPy (dtypes - тип каждой колонки;
+    значения должны быть числами, NULL заменяются в запросе). Строки читаются
+    порциями и сразу переносятся в массив, без объектов моделей
+    """
+    width = len(dtypes)
+    # Кортежи читаются из курсора DBAPI напрямую: колонки числовые, обработка строк SQLAlchemy
+    # не нужна. Без stream_results: буферизующая стратегия SQLAlchemy заранее читает первую строку
+    result = db.session.connection().execute(statement)
+    cursor = result.cursor
+    parts = []
+    try:
+        while rows := cursor.fetchmany(chunk_size):
+            parts.append(np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=len(rows) * width))
+    finally:
+        result.close()
+    parts = [part.reshape(-1, width) for part in parts]
+    data = np.concatenate(parts) if parts else np.empty((0, width))
+    return [data[:, i].astype(dtype) for i, dtype in enumerate(dtypes)]
+
+def _group_starts(keys):
+    """Индексы начала групп одинаковых значений в отсортированном массиве"""
+    return np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+
+def _vehicle_index(vehicle_ids, values):
+    """Позиции ТС в отсортированном vehicle_ids и маска строк, ТС которых есть в отчете"""
+    index = np.minimum(np.searchsorted(vehicle_ids, values), max(len(vehicle_ids) - 1, 0))
+    found = vehicle_ids[index] == values if len(vehicle_ids) else np.zeros(len(values), dtype=bool)
+    return index, found
+
+def _readings_statement(first_day, last_day, vehicle_filter):
+    """
+    Показания за период (как MileageReadings: журнал и крайние показания сводок) -
+    только ТС, день и пробег. Условия стоят в каждой части объединения: журнал
+    читается по индексу ix_mileage_logs_date_id_readings, без обращения к строкам таблицы
+    """
+    parts = (
+        (MileageLog.vehicle_id, MileageLog.date, MileageLog.mileage, None),
+        (MileageRollup.vehicle_id, MileageRollup.last_date, MileageRollup.last_mileage, None),
+        (MileageRollup.vehicle_id, MileageRollup.first_date, MileageRollup.first_mileage,
+         MileageRollup.first_date < MileageRollup.last_date)
+    )
+    statements = []
+    for vehicle_column, date_column, mileage_column, condition in parts:
+        statement = select(vehicle_column, _epoch_days(date_column), mileage_column)\
+            .where(date_column.between(first_day, last_day))
+        if condition is not None:
+            statement = statement.where(condition)
+        if vehicle_filter is not None:
+            statement = statement.where(vehicle_column.in_(vehicle_filter))
+        statements.append(statement)
+    return union_all(*statements)
+
+def _mileage_usage(vehicle_ids, first_day, last_day, vehicle_filter):
+    """
+    Пробег за период и число дней движения по ТС. Показания группируются по (ТС, день)
+    одной сортировкой; день считается днем движения, если максимальное показание дня
+    больше предыдущего дня с показаниями или показания дня различаются
+    """
+    count = len(vehicle_ids)
+    statement = _readings_statement(first_day, last_day, vehicle_filter)
+    vehicles, days, mileage = fetch_columns(statement, (np.int64, np.int64, np.int64))
+    vehicle, found = _vehicle_index(vehicle_ids, vehicles)
+    if not found.all():
+        vehicle, days, mileage = vehicle[found], days[found], mileage[found]
+    if not len(vehicle):
+        return np.zeros(count, dtype=np.int64), np.zeros(count, dtype=np.int64)
+    
+    span = (last_day - first_day).days + 1
+    keys = vehicle * span + (days - (first_day - _EPOCH).days)
+    order = np.argsort(keys, kind='stable')
+    keys, mileage = keys[order], mileage[order]
+    
+    starts = _group_starts(keys)
+    day_max = np.maximum.reduceat(mileage, starts)
+    day_min = np.minimum.reduceat(mileage, starts)
+    day_vehicle = keys[starts] // span
+    
+    vehicle_starts = _group_starts(day_vehicle)
+    distance = np.zeros(count, dtype=np.int64)
+    distance[day_vehicle[vehicle_starts]] = (
+        np.maximum.reduceat(day_max, vehicle_starts) - np.minimum.reduceat(day_min, vehicle_starts)
+    )
+    
+    moved = day_max > day_min
+    moved[1:] |= (day_vehicle[1:] == day_vehicle[:-1]) & (day_max[1:] > day_max[:-1])
+    active_days = np.bincount(day_vehicle, weights=moved, minlength=count).astype(np.int64)
+    return distance, active_days
+
+def _downtime_days(vehicle, start, end, first, last, count):
+    """
+    Дни простоя в ремонте по ТС: объединение интервалов ремонтов [start, end],
+    обрезанных периодом [first, last] (пересекающиеся ремонты не суммируются)
+    """
+    start, end = np.maximum(start, first), np.minimum(end, last)
+    valid = start <= end
+    vehicle, start, end = vehicle[valid], start[valid], end[valid]
+    if not len(vehicle):
+        return np.zeros(count, dtype=np.int64)
+    
+    order = np.lexsort((start, vehicle))
+    vehicle, start, end = vehicle[order], start[order], end[order]
+    # Сдвиг по номеру ТС: интервалы разных ТС не пересекаются, накопленный максимум
+    # конца ремонта вычисляется одним проходом по всем ТС
+    offset = vehicle * (last - first + 2)
+    start, end = start + offset, end + offset
+    covered_until = np.maximum.accumulate(end)
+    previous = np.concatenate(([start[0] - 1], covered_until[:-1]))
+    days = np.clip(end - np.maximum(start, previous + 1) + 1, 0, None)
+    return np.bincount(vehicle, weights=days, minlength=count).astype(np.int64)
+
+def _ratio(numerator, denominator, digits):
+    """Поэлементное отношение с None при нулевом знаменателе"""
+    return [
+        round(n / d, digits) if d else None
+        for n, d in zip(np.asarray(numerator).tolist(), np.asarray(denominator).tolist())
+    ]
+
+def _month_label(month):
+    return str(np.datetime64(int(month), 'M'))
+
+def fleet_report(first_day, last_day, vehicle_type=None):
+    """
+    Отчет по затратам и использованию парка за период [first_day, last_day]
+    (vehicle_type - только ТС этого типа). Столбцы журнала пробега (с показаниями сводок),
+    ТО и ремонтов выгружаются в массивы NumPy, группировка по ТС, типу и месяцу - векторная:
+    - по ТС: пробег за период, затраты на ТО и ремонты, стоимость километра,
+      дни движения, простоя в ремонте и доступности (с даты покупки, без простоя),
+      использование - доля дней движения среди дней доступности;
+    - по типам ТС - те же суммы и показатели;
+    - помесячные расходы на ТО (по дате ТО) и ремонты (по дате начала ремонта)
+    """
+    if np is None:
+        raise AnalyticsUnavailable('Fleet analytics requires the numpy package')
+    
+    vehicle_query = select(
+        Vehicle.id, Vehicle.reg_number, Vehicle.brand, Vehicle.model, Vehicle.vehicle_type, Vehicle.purchase_date
+    ).order_by(Vehicle.id)
+    vehicle_filter = None
+    if vehicle_type is not None:
+        vehicle_query = vehicle_query.where(Vehicle.vehicle_type == vehicle_type)
+        vehicle_filter = select(Vehicle.id).where(Vehicle.vehicle_type == vehicle_type).scalar_subquery()
+    vehicles = db.session.execute(vehicle_query).all()
+    count = len(vehicles)
+    vehicle_ids = np.array([v.id for v in vehicles], dtype=np.int64)
+    first, last = (first_day - _EPOCH).days, (last_day - _EPOCH).days
+    
+    distance, active_days = _mileage_usage(vehicle_ids, first_day, last_day, vehicle_filter)
+    
+    statement = select(
+        Maintenance.vehicle_id, _epoch_days(Maintenance.date), func.coalesce(Maintenance.cost, 0).cast(Float)
+    ).where(Maintenance.date.between(first_day, last_day))
+    if vehicle_filter is not None:
+        statement = statement.where(Maintenance.vehicle_id.in_(vehicle_filter))
+    maintenance_vehicles, maintenance_days, maintenance_cost = fetch_columns(statement, (np.int64, np.int64, np.float64))
+    maintenance_vehicle, found = _vehicle_index(vehicle_ids, maintenance_vehicles)
+    maintenance_vehicle, maintenance_days, maintenance_cost = (
+        maintenance_vehicle[found], maintenance_days[found], maintenance_cost[found]
+    )
+    
+    # Ремонты, пересекающие период: простой считается по всем, затраты - по начатым в периоде
+    statement = select(
+        Repair.vehicle_id, _epoch_days(Repair.start_date),
+        _epoch_days(func.coalesce(Repair.end_date, last_day)), func.coalesce(Repair.cost, 0).cast(Float)
+    ).where(Repair.start_date <= last_day, func.coalesce(Repair.end_date, last_day) >= first_day)
+    if vehicle_filter is not None:
+        statement = statement.where(Repair.vehicle_id.in_(vehicle_filter))
+    repair_vehicles, repair_start, repair_end, repair_cost = fetch_columns(
+        statement, (np.int64, np.int64, np.int64, np.float64)
+    )
+    repair_vehicle, found = _vehicle_index(vehicle_ids, repair_vehicles)
+    repair_vehicle, repair_start, repair_end, repair_cost = (
+        repair_vehicle[found], repair_start[found], repair_end[found], repair_cost[found]
+    )
+    started_in_period = repair_start >= first
+    
+    maintenance_total = np.bincount(maintenance_vehicle, weights=maintenance_cost, minlength=count)
+    repair_total = np.bincount(repair_vehicle[started_in_period], weights=repair_cost[started_in_period],
+                               minlength=count)
+    downtime = _downtime_days(repair_vehicle, repair_start, repair_end, first, last, count)
+    purchase = np.array([(v.purchase_date - _EPOCH).days for v in vehicles], dtype=np.int64)
+    available = np.clip(last - np.maximum(purchase, first) + 1 - downtime, 0, None)
+    
+    def summary(distance, maintenance_cost, repair_cost, active, downtime, available):
+        # bincount по пустому массиву возвращает целые - суммы приводятся к float
+        maintenance_cost, repair_cost = maintenance_cost.astype(np.float64), repair_cost.astype(np.float64)
+        cost = maintenance_cost + repair_cost
+        return {
+            'distance_km': np.asarray(distance).tolist(),
+            'maintenance_cost': np.round(maintenance_cost, 2).tolist(),
+            'repair_cost': np.round(repair_cost, 2).tolist(),
+            'total_cost': np.round(cost, 2).tolist(),
+            'cost_per_km': _ratio(cost, distance, 2),
+            'active_days': np.asarray(active).tolist(),
+            'downtime_days': np.asarray(downtime).tolist(),
+            'available_days': np.asarray(available).tolist(),
+            'utilization': _ratio(active, available, 4)
+        }
+    
+    def rows(columns, **labels):
+        names = list(labels) + list(columns)
+        return [dict(zip(names, values)) for values in zip(*labels.values(), *columns.values())]
+    
+    by_vehicle = summary(distance, maintenance_total, repair_total, active_days, downtime, available)
+    
+    types = sorted({v.vehicle_type for v in vehicles}, key=lambda t: t.value)
+    type_index = np.array([types.index(v.vehicle_type) for v in vehicles], dtype=np.int64)
+    
+    def by_type(values):
+        return np.bincount(type_index, weights=values, minlength=len(types)) if count else np.zeros(0)
+    
+    type_summary = summary(
+        by_type(distance).astype(np.int64), by_type(maintenance_total), by_type(repair_total),
+        by_type(active_days).astype(np.int64), by_type(downtime).astype(np.int64), by_type(available).astype(np.int64)
+    )
+    type_summary['vehicles'] = np.bincount(type_index, minlength=len(types)).tolist() if count else []
+    
+    # Месяцы периода - номера месяцев с 1970-01 (datetime64[M])
+    first_month = int(np.datetime64(first_day, 'M').astype(np.int64))
+    months = int(np.datetime64(last_day, 'M').astype(np.int64)) - first_month + 1
+    
+    def monthly(days, cost):
+        month = np.asarray(days, dtype='datetime64[D]').astype('datetime64[M]').astype(np.int64) - first_month
+        return np.bincount(month, weights=cost, minlength=months).astype(np.float64)
+    
+    monthly_maintenance = monthly(maintenance_days, maintenance_cost)
+    monthly_repairs = monthly(repair_start[started_in_period], repair_cost[started_in_period])
+    
+    total = summary(*(
+        np.array([values.sum()]) for values in (distance, maintenance_total, repair_total, active_days, downtime, available)
+    ))
+    return {
+        'period': {'date_from': first_day.isoformat(), 'date_to': last_day.isoformat(), 'days': last - first + 1},
+        'vehicles': rows(by_vehicle, vehicle_id=vehicle_ids.tolist(), reg_number=[v.reg_number for v in vehicles],
+                         brand=[v.brand for v in vehicles], model=[v.model for v in vehicles],
+                         vehicle_type=[v.vehicle_type.value for v in vehicles]),
+        'vehicle_types': rows(type_summary, vehicle_type=[t.value for t in types]),
+        'monthly': [
+            {'month': _month_label(first_month + i), 'maintenance_cost': round(m, 2), 'repair_cost': round(r, 2),
+             'total_cost': round(m + r, 2)}
+            for i, (m, r) in enumerate(zip(monthly_maintenance.tolist(), monthly_repairs.tolist()))
+        ],
+        'totals': {'vehicles': count, **{name: values[0] for name, values in total.items()}}
+    }
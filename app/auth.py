@@ -0,0 +1,44 @@
+from functools import wraps
+from flask import g, jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity
+from app import db, user_state_cache
+from app.models import User, UserRole
+
+def _load_user_state(user_id):
+    row = db.session.query(User.is_active, User.role).filter(User.id == user_id).first()
+    return (bool(row.is_active), row.role.value) if row else None
+
+def roles_required(*roles):
+    """
+    Декоратор маршрута: действительный JWT и одна из ролей roles.
+    Роль берется из claims токена (выдается при входе), состояние учетной записи -
+    из кэша UserStateCache: отключенный пользователь или смена роли учитываются не
+    позже чем через USER_STATE_CACHE_TTL секунд, без запроса к БД на каждый вызов.
+    ID и роль текущего пользователя доступны в g.user_id и g.user_role
+    """
+    allowed = {role.value for role in roles}
+    denied_message = 'Admin access required' if allowed == {UserRole.ADMIN.value} else 'Access denied'
+    
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            verify_jwt_in_request()
+            # Быстрый отказ по claims, без обращения к кэшу
+            claimed_role = get_jwt().get('role')
+            if claimed_role is not None and claimed_role not in allowed:
+                return jsonify({'error': denied_message}), 403
+            
+            user_id = int(get_jwt_identity())
+            state = user_state_cache.get(user_id, _load_user_state)
+            if state is None or not state[0]:
+                return jsonify({'error': 'User is inactive or does not exist'}), 401
+            
+            # Роль могла измениться после выдачи токена
+            if state[1] not in allowed:
+                return jsonify({'error': denied_message}), 403
+            
+            g.user_id = user_id
+            g.user_role = UserRole(state[1])
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
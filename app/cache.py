@@ -0,0 +1,218 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from importlib import import_module
+from flask import current_app
+
+try:
+    import redis
+except ImportError:  # Необязательная зависимость: нужна только для RedisCacheBackend
+    redis = None
+
+class MemoryCacheBackend:
+    """
+    Внутрипроцессное хранилище с TTL и вытеснением давно неиспользуемых записей (LRU).
+    Другое хранилище (например, общее RedisCacheBackend) должно реализовать
+    те же методы: get_many, set, delete, clear
+    """
+    
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get_many(self, keys):
+        now = time.monotonic()
+        result = {}
+        with self._lock:
+            for key in keys:
+                item = self._data.get(key)
+                if item is None:
+                    continue
+                expires_at, value = item
+                if expires_at <= now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                result[key] = value
+        return result
+    
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+    
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self):
+        return len(self._data)
+
+class RedisCacheBackend:
+    """
+    Общее для процессов сервера хранилище в Redis (PREDICTION_CACHE_URL): удаление
+    записи при изменении данных сразу видно всем процессам. Размер ограничивается
+    политикой вытеснения Redis (maxmemory-policy allkeys-lru), max_size не используется.
+    Недоступность Redis не прерывает запросы: чтение считается промахом
+    """
+    
+    def __init__(self, max_size=None, url=None, prefix='fleet:'):
+        if redis is None:
+            raise RuntimeError('RedisCacheBackend requires the redis package')
+        self.client = redis.Redis.from_url(url or 'redis://localhost:6379/0')
+        self.prefix = prefix
+    
+    def get_many(self, keys):
+        if not keys:
+            return {}
+        try:
+            values = self.client.mget([self.prefix + key for key in keys])
+        except redis.RedisError:
+            current_app.logger.warning('Prediction cache is unavailable', exc_info=True)
+            return {}
+        return {key: pickle.loads(value) for key, value in zip(keys, values) if value is not None}
+    
+    def set(self, key, value, ttl):
+        try:
+            self.client.set(self.prefix + key, pickle.dumps(value), px=max(int(ttl * 1000), 1))
+        except redis.RedisError:
+            current_app.logger.warning('Prediction cache is unavailable', exc_info=True)
+    
+    def delete(self, key):
+        try:
+            self.client.delete(self.prefix + key)
+        except redis.RedisError:
+            # Запись устареет не позже чем через PREDICTION_CACHE_TTL
+            current_app.logger.warning('Could not invalidate prediction cache entry %s', key, exc_info=True)
+    
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*', count=1000))
+        for start in range(0, len(keys), 1000):
+            self.client.delete(*keys[start:start + 1000])
+
+def _seconds_until_midnight():
+    now = datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (midnight - now).total_seconds()
+
+class PredictionCache:
+    """
+    Кэш прогнозов ТО по ID транспортного средства.
+    Записи живут не дольше PREDICTION_CACHE_TTL секунд и истекают на границе суток,
+    так как прогноз зависит от текущей даты. Запись ТС удаляется при изменении его
+    данных (invalidate) - во всех процессах только с общим хранилищем
+    """
+    
+    def __init__(self, app=None):
+        self.backend = MemoryCacheBackend()
+        self.ttl = 300
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.ttl = app.config.get('PREDICTION_CACHE_TTL', 300)
+        self.enabled = app.config.get('PREDICTION_CACHE_ENABLED', True)
+        max_size = app.config.get('PREDICTION_CACHE_MAX_SIZE', 10000)
+        
+        backend = app.config.get('PREDICTION_CACHE_BACKEND', 'app.cache.MemoryCacheBackend')
+        if isinstance(backend, str):
+            module_name, class_name = backend.rsplit('.', 1)
+            backend = getattr(import_module(module_name), class_name)
+        options = {'max_size': max_size}
+        if app.config.get('PREDICTION_CACHE_URL'):
+            options['url'] = app.config['PREDICTION_CACHE_URL']
+        self.backend = backend(**options)
+        app.extensions['prediction_cache'] = self
+    
+    @staticmethod
+    def _key(vehicle_id):
+        return f'prediction:{vehicle_id}'
+    
+    def get_many(self, vehicle_ids):
+        """Возвращает {vehicle_id: значение} для найденных в кэше записей"""
+        vehicle_ids = list(vehicle_ids)
+        if not self.enabled:
+            found = {}
+        else:
+            cached = self.backend.get_many([self._key(v) for v in vehicle_ids])
+            found = {v: cached[self._key(v)] for v in vehicle_ids if self._key(v) in cached}
+        
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(vehicle_ids) - len(found)
+        return found
+    
+    def set(self, vehicle_id, value):
+        if not self.enabled:
+            return
+        ttl = min(self.ttl, _seconds_until_midnight())
+        self.backend.set(self._key(vehicle_id), value, ttl)
+    
+    def invalidate(self, vehicle_id):
+        self.backend.delete(self._key(vehicle_id))
+    
+    def clear(self):
+        self.backend.clear()
+    
+    def stats(self):
+        """Счетчики попаданий и промахов"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0
+            }
+
+class UserStateCache:
+    """
+    Кэш состояния пользователей (активен ли, роль) по ID для проверки прав
+    без запроса к БД на каждый запрос. Изменения учетной записи в другом процессе
+    становятся видны не позже чем через USER_STATE_CACHE_TTL секунд
+    """
+    
+    def __init__(self, app=None):
+        self.backend = MemoryCacheBackend()
+        self.ttl = 30
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.ttl = app.config.get('USER_STATE_CACHE_TTL', 30)
+        self.backend = MemoryCacheBackend(max_size=app.config.get('USER_STATE_CACHE_MAX_SIZE', 10000))
+        app.extensions['user_state_cache'] = self
+    
+    def get(self, user_id, loader):
+        """
+        (is_active, role) пользователя; при промахе вызывается loader(user_id).
+        Отсутствующие пользователи (None) не кэшируются
+        """
+        key = f'user:{user_id}'
+        if self.ttl:
+            cached = self.backend.get_many([key])
+            if key in cached:
+                return cached[key]
+        
+        state = loader(user_id)
+        if state is not None and self.ttl:
+            self.backend.set(key, state, self.ttl)
+        return state
+    
+    def invalidate(self, user_id):
+        self.backend.delete(f'user:{user_id}')
+    
+    def clear(self):
+        self.backend.clear()
@@ -0,0 +1,72 @@
+import click
+from app import db, prediction_cache
+from app.utils import rebuild_mileage_stats
+from app.notifications import drain_outbox, run_outbox_worker
+from app.reminders import run_maintenance_reminders
+from app.mileage_rollup import rollup_mileage_logs, partition_mileage_logs
+from app.schema import upgrade_indexes
+import threading
+
+def register_commands(app):
+    """
+    Регистрация CLI-команд приложения (flask --app run <команда>)
+    """
+    @app.cli.command('rebuild-mileage-stats')
+    @click.option('--vehicle-id', 'vehicle_ids', type=int, multiple=True,
+                  help='ID транспортного средства (можно указать несколько раз)')
+    def rebuild_mileage_stats_command(vehicle_ids):
+        """Пересчет статистики пробега по полной истории журнала"""
+        count = rebuild_mileage_stats(list(vehicle_ids) or None)
+        db.session.commit()
+        prediction_cache.clear()
+        click.echo(f"Статистика пробега пересчитана для {count} ТС")
+    
+    @app.cli.command('process-outbox')
+    @click.option('--loop', is_flag=True, help='Работать постоянно, опрашивая очередь')
+    def process_outbox_command(loop):
+        """Отправка писем из очереди уведомлений"""
+        if loop:
+            run_outbox_worker(app, threading.Event())
+            return
+        counts = drain_outbox()
+        click.echo(f"Отправлено: {counts['sent']}, отложено: {counts['retried']}, не доставлено: {counts['dead']}")
+    
+    @app.cli.command('send-maintenance-reminders')
+    @click.option('--drain', is_flag=True, help='Сразу отправить поставленные в очередь письма')
+    def send_maintenance_reminders_command(drain):
+        """Напоминания о ТО для ТС, перешедших в статусы warning/urgent"""
+        counts = run_maintenance_reminders()
+        click.echo(f"ТС: {counts['vehicles']}, смен статуса: {counts['transitions']}, писем в очереди: {counts['reminders']}")
+        if drain:
+            sent = drain_outbox()
+            click.echo(f"Отправлено: {sent['sent']}, отложено: {sent['retried']}, не доставлено: {sent['dead']}")
+    
+    @app.cli.command('rollup-mileage-logs')
+    def rollup_mileage_logs_command():
+        """Свертка старых записей журнала пробега в дневные и месячные сводки"""
+        counts = rollup_mileage_logs()
+        if not app.config.get('MILEAGE_RAW_RETENTION_DAYS'):
+            click.echo('MILEAGE_RAW_RETENTION_DAYS не задан: журнал хранится без свертки')
+            return
+        click.echo(f"Дневных сводок: {counts['daily']}, месячных: {counts['monthly']}, "
+                   f"удалено записей: {counts['deleted']}, пересчитана статистика {counts['rebuilt']} ТС")
+    
+    @app.cli.command('partition-mileage-logs')
+    def partition_mileage_logs_command():
+        """Перевод журнала пробега в секционированную по дате таблицу (PostgreSQL)"""
+        try:
+            partitions = partition_mileage_logs()
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"Секций журнала пробега: {partitions}")
+    
+    @app.cli.command('upgrade-indexes')
+    @click.option('--keep-legacy', is_flag=True, help='Не удалять замененные индексы')
+    def upgrade_indexes_command(keep_legacy):
+        """
+        Создание индексов, объявленных в моделях, в существующей БД. В секционированном
+        журнале пробега индекс строится в каждой секции и присоединяется к таблице
+        """
+        created, dropped = upgrade_indexes(drop_legacy=not keep_legacy)
+        click.echo(f"Создано индексов: {len(created)} {', '.join(created)}")
+        click.echo(f"Удалено индексов: {len(dropped)} {', '.join(dropped)}")
@@ -0,0 +1,114 @@
+import gzip
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # Необязательная зависимость: без нее ответы сжимаются только gzip
+    brotli = None
+
+# Типы ответов, которые имеет смысл сжимать (XLSX и PDF уже сжаты)
+COMPRESSIBLE_MIMETYPES = (
+    'application/json', 'application/x-ndjson', 'text/csv', 'text/html', 'text/plain',
+    'text/css', 'text/javascript', 'application/javascript'
+)
+
+class ResponseCompression:
+    """
+    Сжатие ответов gzip или brotli (br) по заголовку Accept-Encoding клиента.
+    Алгоритмы перебираются в порядке COMPRESSION_ENCODINGS, выбирается первый
+    с наибольшим q. Ответы меньше COMPRESSION_MIN_SIZE байт не сжимаются; потоковые
+    ответы (stream_with_context) сжимаются по мере генерации, каждая порция
+    сбрасывается клиенту сразу. ETag ответа, для которого согласовано сжатие, становится
+    слабым (и когда короткое тело не сжато): представления с разным Content-Encoding
+    семантически равны, а валидатор не зависит от размера ответа
+    """
+    
+    def __init__(self, app=None):
+        self.enabled = True
+        self.encodings = ('br', 'gzip')
+        self.gzip_level = 6
+        self.brotli_level = 4
+        self.min_size = 1024
+        self.mimetypes = frozenset(COMPRESSIBLE_MIMETYPES)
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESSION_ENABLED', True)
+        encodings = app.config.get('COMPRESSION_ENCODINGS', ('br', 'gzip'))
+        self.encodings = tuple(e for e in encodings if e == 'gzip' or (e == 'br' and brotli is not None))
+        self.gzip_level = app.config.get('COMPRESSION_GZIP_LEVEL', 6)
+        self.brotli_level = app.config.get('COMPRESSION_BROTLI_LEVEL', 4)
+        self.min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+        self.mimetypes = frozenset(app.config.get('COMPRESSION_MIMETYPES', COMPRESSIBLE_MIMETYPES))
+        app.after_request(self._compress_response)
+        app.extensions['compression'] = self
+    
+    def negotiate(self, accept_encodings):
+        """Алгоритм сжатия для заголовка Accept-Encoding или None"""
+        best, best_quality = None, 0
+        for encoding in self.encodings:
+            quality = accept_encodings[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+    
+    def weak_etag(self, mimetype):
+        """Согласовано ли сжатие ответа этого типа для текущего запроса (ETag станет слабым)"""
+        return (self.enabled and mimetype in self.mimetypes
+                and self.negotiate(request.accept_encodings) is not None)
+    
+    def compress(self, encoding, data):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_level)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+    
+    def _compressor(self, encoding):
+        """(сжать порцию со сбросом, завершить поток)"""
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_level)
+            return lambda chunk: compressor.process(chunk) + compressor.flush(), compressor.finish
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)  # 31 - формат gzip
+        return lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+    
+    def _compress_stream(self, encoding, chunks, source):
+        compress, finish = self._compressor(encoding)
+        try:
+            for chunk in chunks:
+                if chunk:
+                    yield compress(chunk)
+            yield finish()
+        finally:
+            # Закрытие исходного итератора (stream_with_context) освобождает контекст и соединение с БД
+            close = getattr(source, 'close', None)
+            if close is not None:
+                close()
+    
+    def _compress_response(self, response):
+        if not self.enabled or response.mimetype not in self.mimetypes:
+            return response
+        response.vary.add('Accept-Encoding')
+        if (response.direct_passthrough or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+        encoding = self.negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        
+        if response.is_streamed:
+            # Размер заранее неизвестен - потоковые ответы сжимаются всегда
+            response.response = self._compress_stream(encoding, response.iter_encoded(), response.response)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(self.compress(encoding, data))
+        
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,54 @@
+import sqlite3
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+def engine_options(config):
+    """
+    Параметры движка SQLAlchemy для процесса (рабочего процесса сервера) по
+    настройкам DB_*: пул соединений, проверка соединения перед выдачей из пула,
+    пересоздание старых соединений, ограничение времени выполнения запроса
+    (PostgreSQL) и ожидания блокировки (SQLite)
+    """
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    backend = url.get_backend_name()
+    options = {
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+    }
+    
+    # Пул для SQLite в памяти выбирает Flask-SQLAlchemy
+    if backend != 'sqlite' or url.database not in (None, '', ':memory:'):
+        options['pool_size'] = config.get('DB_POOL_SIZE', 5)
+        options['max_overflow'] = config.get('DB_MAX_OVERFLOW', 10)
+        options['pool_timeout'] = config.get('DB_POOL_TIMEOUT', 30)
+    
+    if backend == 'sqlite':
+        # Соединения пула переходят между потоками сервера
+        options['connect_args'] = {'check_same_thread': False}
+    elif backend == 'postgresql':
+        connect_args = {'connect_timeout': config.get('DB_CONNECT_TIMEOUT', 10)}
+        statement_timeout = config.get('DB_STATEMENT_TIMEOUT_MS', 0)
+        if statement_timeout:
+            connect_args['options'] = f'-c statement_timeout={statement_timeout}'
+        options['connect_args'] = connect_args
+    return options
+
+@event.listens_for(Engine, 'connect')
+def _configure_sqlite(dbapi_connection, connection_record):
+    """
+    SQLite: журнал WAL (читатели не блокируются записью), ожидание блокировки
+    вместо немедленной ошибки database is locked
+    """
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    config = current_app.config if has_app_context() else {}
+    
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}")
+        if config.get('SQLITE_WAL', True):
+            cursor.execute('PRAGMA journal_mode = WAL')
+            cursor.execute('PRAGMA synchronous = NORMAL')
+    finally:
+        cursor.close()
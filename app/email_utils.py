@@ -1,118 +1,297 @@
+import base64
+import os
+import queue
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.header import Header
+from email.utils import formatdate, make_msgid
+from functools import lru_cache
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 from flask import current_app
 from datetime import date
 
+class EmailNotConfigured(Exception):
+    """SMTP не настроен (нет SMTP_HOST или SMTP_USER)"""
+
+# Шаблоны писем компилируются один раз при первом обращении и хранятся в памяти процесса.
+# Окружение не зависит от контекста приложения и доступно фоновым обработчикам
+EMAIL_TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), 'templates', 'email')
+
+_email_env = Environment(
+    loader=FileSystemLoader(EMAIL_TEMPLATES_DIR),
+    autoescape=select_autoescape(['html']),
+    trim_blocks=True,
+    lstrip_blocks=True,
+    auto_reload=False
+)
+
+@lru_cache(maxsize=None)
+def get_email_template(name):
+    """Скомпилированный шаблон письма из app/templates/email"""
+    return _email_env.get_template(name)
+
+def render_email(name, **context):
+    """
+    Рендеринг шаблона письма. В HTML-шаблонах значения экранируются автоматически
+    """
+    return get_email_template(name).render(**context)
+
+# Граница содержит '-', которого нет в алфавите base64, поэтому не встречается в теле письма
+MIME_BOUNDARY = '===============fleet-notification=='
+MIME_LINE_LENGTH = 76
+
+_MIME_HEAD = (
+    f'Content-Type: multipart/alternative; boundary="{MIME_BOUNDARY}"\r\n'
+    'MIME-Version: 1.0\r\n'
+)
+_MIME_PART_HEAD = (
+    f'--{MIME_BOUNDARY}\r\n'
+    'Content-Type: text/{subtype}; charset="utf-8"\r\n'
+    'MIME-Version: 1.0\r\n'
+    'Content-Transfer-Encoding: base64\r\n\r\n'
+)
+_MIME_TAIL = f'--{MIME_BOUNDARY}--\r\n'
+
+def _mime_header(value):
+    # Перевод строки в значении начал бы новый заголовок
+    value = value.replace('\r', ' ').replace('\n', ' ')
+    if value.isascii():
+        return value
+    return Header(value, 'utf-8').encode(linesep='\r\n')
+
+@lru_cache(maxsize=None)
+def _local_domain():
+    return socket.getfqdn()
+
+def _message_id(from_email):
+    """Message-ID с доменом отправителя (без домена в адресе - имя хоста, определяется один раз)"""
+    _, at, domain = from_email.rpartition('@')
+    return make_msgid(domain=domain if at and domain else _local_domain())
+
+@lru_cache(maxsize=256)
+def _mime_part(subtype, body):
+    """
+    Закодированная часть письма. Кэшируется: при рассылке одного текста
+    нескольким получателям тело кодируется один раз
+    """
+    payload = base64.b64encode(body.encode('utf-8')).decode('ascii')
+    lines = '\r\n'.join(payload[i:i + MIME_LINE_LENGTH] for i in range(0, len(payload), MIME_LINE_LENGTH))
+    return _MIME_PART_HEAD.format(subtype=subtype) + lines + '\r\n'
+
+def build_mime_message(from_email, to_email, subject, body_html, body_text=None):
+    """
+    Сборка письма multipart/alternative в готовом для SMTP виде (str, только ASCII).
+    Заголовки и разделители частей заранее собраны, для каждого письма
+    подставляются только адреса, тема, дата, Message-ID и закодированные тела.
+    Адрес с переводом строки отклоняется (ValueError)
+    """
+    for address in (from_email, to_email):
+        if '\r' in address or '\n' in address:
+            raise ValueError(f'Invalid email address: {address!r}')
+    return ''.join((
+        _MIME_HEAD,
+        'Date: ', formatdate(localtime=True), '\r\n',
+        'Message-ID: ', _message_id(from_email), '\r\n',
+        'Subject: ', _mime_header(subject), '\r\n',
+        'From: ', _mime_header(from_email), '\r\n',
+        'To: ', _mime_header(to_email), '\r\n\r\n',
+        _mime_part('plain', body_text) if body_text else '',
+        _mime_part('html', body_html),
+        _MIME_TAIL
+    ))
+
+class SMTPSender:
+    """
+    Пул авторизованных SMTP-соединений для массовой отправки.
+    Каждое соединение используется для множества писем (без повторных
+    TLS-рукопожатий и авторизации), при обрыве соединение переоткрывается
+    """
+    
+    # Ошибки соединения, после которых письмо отправляется повторно через новое соединение
+    RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+    # Отказы сервера по конкретному письму, после которых соединение остается рабочим
+    MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+    
+    def __init__(self, host, port, user, password='', use_tls=True, timeout=30,
+                 pool_size=2, max_messages_per_connection=100):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_messages_per_connection = max_messages_per_connection
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+    
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        if not all([config.get('SMTP_HOST'), config.get('SMTP_USER')]):
+            raise EmailNotConfigured('Email not configured')
+        options = {
+            'pool_size': config.get('SMTP_POOL_SIZE', 2),
+            'max_messages_per_connection': config.get('SMTP_MAX_MESSAGES_PER_CONNECTION', 100)
+        }
+        options.update(kwargs)
+        return cls(
+            config.get('SMTP_HOST'), config.get('SMTP_PORT'), config.get('SMTP_USER'),
+            config.get('SMTP_PASSWORD'), config.get('SMTP_USE_TLS', True), config.get('SMTP_TIMEOUT', 30),
+            **options
+        )
+    
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        server.sent_count = 0
+        return server
+    
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+    
+    def _release(self, server, broken=False):
+        if broken or server.sent_count >= self.max_messages_per_connection:
+            self._quit(server)
+        else:
+            self._idle.put(server)
+        self._slots.release()
+    
+    @staticmethod
+    def _quit(server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+    
+    def send(self, to_email, subject, body_html, body_text=None):
+        """Отправка одного письма через соединение из пула; при ошибке выбрасывает исключение"""
+        msg = build_mime_message(self.user, to_email, subject, body_html, body_text)
+        server = self._acquire()
+        try:
+            try:
+                server.sendmail(self.user, [to_email], msg)
+            except self.RECONNECT_ERRORS:
+                # Соединение из пула закрыто сервером - повторяем через новое
+                self._quit(server)
+                server = self._connect()
+                server.sendmail(self.user, [to_email], msg)
+        except BaseException as e:
+            self._release(server, broken=not isinstance(e, self.MESSAGE_ERRORS))
+            raise
+        server.sent_count += 1
+        self._release(server)
+    
+    def send_bulk(self, messages):
+        """
+        Массовая отправка: messages - список (to_email, subject, body_html, body_text).
+        Письма распределяются по соединениям пула. Возвращает список той же длины:
+        None для доставленного письма или исключение для недоставленного
+        """
+        def send_one(message):
+            try:
+                self.send(*message)
+            except Exception as e:
+                return e
+            return None
+        
+        messages = list(messages)
+        if self.pool_size <= 1 or len(messages) <= 1:
+            return [send_one(message) for message in messages]
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            return list(executor.map(send_one, messages))
+    
+    def close(self):
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                return
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+def deliver_email(to_email, subject, body_html, body_text=None):
+    """
+    Отправка email через SMTP; при ошибке выбрасывает исключение.
+    STARTTLS выполняется при SMTP_USE_TLS, авторизация - при заданном SMTP_PASSWORD
+    """
+    with SMTPSender.from_config(current_app.config, pool_size=1) as sender:
+        sender.send(to_email, subject, body_html, body_text)
+
 def send_email(to_email, subject, body_html, body_text=None):
     """
     Отправка email через SMTP
     """
     try:
-        smtp_host = current_app.config.get('SMTP_HOST')
-        smtp_port = current_app.config.get('SMTP_PORT')
-        smtp_user = current_app.config.get('SMTP_USER')
-        smtp_password = current_app.config.get('SMTP_PASSWORD')
-        
-        if not all([smtp_host, smtp_user, smtp_password]):
-            print(f"Email not configured. Would send to {to_email}: {subject}")
-            return False
-        
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = smtp_user
-        msg['To'] = to_email
-        
-        if body_text:
-            msg.attach(MIMEText(body_text, 'plain'))
-        msg.attach(MIMEText(body_html, 'html'))
-        
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.send_message(msg)
-        
+        deliver_email(to_email, subject, body_html, body_text)
         return True
+    except EmailNotConfigured:
+        print(f"Email not configured. Would send to {to_email}: {subject}")
+        return False
     except Exception as e:
         print(f"Error sending email: {e}")
         return False
 
-def send_maintenance_notification(user_email, vehicle, maintenance_date, days_remaining):
+def build_maintenance_notification(vehicle, maintenance_date, days_remaining):
     """
-    Отправка уведомления о предстоящем ТО
+    Тема и тело уведомления о предстоящем ТО: (subject, body_html, body_text)
     """
     subject = f"Напоминание: ТО для {vehicle.brand} {vehicle.model} ({vehicle.reg_number})"
     
-    color = '#F39C12' if days_remaining > 7 else '#E74C3C'
-    status_text = 'требуется в ближайшее время' if days_remaining <= 7 else 'приближается'
-    
-    body_html = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; background-color: #ECF0F1; padding: 20px;">
-        <div style="max-width: 600px; margin: 0 auto; background-color: #FFFFFF; padding: 30px; border-radius: 5px;">
-            <h2 style="color: #2C3E50; margin-top: 0;">Уведомление о техническом обслуживании</h2>
-            <p style="color: #2C3E50;">Техническое обслуживание {status_text} для следующего транспортного средства:</p>
-            <div style="background-color: #ECF0F1; padding: 15px; border-radius: 5px; margin: 20px 0;">
-                <p style="margin: 5px 0;"><strong>Марка/Модель:</strong> {vehicle.brand} {vehicle.model}</p>
-                <p style="margin: 5px 0;"><strong>Гос. номер:</strong> {vehicle.reg_number}</p>
-                <p style="margin: 5px 0;"><strong>VIN:</strong> {vehicle.vin}</p>
-                <p style="margin: 5px 0;"><strong>Текущий пробег:</strong> {vehicle.current_mileage:,} км</p>
-            </div>
-            <div style="background-color: {color}; color: #FFFFFF; padding: 15px; border-radius: 5px; margin: 20px 0;">
-                <p style="margin: 5px 0; font-size: 18px;"><strong>Дата ТО:</strong> {maintenance_date}</p>
-                <p style="margin: 5px 0;"><strong>Осталось дней:</strong> {days_remaining}</p>
-            </div>
-            <p style="color: #7F8C8D; font-size: 12px; margin-top: 30px;">
-                Это автоматическое уведомление от системы управления автопарком.
-            </p>
-        </div>
-    </body>
-    </html>
-    """
-    
-    body_text = f"""
-    Уведомление о техническом обслуживании
-    
-    Техническое обслуживание {status_text} для:
-    Марка/Модель: {vehicle.brand} {vehicle.model}
-    Гос. номер: {vehicle.reg_number}
-    VIN: {vehicle.vin}
-    Текущий пробег: {vehicle.current_mileage:,} км
-    
-    Дата ТО: {maintenance_date}
-    Осталось дней: {days_remaining}
-    """
-    
-    return send_email(user_email, subject, body_html, body_text)
+    context = {
+        'vehicle': vehicle,
+        'maintenance_date': maintenance_date,
+        'days_remaining': days_remaining,
+        'current_mileage': f'{vehicle.current_mileage:,}',
+        'color': '#F39C12' if days_remaining > 7 else '#E74C3C',
+        'status_text': 'требуется в ближайшее время' if days_remaining <= 7 else 'приближается'
+    }
+    body_html = render_email('maintenance_notification.html', **context)
+    body_text = render_email('maintenance_notification.txt', **context)
+    
+    return subject, body_html, body_text
 
-def send_repair_notification(user_email, vehicle, repair):
+def send_maintenance_notification(user_email, vehicle, maintenance_date, days_remaining):
     """
-    Отправка уведомления о ремонте
+    Отправка уведомления о предстоящем ТО
+    """
+    return send_email(user_email, *build_maintenance_notification(vehicle, maintenance_date, days_remaining))
+
+def build_repair_notification(vehicle, repair):
+    """
+    Тема и тело уведомления о ремонте: (subject, body_html, body_text)
     """
     subject = f"Ремонт: {vehicle.brand} {vehicle.model} ({vehicle.reg_number})"
     
-    body_html = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; background-color: #ECF0F1; padding: 20px;">
-        <div style="max-width: 600px; margin: 0 auto; background-color: #FFFFFF; padding: 30px; border-radius: 5px;">
-            <h2 style="color: #E74C3C; margin-top: 0;">Уведомление о ремонте</h2>
-            <div style="background-color: #ECF0F1; padding: 15px; border-radius: 5px; margin: 20px 0;">
-                <p style="margin: 5px 0;"><strong>Марка/Модель:</strong> {vehicle.brand} {vehicle.model}</p>
-                <p style="margin: 5px 0;"><strong>Гос. номер:</strong> {vehicle.reg_number}</p>
-                <p style="margin: 5px 0;"><strong>Статус:</strong> {repair.status.value}</p>
-                <p style="margin: 5px 0;"><strong>Дата начала:</strong> {repair.start_date}</p>
-                {f'<p style="margin: 5px 0;"><strong>Дата окончания:</strong> {repair.end_date}</p>' if repair.end_date else ''}
-                <p style="margin: 5px 0;"><strong>Стоимость:</strong> {repair.cost:,.2f} руб.</p>
-            </div>
-            <div style="background-color: #FFFFFF; border-left: 4px solid #E74C3C; padding: 15px; margin: 20px 0;">
-                <p style="margin: 0;"><strong>Описание:</strong></p>
-                <p style="margin: 5px 0; color: #2C3E50;">{repair.description}</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    return send_email(user_email, subject, body_html)
-
+    body_html = render_email(
+        'repair_notification.html', vehicle=vehicle, repair=repair, cost=f'{repair.cost or 0:,.2f}'
+    )
+    
+    return subject, body_html, None
 
+def send_repair_notification(user_email, vehicle, repair):
+    """
+    Отправка уведомления о ремонте
+    """
+    return send_email(user_email, *build_repair_notification(vehicle, repair))
@@ -1,12 +1,47 @@
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
 from datetime import datetime
-from io import BytesIO
+from io import BytesIO, StringIO
+from itertools import chain, islice
+from tempfile import SpooledTemporaryFile
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import enum
+import json
+
+# Размер выборки строк для расчета ширины столбцов в потоковом Excel
+EXCEL_WIDTH_SAMPLE_SIZE = 1000
+# Размер файла, после которого потоковый Excel сбрасывается из памяти во временный файл
+EXCEL_SPILL_THRESHOLD = 16 * 1024 * 1024
+
+# Число строк данных на странице постраничного PDF
+PDF_ROWS_PER_PAGE = 30
+# Число страниц, которые рендерит один процесс при параллельной генерации PDF
+PDF_PAGES_PER_WORKER = 100
+# Число строк, начиная с которого PDF рендерится в пуле процессов
+PDF_PARALLEL_MIN_ROWS = 20000
+# Ширина области текста страницы A4 при полях SimpleDocTemplate по умолчанию (1 дюйм)
+PDF_FRAME_WIDTH = A4[0] - 2 * inch
+
+PDF_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2C3E50')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+])
 
 def export_to_pdf(data, title, filename=None):
     """
@@ -16,14 +51,7 @@ def export_to_pdf(data, title, filename=None):
     doc = SimpleDocTemplate(buffer, pagesize=A4)
     story = []
     
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#2C3E50'),
-        spaceAfter=30
-    )
+    title_style = _pdf_title_style()
     
     story.append(Paragraph(title, title_style))
     story.append(Spacer(1, 0.2*inch))
@@ -44,17 +72,7 @@ def export_to_pdf(data, title, filename=None):
             table_data = data
         
         table = Table(table_data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2C3E50')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ]))
+        table.setStyle(PDF_TABLE_STYLE)
         
         story.append(table)
     
@@ -62,6 +80,109 @@ def export_to_pdf(data, title, filename=None):
     buffer.seek(0)
     return buffer
 
+def _pdf_title_style():
+    styles = getSampleStyleSheet()
+    return ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        textColor=colors.HexColor('#2C3E50'),
+        spaceAfter=30
+    )
+
+def _pdf_table_rows(data):
+    """
+    Приведение данных к строкам таблицы (первая строка - заголовки)
+    """
+    if isinstance(data[0], dict):
+        headers = list(data[0].keys())
+        table_data = [[str(h).replace('_', ' ').title() for h in headers]]
+        table_data.extend([str(row.get(h, '')) for h in headers] for row in data)
+        return table_data
+    return [[str(value) for value in row] for row in data]
+
+def _pdf_column_widths(table_data, available_width, sample_size=EXCEL_WIDTH_SAMPLE_SIZE):
+    """
+    Ширина столбцов по заголовку и выборке строк, масштабированная под ширину страницы.
+    Считается один раз на отчет и используется всеми страницами
+    """
+    header, rows = table_data[0], table_data[1:sample_size + 1]
+    widths = [stringWidth(h, 'Helvetica-Bold', 12) for h in header]
+    for row in rows:
+        for col_idx, value in enumerate(row):
+            widths[col_idx] = max(widths[col_idx], stringWidth(value, 'Helvetica', 10))
+    widths = [w + 12 for w in widths]  # Внутренние отступы ячейки
+    
+    total = sum(widths)
+    if total > available_width:
+        widths = [w * available_width / total for w in widths]
+    return widths
+
+def _render_pdf_pages(title, header, rows, col_widths, rows_per_page):
+    """
+    Рендер части отчета: таблица разбивается на страницы по rows_per_page строк,
+    на каждой странице повторяется заголовок. title=None - без заголовка отчета
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    story = []
+    
+    if title is not None:
+        story.append(Paragraph(title, _pdf_title_style()))
+        story.append(Spacer(1, 0.2*inch))
+    
+    for start in range(0, len(rows), rows_per_page):
+        if start:
+            story.append(PageBreak())
+        table = Table([header] + rows[start:start + rows_per_page], colWidths=col_widths, repeatRows=1)
+        table.setStyle(PDF_TABLE_STYLE)
+        story.append(table)
+    
+    doc.build(story)
+    return buffer.getvalue()
+
+def _render_pdf_part(args):
+    return _render_pdf_pages(*args)
+
+def export_to_pdf_paginated(data, title, rows_per_page=PDF_ROWS_PER_PAGE, workers=None,
+                            parallel_min_rows=PDF_PARALLEL_MIN_ROWS):
+    """
+    Постраничный экспорт в PDF: отдельная таблица на каждую страницу с повторяющимся
+    заголовком и заранее рассчитанной шириной столбцов.
+    Большие отчеты (от parallel_min_rows строк) рендерятся диапазонами страниц
+    в пуле процессов и склеиваются (требуется пакет pypdf, иначе - в одном процессе)
+    """
+    if not isinstance(data, list) or len(data) == 0:
+        return BytesIO(_render_pdf_pages(title, [], [], None, rows_per_page))
+    
+    table_data = _pdf_table_rows(data)
+    header, rows = table_data[0], table_data[1:]
+    col_widths = _pdf_column_widths(table_data, PDF_FRAME_WIDTH)
+    
+    try:
+        from pypdf import PdfWriter
+    except ImportError:
+        PdfWriter = None
+    
+    if PdfWriter is None or len(rows) < parallel_min_rows:
+        return BytesIO(_render_pdf_pages(title, header, rows, col_widths, rows_per_page))
+    
+    part_size = rows_per_page * PDF_PAGES_PER_WORKER
+    parts = [
+        (title if start == 0 else None, header, rows[start:start + part_size], col_widths, rows_per_page)
+        for start in range(0, len(rows), part_size)
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        rendered = list(executor.map(_render_pdf_part, parts))
+    
+    writer = PdfWriter()
+    for part in rendered:
+        writer.append(BytesIO(part))
+    buffer = BytesIO()
+    writer.write(buffer)
+    buffer.seek(0)
+    return buffer
+
 def export_to_excel(data, title, filename=None):
     """
     Экспорт данных в Excel
@@ -110,4 +231,91 @@ def export_to_excel(data, title, filename=None):
     buffer.seek(0)
     return buffer
 
+def export_to_excel_stream(rows, headers, title, sample_size=EXCEL_WIDTH_SAMPLE_SIZE,
+                           spill_threshold=EXCEL_SPILL_THRESHOLD):
+    """
+    Потоковый экспорт в Excel (write-only книга openpyxl).
+    rows - итератор кортежей значений в порядке headers; числа и даты
+    сохраняются в ячейках как есть. Ширина столбцов считается по первым
+    sample_size строкам. Результат - файловый объект, который хранится в памяти
+    до spill_threshold байт, а дальше - во временном файле
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title[:31])  # Excel sheet name limit
+    
+    header_titles = [str(h).replace('_', ' ').title() for h in headers]
+    rows = iter(rows)
+    sample = list(islice(rows, sample_size))
+    
+    # Ширина столбцов задается до записи строк (требование write-only режима)
+    widths = [len(h) for h in header_titles]
+    for row in sample:
+        for col_idx, value in enumerate(row):
+            if value is not None:
+                widths[col_idx] = max(widths[col_idx], len(str(_excel_value(value))))
+    for col_idx, width in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = min(width + 2, 50)
+    
+    # Заголовок
+    title_cell = WriteOnlyCell(ws, value=title)
+    title_cell.font = Font(bold=True, size=14, color='FFFFFF')
+    title_cell.fill = PatternFill(start_color='2C3E50', end_color='2C3E50', fill_type='solid')
+    title_cell.alignment = Alignment(horizontal='center', vertical='center')
+    ws.append([title_cell])
+    ws.append([])
+    
+    header_cells = []
+    for header in header_titles:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = Font(bold=True, color='FFFFFF')
+        cell.fill = PatternFill(start_color='2C3E50', end_color='2C3E50', fill_type='solid')
+        cell.alignment = Alignment(horizontal='center')
+        header_cells.append(cell)
+    ws.append(header_cells)
+    
+    # Данные
+    for row in chain(sample, rows):
+        ws.append([_excel_value(value) for value in row])
+    
+    output = SpooledTemporaryFile(max_size=spill_threshold)
+    wb.save(output)
+    output.seek(0)
+    return output
+
+def _excel_value(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+def stream_csv(rows, headers, chunk_size=1000):
+    """
+    Потоковая выгрузка в CSV: rows - итератор кортежей значений.
+    Отдает текст порциями по chunk_size строк, не накапливая всю таблицу в памяти
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    
+    yield buffer.getvalue()
 
+def stream_ndjson(rows, headers, chunk_size=1000):
+    """
+    Потоковая выгрузка в NDJSON (один JSON-объект на строку)
+    """
+    lines = []
+    
+    for row in rows:
+        lines.append(json.dumps(dict(zip(headers, row)), ensure_ascii=False))
+        if len(lines) >= chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    
+    if lines:
+        yield '\n'.join(lines) + '\n'
@@ -0,0 +1,182 @@
+import json
+from datetime import date
+from sqlalchemy import insert, update, case, func
+from app import db, prediction_cache
+from app.models import Vehicle, MileageLog
+from app.utils import get_last_mileage_readings, update_mileage_stats_batch, chunks
+
+# Число показаний пробега, обрабатываемых одной транзакцией
+MILEAGE_INGEST_BATCH_SIZE = 5000
+
+# Длина столбца mileage_logs.driver
+DRIVER_MAX_LENGTH = 200
+
+def _optional_string(item, field, max_length=None):
+    """Необязательное строковое поле показания (None, если не задано)"""
+    value = item.get(field)
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f'{field} must be a string')
+    if max_length is not None and len(value) > max_length:
+        raise ValueError(f'{field} must be at most {max_length} characters')
+    return value
+
+def parse_mileage_reading(item):
+    """
+    Проверка и разбор одного показания {'vehicle_id', 'date', 'mileage', 'driver', 'notes'}.
+    При ошибке выбрасывает ValueError с описанием
+    """
+    if not isinstance(item, dict):
+        raise ValueError('Reading must be an object')
+    
+    vehicle_id = item.get('vehicle_id')
+    if not isinstance(vehicle_id, int) or isinstance(vehicle_id, bool):
+        raise ValueError('vehicle_id must be an integer')
+    
+    mileage = item.get('mileage')
+    if not isinstance(mileage, int) or isinstance(mileage, bool) or mileage < 0:
+        raise ValueError('mileage must be a non-negative integer')
+    
+    value = item.get('date')
+    try:
+        # fromisoformat заметно быстрее strptime; длина отсекает форматы кроме YYYY-MM-DD
+        if len(value) != 10:
+            raise ValueError
+        reading_date = date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError('date must be a date in YYYY-MM-DD format')
+    
+    return {
+        'vehicle_id': vehicle_id,
+        'date': reading_date,
+        'mileage': mileage,
+        'driver': _optional_string(item, 'driver', DRIVER_MAX_LENGTH),
+        'notes': _optional_string(item, 'notes')
+    }
+
+def iter_ndjson(stream):
+    """
+    Потоковый разбор NDJSON: пары (index, объект или ValueError для некорректной строки).
+    Пустые строки пропускаются
+    """
+    index = 0
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield index, json.loads(line)
+        except ValueError:
+            yield index, ValueError('Invalid JSON')
+        index += 1
+
+def _greatest(*values):
+    """GREATEST(...) либо скалярный MAX(...) для SQLite"""
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return func.max(*values)
+    return func.greatest(*values)
+
+def _validate_batch(batch):
+    """
+    Разбор порции и проверка монотонности пробега. Показания каждого ТС упорядочиваются
+    по дате и должны быть не старше и не меньше последней записи журнала.
+    Возвращает (принятые строки, отклоненные [{'index', 'error'}])
+    """
+    readings, rejects = [], []
+    for index, item in batch:
+        try:
+            if isinstance(item, ValueError):
+                raise item
+            readings.append((index, parse_mileage_reading(item)))
+        except ValueError as e:
+            rejects.append({'index': index, 'error': str(e)})
+    
+    vehicle_ids = {reading['vehicle_id'] for _, reading in readings}
+    existing = set()
+    for chunk in chunks(vehicle_ids):
+        existing.update(row.id for row in db.session.query(Vehicle.id).filter(Vehicle.id.in_(chunk)))
+    last_readings = get_last_mileage_readings(existing)
+    
+    accepted = []
+    readings.sort(key=lambda pair: (pair[1]['vehicle_id'], pair[1]['date'], pair[0]))
+    for index, reading in readings:
+        vehicle_id = reading['vehicle_id']
+        if vehicle_id not in existing:
+            rejects.append({'index': index, 'error': 'Vehicle not found'})
+            continue
+        
+        last = last_readings.get(vehicle_id)
+        if last is not None:
+            if reading['date'] < last[0]:
+                rejects.append({'index': index, 'error': 'Reading is older than the last logged reading'})
+                continue
+            if reading['mileage'] < last[1]:
+                rejects.append({'index': index, 'error': 'Mileage is less than the previous reading'})
+                continue
+        
+        last_readings[vehicle_id] = (reading['date'], reading['mileage'])
+        accepted.append(reading)
+    
+    return accepted, rejects
+
+def ingest_mileage_batch(batch):
+    """
+    Запись порции показаний одной транзакцией: многострочный INSERT в журнал,
+    один UPDATE текущего пробега на порцию ID ТС и пакетное обновление статистики.
+    batch - список (index, показание). Возвращает (число принятых, отклоненные)
+    """
+    accepted, rejects = _validate_batch(batch)
+    if not accepted:
+        return 0, rejects
+    
+    db.session.execute(insert(MileageLog), accepted)
+    
+    by_vehicle = {}
+    for reading in accepted:
+        by_vehicle.setdefault(reading['vehicle_id'], []).append((reading['date'], reading['mileage']))
+    
+    for chunk in chunks(by_vehicle):
+        new_mileage = case(
+            {vehicle_id: max(mileage for _, mileage in by_vehicle[vehicle_id]) for vehicle_id in chunk},
+            value=Vehicle.id
+        )
+        db.session.execute(
+            update(Vehicle)
+            .where(Vehicle.id.in_(chunk))
+            .values(current_mileage=_greatest(func.coalesce(Vehicle.current_mileage, 0), new_mileage))
+            .execution_options(synchronize_session=False)
+        )
+    
+    update_mileage_stats_batch(by_vehicle)
+    db.session.commit()
+    
+    for vehicle_id in by_vehicle:
+        prediction_cache.invalidate(vehicle_id)
+    
+    return len(accepted), rejects
+
+def ingest_mileage_readings(items, batch_size=None):
+    """
+    Загрузка потока показаний пробега порциями по MILEAGE_INGEST_BATCH_SIZE.
+    items - итерируемые пары (index, показание).
+    Возвращает {'accepted', 'rejected', 'rejects'}
+    """
+    batch_size = batch_size or MILEAGE_INGEST_BATCH_SIZE
+    accepted, rejects = 0, []
+    
+    batch = []
+    for pair in items:
+        batch.append(pair)
+        if len(batch) >= batch_size:
+            count, batch_rejects = ingest_mileage_batch(batch)
+            accepted += count
+            rejects.extend(batch_rejects)
+            batch = []
+    if batch:
+        count, batch_rejects = ingest_mileage_batch(batch)
+        accepted += count
+        rejects.extend(batch_rejects)
+    
+    rejects.sort(key=lambda reject: reject['index'])
+    return {'accepted': accepted, 'rejected': len(rejects), 'rejects': rejects}
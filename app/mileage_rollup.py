@@ -0,0 +1,331 @@
+from datetime import datetime, date, timedelta
+from flask import current_app
+from sqlalchemy import false, func, insert, update, text, tuple_
+from sqlalchemy.exc import OperationalError
+from app import db, prediction_cache
+from app.models import MileageLog, MileageRollup, MileageStats
+from app.utils import rebuild_mileage_stats, chunks
+
+# Число сводок, обрабатываемых за один проход (ключ сводки - два параметра запроса)
+ROLLUP_CHUNK_SIZE = 400
+# Предельное ожидание блокировки журнала для удаления пустых секций (PostgreSQL)
+PARTITION_DROP_LOCK_TIMEOUT_MS = 5000
+
+def _month_start(value):
+    return value.replace(day=1)
+
+def _next_month(value):
+    return (value.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+def _merge_rollups(period, summaries):
+    """
+    Сохранение сводок {(vehicle_id, period_start): {...}} с объединением с уже
+    существующими сводками тех же периодов (записи задним числом)
+    """
+    now = datetime.utcnow()
+    keys = list(summaries)
+    for chunk in chunks(keys, ROLLUP_CHUNK_SIZE):
+        existing = db.session.query(MileageRollup).filter(
+            MileageRollup.period == period,
+            tuple_(MileageRollup.vehicle_id, MileageRollup.period_start).in_(chunk)
+        )
+        changed = []
+        for rollup in existing:
+            summary = summaries.pop((rollup.vehicle_id, rollup.period_start))
+            if (summary['first_date'], summary['first_mileage']) < (rollup.first_date, rollup.first_mileage):
+                rollup.first_date, rollup.first_mileage = summary['first_date'], summary['first_mileage']
+            if (summary['last_date'], summary['last_mileage']) > (rollup.last_date, rollup.last_mileage):
+                rollup.last_date, rollup.last_mileage = summary['last_date'], summary['last_mileage']
+            changed.append({
+                'id': rollup.id,
+                'first_date': rollup.first_date,
+                'first_mileage': rollup.first_mileage,
+                'last_date': rollup.last_date,
+                'last_mileage': rollup.last_mileage,
+                'readings': rollup.readings + summary['readings'],
+                'updated_at': now
+            })
+        if changed:
+            db.session.execute(update(MileageRollup), changed)
+    
+    rows = [
+        dict(summary, vehicle_id=vehicle_id, period=period, period_start=period_start, updated_at=now)
+        for (vehicle_id, period_start), summary in summaries.items()
+    ]
+    if rows:
+        db.session.execute(insert(MileageRollup), rows)
+    return len(keys)
+
+def _rollup_raw_to_daily(cutoff):
+    """
+    Сводка исходных записей старше cutoff по дням и удаление этих записей.
+    Записи старше cutoff заблокированы до конца транзакции (_lock_expired_logs), поэтому
+    удаляются ровно те записи, что вошли в сводки.
+    Возвращает (число дневных сводок, число удаленных записей, ID затронутых ТС)
+    """
+    _lock_expired_logs(cutoff)
+    rows = db.session.query(
+        MileageLog.vehicle_id, MileageLog.date,
+        func.min(MileageLog.mileage).label('first_mileage'),
+        func.max(MileageLog.mileage).label('last_mileage'),
+        func.count().label('readings')
+    ).filter(MileageLog.date < cutoff)\
+        .group_by(MileageLog.vehicle_id, MileageLog.date).all()
+    if not rows:
+        return 0, 0, set()
+    
+    summaries = {
+        (row.vehicle_id, row.date): {
+            'first_date': row.date, 'first_mileage': row.first_mileage,
+            'last_date': row.date, 'last_mileage': row.last_mileage,
+            'readings': row.readings
+        }
+        for row in rows
+    }
+    vehicle_ids = {vehicle_id for vehicle_id, _ in summaries}
+    count = _merge_rollups('day', summaries)
+    
+    _truncate_expired_partitions(cutoff)
+    MileageLog.query.filter(MileageLog.date < cutoff).delete(synchronize_session=False)
+    # Удалены ровно свернутые записи (в том числе очисткой секций)
+    return count, sum(row.readings for row in rows), vehicle_ids
+
+def _rollup_daily_to_monthly(cutoff):
+    """
+    Объединение дневных сводок старше cutoff (начало месяца) в месячные.
+    Возвращает (число месячных сводок, ID затронутых ТС)
+    """
+    rows = db.session.query(MileageRollup).filter(
+        MileageRollup.period == 'day', MileageRollup.period_start < cutoff
+    ).order_by(MileageRollup.vehicle_id, MileageRollup.period_start).yield_per(5000)
+    
+    summaries = {}
+    for row in rows:
+        key = (row.vehicle_id, _month_start(row.period_start))
+        summary = summaries.get(key)
+        if summary is None:
+            summaries[key] = {
+                'first_date': row.first_date, 'first_mileage': row.first_mileage,
+                'last_date': row.last_date, 'last_mileage': row.last_mileage,
+                'readings': row.readings
+            }
+        else:
+            summary['last_date'], summary['last_mileage'] = row.last_date, row.last_mileage
+            summary['readings'] += row.readings
+    if not summaries:
+        return 0, set()
+    
+    vehicle_ids = {vehicle_id for vehicle_id, _ in summaries}
+    count = _merge_rollups('month', summaries)
+    MileageRollup.query.filter(MileageRollup.period == 'day', MileageRollup.period_start < cutoff)\
+        .delete(synchronize_session=False)
+    return count, vehicle_ids
+
+def rollup_mileage_logs(today=None):
+    """
+    Перевод журнала пробега в уровни хранения: исходные записи старше
+    MILEAGE_RAW_RETENTION_DAYS сворачиваются в дневные сводки, дневные сводки старше
+    MILEAGE_DAILY_RETENTION_DAYS - в месячные (без MILEAGE_RAW_RETENTION_DAYS только
+    создаются секции журнала на месяцы вперед). Статистика пробега ТС, окно которых
+    затронуто сверткой, пересчитывается. Возвращает счетчики
+    {'daily', 'monthly', 'deleted', 'rebuilt'}
+    """
+    counts = {'daily': 0, 'monthly': 0, 'deleted': 0, 'rebuilt': 0}
+    today = today or date.today()
+    # Секции создаются и без свертки, иначе записи новых месяцев копятся в секции по умолчанию.
+    # Фиксация снимает блокировку таблицы, взятую при создании секций
+    ensure_mileage_partitions(today)
+    db.session.commit()
+    
+    raw_days = current_app.config.get('MILEAGE_RAW_RETENTION_DAYS', 0)
+    if not raw_days:
+        return counts
+    
+    raw_cutoff = today - timedelta(days=raw_days)
+    daily_days = current_app.config.get('MILEAGE_DAILY_RETENTION_DAYS', 730)
+    daily_cutoff = _month_start(min(today - timedelta(days=daily_days), raw_cutoff))
+    
+    counts['daily'], counts['deleted'], vehicle_ids = _rollup_raw_to_daily(raw_cutoff)
+    counts['monthly'], monthly_ids = _rollup_daily_to_monthly(daily_cutoff)
+    vehicle_ids |= monthly_ids
+    
+    # Окно статистики, начинающееся в свернутом периоде, пересчитывается по сводкам
+    stale = []
+    for chunk in chunks(vehicle_ids):
+        stale.extend(row.vehicle_id for row in db.session.query(MileageStats.vehicle_id).filter(
+            MileageStats.vehicle_id.in_(chunk), MileageStats.first_date < raw_cutoff
+        ))
+    if stale:
+        counts['rebuilt'] = rebuild_mileage_stats(stale)
+    db.session.commit()
+    
+    for vehicle_id in stale:
+        prediction_cache.invalidate(vehicle_id)
+    _drop_expired_partitions(raw_cutoff)
+    return counts
+
+# ============ Секционирование (PostgreSQL) ============
+
+def _is_postgresql():
+    return db.session.get_bind().dialect.name == 'postgresql'
+
+def is_mileage_log_partitioned():
+    """Журнал пробега секционирован по дате (PostgreSQL, PARTITION BY RANGE)"""
+    if not _is_postgresql():
+        return False
+    relkind = db.session.execute(text(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"
+    ), {'name': MileageLog.__tablename__}).scalar()
+    return relkind == 'p'
+
+def _partition_name(month):
+    return f'{MileageLog.__tablename__}_p{month:%Y%m}'
+
+def _create_partition(month):
+    """Месячная секция журнала; существующая секция не пересоздается"""
+    with db.session.begin_nested():
+        db.session.execute(text(
+            f'CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF {MileageLog.__tablename__} '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+        ))
+
+def ensure_mileage_partitions(today=None):
+    """
+    Создание месячных секций журнала пробега на MILEAGE_PARTITION_MONTHS_AHEAD
+    месяцев вперед. Для несекционированного журнала ничего не делает.
+    Возвращает число проверенных секций
+    """
+    if not is_mileage_log_partitioned():
+        return 0
+    month = _month_start(today or date.today())
+    created = 0
+    for _ in range(current_app.config.get('MILEAGE_PARTITION_MONTHS_AHEAD', 3) + 1):
+        try:
+            _create_partition(month)
+            created += 1
+        except Exception:
+            # Секция по умолчанию уже содержит записи этого месяца
+            current_app.logger.exception('Could not create mileage log partition %s', _partition_name(month))
+        month = _next_month(month)
+    return created
+
+def _expired_partitions(cutoff):
+    """Месячные секции журнала, целиком старше cutoff"""
+    partitions = db.session.execute(text(
+        'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+        'WHERE i.inhparent = to_regclass(:name)'
+    ), {'name': MileageLog.__tablename__}).scalars().all()
+    prefix = f'{MileageLog.__tablename__}_p'
+    for name in partitions:
+        if name.startswith(prefix):
+            month = datetime.strptime(name[len(prefix):], '%Y%m').date()
+            if _next_month(month) <= cutoff:
+                yield name, month
+
+def _lock_expired_logs(cutoff):
+    """
+    Запрет записи в журнал пробега задним числом (старше cutoff) до конца транзакции
+    свертки: запись, добавленная между сводкой и удалением, была бы удалена без свертки.
+    PostgreSQL - SHARE ROW EXCLUSIVE (ожидает завершения начатых записей, исключает
+    параллельную свертку); в секционированном журнале блокируются только секции старше
+    cutoff и секция по умолчанию, запись текущих показаний не ждет. SQLite - пустой
+    DELETE захватывает блокировку записи БД
+    """
+    table = MileageLog.__tablename__
+    if not _is_postgresql():
+        MileageLog.query.filter(false()).delete(synchronize_session=False)
+        return
+    if not is_mileage_log_partitioned():
+        db.session.execute(text(f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE'))
+        return
+    partitions = [f'{table}_default']
+    partitions.extend(name for name, month in _expired_partitions(_next_month(cutoff)))
+    db.session.execute(text(f'LOCK TABLE {", ".join(partitions)} IN SHARE ROW EXCLUSIVE MODE'))
+
+def _truncate_expired_partitions(cutoff):
+    """
+    Очистка месячных секций, целиком старше cutoff (дешевле построчного DELETE).
+    TRUNCATE блокирует только секцию; DROP потребовал бы блокировки всего журнала, и
+    ожидающая записи задним числом вставка (держит блокировку журнала) привела бы к
+    взаимной блокировке - пустые секции удаляются после фиксации свертки
+    """
+    if not is_mileage_log_partitioned():
+        return
+    names = [name for name, _ in _expired_partitions(cutoff)]
+    if names:
+        db.session.execute(text(f'TRUNCATE {", ".join(names)}'))
+
+def _drop_expired_partitions(cutoff):
+    """
+    Удаление пустых месячных секций, целиком старше cutoff, отдельной транзакцией.
+    Ожидание блокировки журнала ограничено PARTITION_DROP_LOCK_TIMEOUT_MS (запросы
+    к журналу ждут за DROP в очереди блокировок); при неудаче секции удаляются при
+    следующем запуске. Возвращает число удаленных секций
+    """
+    if not is_mileage_log_partitioned():
+        return 0
+    names = [name for name, _ in _expired_partitions(cutoff)]
+    if not names:
+        db.session.rollback()
+        return 0
+    dropped = 0
+    try:
+        db.session.execute(text(f'SET LOCAL lock_timeout = {PARTITION_DROP_LOCK_TIMEOUT_MS}'))
+        db.session.execute(text(f'LOCK TABLE {MileageLog.__tablename__} IN ACCESS EXCLUSIVE MODE'))
+        for name in names:
+            # Запись задним числом после свертки - секция дождется следующего запуска
+            if not db.session.execute(text(f'SELECT EXISTS (SELECT 1 FROM {name})')).scalar():
+                db.session.execute(text(f'DROP TABLE {name}'))
+                dropped += 1
+        db.session.commit()
+    except OperationalError:
+        db.session.rollback()
+        current_app.logger.warning('Could not lock %s to drop expired partitions', MileageLog.__tablename__)
+        return 0
+    return dropped
+
+def partition_mileage_logs():
+    """
+    Перевод существующей таблицы журнала пробега в секционированную по дате
+    (PostgreSQL): создается секционированная таблица с месячными секциями и секцией
+    по умолчанию, данные переносятся, исходная таблица удаляется.
+    Возвращает число месячных секций
+    """
+    if not _is_postgresql():
+        raise RuntimeError('Partitioning is only supported on PostgreSQL')
+    if is_mileage_log_partitioned():
+        return 0
+    
+    table = MileageLog.__tablename__
+    sequence = f'{table}_id_seq'
+    first_date = db.session.query(func.min(MileageLog.date)).scalar() or date.today()
+    
+    for index in MileageLog.__table__.indexes:
+        db.session.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+    db.session.execute(text(f'ALTER TABLE {table} RENAME TO {table}_unpartitioned'))
+    db.session.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY NONE'))
+    db.session.execute(text(
+        f'CREATE TABLE {table} (LIKE {table}_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (date)'
+    ))
+    # Ключ секционирования обязан входить в первичный ключ
+    db.session.execute(text(f'ALTER TABLE {table} ADD PRIMARY KEY (id, date)'))
+    db.session.execute(text(f'ALTER TABLE {table} ADD FOREIGN KEY (vehicle_id) REFERENCES vehicles (id)'))
+    db.session.execute(text(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT'))
+    
+    month, last_month = _month_start(first_date), _month_start(date.today())
+    partitions = 0
+    while month <= last_month:
+        _create_partition(month)
+        partitions += 1
+        month = _next_month(month)
+    
+    for index in MileageLog.__table__.indexes:
+        index.create(db.session.connection())
+    db.session.execute(text(f'INSERT INTO {table} SELECT * FROM {table}_unpartitioned'))
+    db.session.execute(text(f'DROP TABLE {table}_unpartitioned'))
+    db.session.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id'))
+    db.session.commit()
+    
+    partitions += ensure_mileage_partitions()
+    db.session.commit()
+    return partitions
@@ -1,5 +1,5 @@
 from datetime import datetime
-from app import db
+from app import db, login_guard
 from werkzeug.security import generate_password_hash, check_password_hash
 import enum
 
@@ -27,6 +27,12 @@ class RepairStatus(enum.Enum):
     COMPLETED = 'completed'
     CANCELLED = 'cancelled'
 
+class NotificationStatus(enum.Enum):
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    DEAD = 'dead'
+
 class User(db.Model):
     __tablename__ = 'users'
     
@@ -40,7 +46,7 @@ class User(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        self.password_hash = generate_password_hash(password, method=login_guard.method)
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -76,6 +82,13 @@ class Vehicle(db.Model):
     maintenance_records = db.relationship('Maintenance', backref='vehicle', lazy=True, cascade='all, delete-orphan')
     repairs = db.relationship('Repair', backref='vehicle', lazy=True, cascade='all, delete-orphan')
     mileage_logs = db.relationship('MileageLog', backref='vehicle', lazy=True, cascade='all, delete-orphan')
+    mileage_rollups = db.relationship('MileageRollup', backref='vehicle', lazy=True, cascade='all, delete-orphan')
+    mileage_stats = db.relationship('MileageStats', backref='vehicle', lazy=True, uselist=False, cascade='all, delete-orphan')
+    reminder_state = db.relationship('MaintenanceReminderState', backref='vehicle', lazy=True, uselist=False, cascade='all, delete-orphan')
+    
+    # Поля ответа API (ключи to_dict), доступные для выборки через fields=
+    API_FIELDS = ('id', 'brand', 'model', 'year', 'vin', 'reg_number', 'purchase_date', 'initial_mileage',
+                  'vehicle_type', 'current_mileage', 'status')
     
     def to_dict(self):
         return {
@@ -96,15 +109,26 @@ class Maintenance(db.Model):
     __tablename__ = 'maintenance'
     
     id = db.Column(db.Integer, primary_key=True)
-    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False, index=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
     type = db.Column(db.Enum(MaintenanceType), nullable=False)
-    date = db.Column(db.Date, nullable=False, index=True)
+    date = db.Column(db.Date, nullable=False)
     mileage = db.Column(db.Integer, nullable=False)
     cost = db.Column(db.Numeric(10, 2), default=0)
     description = db.Column(db.Text)
     next_maintenance_km = db.Column(db.Integer)  # Expected mileage for next maintenance
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Составные индексы под выборки "ТС, новые записи первыми" (включая оконные
+    # PARTITION BY vehicle_id ORDER BY date DESC, id DESC) и общую ленту по дате;
+    # id в индексе убирает сортировку при пагинации по ключу (date, id)
+    __table_args__ = (
+        db.Index('ix_maintenance_vehicle_id_date', vehicle_id, date.desc(), id.desc()),
+        db.Index('ix_maintenance_date_id', date, id),
+    )
+    
+    # Поля ответа API (ключи to_dict), доступные для выборки через fields=
+    API_FIELDS = ('id', 'vehicle_id', 'type', 'date', 'mileage', 'cost', 'description', 'next_maintenance_km')
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -121,8 +145,8 @@ class Repair(db.Model):
     __tablename__ = 'repairs'
     
     id = db.Column(db.Integer, primary_key=True)
-    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False, index=True)
-    start_date = db.Column(db.Date, nullable=False, index=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
     end_date = db.Column(db.Date)
     description = db.Column(db.Text, nullable=False)
     cost = db.Column(db.Numeric(10, 2), default=0)
@@ -130,6 +154,14 @@ class Repair(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_repairs_vehicle_id_start_date', vehicle_id, start_date.desc(), id.desc()),
+        db.Index('ix_repairs_start_date_id', start_date, id),
+    )
+    
+    # Поля ответа API (ключи to_dict), доступные для выборки через fields=
+    API_FIELDS = ('id', 'vehicle_id', 'start_date', 'end_date', 'description', 'cost', 'status')
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -145,13 +177,24 @@ class MileageLog(db.Model):
     __tablename__ = 'mileage_logs'
     
     id = db.Column(db.Integer, primary_key=True)
-    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False, index=True)
-    date = db.Column(db.Date, nullable=False, index=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
     mileage = db.Column(db.Integer, nullable=False)
     driver = db.Column(db.String(200))
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_mileage_logs_vehicle_id_date', vehicle_id, date.desc(), id.desc()),
+        # vehicle_id и mileage в индексе: выборка показаний за период (отчеты app.analytics)
+        # читает только индекс, без обращения к строкам таблицы. В существующей БД индекс
+        # создает flask upgrade-indexes; в секционированном журнале - в каждой секции
+        db.Index('ix_mileage_logs_date_id_readings', date, id, vehicle_id, mileage),
+    )
+    
+    # Поля ответа API (ключи to_dict), доступные для выборки через fields=
+    API_FIELDS = ('id', 'vehicle_id', 'date', 'mileage', 'driver', 'notes')
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -162,3 +205,116 @@ class MileageLog(db.Model):
             'notes': self.notes
         }
 
+class MileageRollup(db.Model):
+    """Сводка журнала пробега за день или месяц (замещает исходные записи старше окна хранения)"""
+    __tablename__ = 'mileage_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('vehicle_id', 'period', 'period_start', name='uq_mileage_rollups_period'),
+        db.Index('ix_mileage_rollups_vehicle_id_last_date', 'vehicle_id', 'last_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
+    period = db.Column(db.String(10), nullable=False)  # day, month
+    period_start = db.Column(db.Date, nullable=False)
+    first_date = db.Column(db.Date, nullable=False)  # Первое показание периода
+    first_mileage = db.Column(db.Integer, nullable=False)
+    last_date = db.Column(db.Date, nullable=False)  # Последнее показание периода
+    last_mileage = db.Column(db.Integer, nullable=False)
+    readings = db.Column(db.Integer, nullable=False)  # Число исходных записей
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'vehicle_id': self.vehicle_id,
+            'period': self.period,
+            'period_start': self.period_start.isoformat(),
+            'first_date': self.first_date.isoformat(),
+            'first_mileage': self.first_mileage,
+            'last_date': self.last_date.isoformat(),
+            'last_mileage': self.last_mileage,
+            'readings': self.readings
+        }
+
+class MileageStats(db.Model):
+    """Скользящая статистика журнала пробега (окно последних записей) по ТС"""
+    __tablename__ = 'mileage_stats'
+    
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), primary_key=True)
+    first_date = db.Column(db.Date)  # Самая старая запись окна
+    first_mileage = db.Column(db.Integer)
+    last_date = db.Column(db.Date)  # Самая новая запись окна
+    last_mileage = db.Column(db.Integer)
+    count = db.Column(db.Integer, nullable=False, default=0)  # Число записей в окне
+    ewma_daily_mileage = db.Column(db.Float)  # Экспоненциально взвешенный среднесуточный пробег
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'vehicle_id': self.vehicle_id,
+            'first_date': self.first_date.isoformat() if self.first_date else None,
+            'first_mileage': self.first_mileage,
+            'last_date': self.last_date.isoformat() if self.last_date else None,
+            'last_mileage': self.last_mileage,
+            'count': self.count,
+            'ewma_daily_mileage': self.ewma_daily_mileage
+        }
+
+class MaintenanceReminderState(db.Model):
+    """Последний известный статус ТО по ТС (для отправки напоминаний только при смене статуса)"""
+    __tablename__ = 'maintenance_reminder_state'
+    
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), primary_key=True)
+    status = db.Column(db.String(20), nullable=False)  # normal, warning, urgent, overdue
+    predicted_date = db.Column(db.Date)
+    notified_at = db.Column(db.DateTime)  # Время последнего напоминания
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class NotificationOutbox(db.Model):
+    """Очередь исходящих уведомлений (отправляются фоновым обработчиком)"""
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body_html = db.Column(db.Text, nullable=False)
+    body_text = db.Column(db.Text)
+    status = db.Column(db.Enum(NotificationStatus), nullable=False, default=NotificationStatus.PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)  # Время захвата обработчиком
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    # Поля ответа API (ключи to_dict), доступные для выборки через fields=
+    API_FIELDS = ('id', 'to_email', 'subject', 'status', 'attempts', 'next_attempt_at', 'last_error',
+                  'created_at', 'sent_at')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'to_email': self.to_email,
+            'subject': self.subject,
+            'status': self.status.value,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+class DataVersion(db.Model):
+    """
+    Версии таблиц для условных GET-запросов: увеличиваются при фиксации
+    транзакции, изменившей таблицу (app/versioning.py)
+    """
+    __tablename__ = 'data_versions'
+    
+    name = db.Column(db.String(64), primary_key=True)  # Имя таблицы
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
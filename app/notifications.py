@@ -0,0 +1,190 @@
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import or_, and_, insert
+from app import db
+from app.models import NotificationOutbox, NotificationStatus
+from app.email_utils import SMTPSender, EmailNotConfigured
+
+def enqueue_email(to_email, subject, body_html, body_text=None):
+    """
+    Постановка письма в очередь уведомлений. Запись добавляется в текущую сессию
+    и сохраняется вместе с транзакцией вызывающего кода
+    """
+    message = NotificationOutbox(
+        to_email=to_email,
+        subject=subject,
+        body_html=body_html,
+        body_text=body_text,
+        status=NotificationStatus.PENDING,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.session.add(message)
+    return message
+
+def enqueue_emails(messages):
+    """
+    Пакетная постановка писем в очередь одним многострочным INSERT.
+    messages - список (to_email, subject, body_html, body_text)
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            'to_email': to_email,
+            'subject': subject,
+            'body_html': body_html,
+            'body_text': body_text,
+            'status': NotificationStatus.PENDING,
+            'attempts': 0,
+            'next_attempt_at': now,
+            'created_at': now
+        }
+        for to_email, subject, body_html, body_text in messages
+    ]
+    if rows:
+        db.session.execute(insert(NotificationOutbox), rows)
+    return len(rows)
+
+def _retry_delay(attempts):
+    """Экспоненциальная задержка перед повторной попыткой"""
+    base = current_app.config.get('NOTIFICATION_RETRY_BASE_SECONDS', 30)
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+def _claim_batch(limit):
+    """
+    Захват порции готовых к отправке писем. Захват выполняется условным UPDATE
+    (статус должен не измениться с момента выборки), поэтому несколько обработчиков
+    не отправят одно письмо дважды. Зависшие в статусе sending письма
+    (обработчик упал) возвращаются в работу по истечении NOTIFICATION_LOCK_TIMEOUT
+    """
+    now = datetime.utcnow()
+    lock_expired = now - timedelta(seconds=current_app.config.get('NOTIFICATION_LOCK_TIMEOUT', 600))
+    
+    candidates = db.session.query(NotificationOutbox.id, NotificationOutbox.status)\
+        .filter(or_(
+            and_(NotificationOutbox.status == NotificationStatus.PENDING,
+                 NotificationOutbox.next_attempt_at <= now),
+            and_(NotificationOutbox.status == NotificationStatus.SENDING,
+                 NotificationOutbox.locked_at < lock_expired)
+        ))\
+        .order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id)\
+        .limit(limit).all()
+    
+    claimed = []
+    for message_id, status in candidates:
+        result = db.session.execute(
+            db.update(NotificationOutbox)
+            .where(NotificationOutbox.id == message_id, NotificationOutbox.status == status)
+            .values(status=NotificationStatus.SENDING, locked_at=now)
+        )
+        if result.rowcount == 1:
+            claimed.append(message_id)
+    db.session.commit()
+    return claimed
+
+def _warn_not_configured():
+    """Одно предупреждение на приложение: SMTP не настроен, очередь не обрабатывается"""
+    app = current_app._get_current_object()
+    if not app.extensions.get('outbox_smtp_warning'):
+        app.extensions['outbox_smtp_warning'] = True
+        app.logger.warning('SMTP is not configured (SMTP_HOST, SMTP_USER): notifications stay queued')
+
+def process_outbox(batch_size=None):
+    """
+    Отправка одной порции писем из очереди.
+    Неудачные попытки повторяются с экспоненциальной задержкой, после
+    NOTIFICATION_MAX_ATTEMPTS попыток письмо переводится в статус dead.
+    Если SMTP не настроен, письма остаются в очереди (pending) до настройки.
+    Возвращает счетчики {'sent', 'retried', 'dead'}
+    """
+    batch_size = batch_size or current_app.config.get('NOTIFICATION_BATCH_SIZE', 50)
+    max_attempts = current_app.config.get('NOTIFICATION_MAX_ATTEMPTS', 5)
+    counts = {'sent': 0, 'retried': 0, 'dead': 0}
+    
+    # Вся порция отправляется через одно SMTP-соединение. Без настроек SMTP письма
+    # не захватываются и остаются в очереди без траты попыток (иначе все ушли бы в dead)
+    try:
+        sender = SMTPSender.from_config(current_app.config, pool_size=1)
+    except EmailNotConfigured:
+        _warn_not_configured()
+        return counts
+    except Exception as e:
+        sender, sender_error = None, e
+    
+    claimed = _claim_batch(batch_size)
+    if not claimed:
+        if sender is not None:
+            sender.close()
+        return counts
+    
+    messages = NotificationOutbox.query.filter(NotificationOutbox.id.in_(claimed))\
+        .order_by(NotificationOutbox.id).all()
+    
+    for message in messages:
+        message.attempts += 1
+        try:
+            if sender is None:
+                raise sender_error
+            sender.send(message.to_email, message.subject, message.body_html, message.body_text)
+        except Exception as e:
+            message.last_error = f'{type(e).__name__}: {e}'
+            if message.attempts >= max_attempts:
+                message.status = NotificationStatus.DEAD
+                counts['dead'] += 1
+            else:
+                message.status = NotificationStatus.PENDING
+                message.next_attempt_at = datetime.utcnow() + _retry_delay(message.attempts)
+                counts['retried'] += 1
+        else:
+            message.status = NotificationStatus.SENT
+            message.sent_at = datetime.utcnow()
+            message.last_error = None
+            counts['sent'] += 1
+        message.locked_at = None
+        # Статус фиксируется после каждого письма, чтобы сбой не привел к повторной отправке
+        db.session.commit()
+    
+    if sender is not None:
+        sender.close()
+    return counts
+
+def drain_outbox(batch_size=None):
+    """
+    Отправка всех готовых писем (порциями, пока очередь не опустеет)
+    """
+    totals = {'sent': 0, 'retried': 0, 'dead': 0}
+    while True:
+        counts = process_outbox(batch_size)
+        for key, value in counts.items():
+            totals[key] += value
+        if not any(counts.values()):
+            return totals
+
+def run_outbox_worker(app, stop_event, interval=None):
+    """
+    Цикл фонового обработчика очереди уведомлений
+    """
+    interval = interval or app.config.get('NOTIFICATION_POLL_INTERVAL', 5)
+    while not stop_event.is_set():
+        with app.app_context():
+            try:
+                drain_outbox()
+            except Exception:
+                app.logger.exception('Notification outbox worker failed')
+                db.session.rollback()
+            finally:
+                db.session.remove()
+        stop_event.wait(interval)
+
+def start_outbox_worker(app):
+    """
+    Запуск обработчика очереди уведомлений в фоновом потоке текущего процесса.
+    Возвращает событие, установка которого останавливает обработчик
+    """
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=run_outbox_worker, args=(app, stop_event),
+        name='notification-outbox', daemon=True
+    )
+    thread.start()
+    return stop_event
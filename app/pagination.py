@@ -0,0 +1,193 @@
+import base64
+import json
+from datetime import date
+from itertools import islice
+from urllib.parse import urlencode
+from flask import current_app, request, jsonify, stream_with_context
+from sqlalchemy import Date, DateTime, Enum, Numeric, and_, or_
+from app.serialization import serialize_tuples, stream_json_array
+
+class InvalidCursor(ValueError):
+    """Некорректный курсор пагинации"""
+
+def encode_cursor(values):
+    """
+    Кодирование значений ключа последней записи страницы в непрозрачный курсор
+    """
+    payload = [v.isoformat() if isinstance(v, date) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, types):
+    """
+    Декодирование курсора; types - типы значений ключа (date, int, ...)
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise InvalidCursor('Invalid cursor')
+        return [
+            date.fromisoformat(value) if value_type is date else value_type(value)
+            for value, value_type in zip(payload, types)
+        ]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+
+def parse_limit(value, default=100, maximum=1000):
+    """
+    Разбор параметра limit с ограничением сверху; default=None - без ограничения
+    """
+    if value is None:
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, maximum)
+
+def parse_fields(value, allowed):
+    """
+    Разбор параметра fields (список полей через запятую) по списку допустимых полей
+    """
+    if not value:
+        return None
+    fields = list(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def keyset_filter(keys, values, descending=False):
+    """
+    Условие "строго после записи с ключом values" для сортировки по keys
+    """
+    clauses = []
+    for i, column in enumerate(keys):
+        equal = [keys[j] == values[j] for j in range(i)]
+        after = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, after))
+    return or_(*clauses)
+
+def keyset_order(keys, descending=False):
+    return [column.desc() if descending else column.asc() for column in keys]
+
+def serialize_column(column, value):
+    """
+    Преобразование значения колонки к JSON-виду так же, как это делают методы to_dict()
+    """
+    column_type = column.type
+    if isinstance(column_type, Enum):
+        return value.value if value is not None else None
+    if isinstance(column_type, (Date, DateTime)):
+        return value.isoformat() if value else None
+    if isinstance(column_type, Numeric):
+        return float(value) if value else 0
+    return value
+
+def _keyset_tier_query(model, query, keys, key_names, descending, fields, cursor_values):
+    if fields:
+        columns = [getattr(model, f) for f in fields]
+        columns += [getattr(model, name) for name in key_names if name not in fields]
+        query = query.with_entities(*columns)
+    
+    if cursor_values is not None:
+        query = query.filter(keyset_filter(keys, cursor_values[:len(keys)], descending))
+    return query.order_by(*keyset_order(keys, descending))
+
+def fetch_keyset_page(model, query, keys, limit, descending=False, fields=None, cursor_values=None, tiers=()):
+    """
+    Страница записей query (и следующих уровней tiers) после ключа cursor_values.
+    Возвращает (строки, курсор следующей страницы или None)
+    """
+    key_names = [column.key for column in keys]
+    rows = []
+    for tier_model, tier_query, tier_keys in [(model, query, keys), *tiers]:
+        if limit is not None and len(rows) > limit:
+            break
+        tier_query = _keyset_tier_query(tier_model, tier_query, tier_keys, key_names, descending, fields, cursor_values)
+        if limit is not None:
+            tier_query = tier_query.limit(limit + 1 - len(rows))
+        rows.extend(tier_query.all())
+    
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], name) for name in key_names])
+
+def iter_keyset_chunks(model, query, keys, chunk_size, descending=False, fields=None, cursor_values=None, tiers=()):
+    """
+    Все записи query и уровней tiers после ключа cursor_values порциями по chunk_size строк.
+    Строки читаются из курсора БД по мере обработки порций (yield_per), в памяти
+    одновременно находится одна порция
+    """
+    key_names = [column.key for column in keys]
+    for tier_model, tier_query, tier_keys in [(model, query, keys), *tiers]:
+        tier_query = _keyset_tier_query(tier_model, tier_query, tier_keys, key_names, descending, fields, cursor_values)
+        rows = iter(tier_query.yield_per(chunk_size))
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            yield chunk
+
+def serialize_rows(model, rows, fields=None):
+    """
+    Записи страницы в виде словарей: to_dict() объектов модели или, для строк,
+    выбранных с fields, - поля fields (преобразование по колонкам)
+    """
+    if not fields:
+        return [row.to_dict() for row in rows]
+    return serialize_tuples([getattr(model, f) for f in fields], rows, fields)
+
+def paginated_list(model, query, keys, descending=False, default_limit=None, tiers=(), stream=False):
+    """
+    Ответ списочного эндпоинта с пагинацией по ключу (keyset) и проекцией полей.
+    Параметры запроса:
+    - limit: размер страницы (по умолчанию - все записи)
+    - cursor: непрозрачный курсор из заголовка X-Next-Cursor предыдущей страницы
+    - fields: список полей через запятую; из БД выбираются только эти колонки
+      (без fields - все поля API_FIELDS, тоже кортежами колонок, без загрузки объектов модели)
+    Тело ответа - массив записей; курсор следующей страницы передается
+    в заголовках X-Next-Cursor и Link (rel="next").
+    tiers - следующие уровни хранения [(model, query, keys)], строки которых идут в порядке
+    сортировки после строк query. Уровни читаются по очереди, каждый своим индексом,
+    без сортировки объединения; keys уровня - префикс основных ключей, однозначно
+    упорядочивающий его строки.
+    stream - ответ без limit отдается потоковым JSON-массивом (stream_json_array)
+    порциями по JSON_STREAM_CHUNK_SIZE строк по мере чтения из БД; тело совпадает
+    с обычным ответом
+    """
+    try:
+        fields = parse_fields(request.args.get('fields'), model.API_FIELDS) or list(model.API_FIELDS)
+        limit = parse_limit(request.args.get('limit'), default=default_limit)
+        cursor = request.args.get('cursor')
+        if cursor:
+            cursor_values = decode_cursor(cursor, [column.type.python_type for column in keys])
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    chunk_size = current_app.config.get('JSON_STREAM_CHUNK_SIZE', 1000)
+    if stream and chunk_size and limit is None:
+        chunks = iter_keyset_chunks(model, query, keys, chunk_size, descending, fields,
+                                    cursor_values if cursor else None, tiers)
+        items = (serialize_rows(model, chunk, fields) for chunk in chunks)
+        return current_app.response_class(
+            stream_with_context(stream_json_array(items)), mimetype=current_app.json.mimetype
+        ), 200
+    
+    rows, next_cursor = fetch_keyset_page(model, query, keys, limit, descending, fields,
+                                          cursor_values if cursor else None, tiers)
+    items = serialize_rows(model, rows, fields)
+    
+    response = jsonify(items)
+    if next_cursor:
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response, 200
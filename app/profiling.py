@@ -0,0 +1,232 @@
+import cProfile
+import ipaddress
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from flask import Response, current_app, g, has_app_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Границы гистограммы длительности запросов, секунды
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class RequestProfile:
+    """Измерения одного запроса"""
+    
+    __slots__ = ('started', 'sql_count', 'sql_time', 'statements', 'serialization_time', 'profiler', '_sql_started')
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.statements = Counter()
+        self.serialization_time = 0.0
+        self.profiler = None
+        self._sql_started = None
+
+class RequestProfiler:
+    """
+    Инструментирование запросов (PROFILING_ENABLED): время обработки, число и
+    суммарное время SQL-запросов (события движка SQLAlchemy), время сериализации
+    JSON. Одинаковые SQL-запросы, повторенные в одном запросе не реже
+    PROFILING_N_PLUS_ONE_THRESHOLD раз, считаются подозрением на N+1.
+    Результаты отдаются в заголовке Server-Timing и в /metrics (формат Prometheus) -
+    только адресам из PROFILING_METRICS_ALLOW. Счетчики свои у каждого процесса: за
+    gunicorn с несколькими процессами каждый опрос /metrics попадает в случайный процесс
+    и видит только его долю запросов (для замеров - WEB_CONCURRENCY=1). Медленные запросы из выборки PROFILING_SAMPLE_RATE
+    сохраняются как дампы cProfile в PROFILING_PROFILE_DIR.
+    Тело потоковых ответов формируется после замера и в него не входит
+    """
+    
+    def __init__(self, app=None):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._n_plus_one = Counter()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.enabled = app.config.get('PROFILING_ENABLED', False)
+        if not self.enabled:
+            return
+        self.n_plus_one_threshold = app.config.get('PROFILING_N_PLUS_ONE_THRESHOLD', 5)
+        self.slow_request_seconds = app.config.get('PROFILING_SLOW_REQUEST_MS', 500) / 1000
+        self.sample_rate = app.config.get('PROFILING_SAMPLE_RATE', 0.0)
+        self.profile_dir = app.config.get('PROFILING_PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+        self.metrics_allow = [ipaddress.ip_network(network, strict=False)
+                              for network in app.config.get('PROFILING_METRICS_ALLOW', ('127.0.0.1', '::1'))]
+        
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        self._wrap_json(app)
+        
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule(app.config.get('PROFILING_METRICS_PATH', '/metrics'), 'metrics', self.metrics_view)
+    
+    def _wrap_json(self, app):
+        # jsonify и app.json.response вызывают dumps провайдера
+        provider = app.json
+        dumps = provider.dumps
+        
+        def timed_dumps(obj, **kwargs):
+            profile = _current_profile()
+            if profile is None:
+                return dumps(obj, **kwargs)
+            started = time.perf_counter()
+            try:
+                return dumps(obj, **kwargs)
+            finally:
+                profile.serialization_time += time.perf_counter() - started
+        
+        provider.dumps = timed_dumps
+    
+    def _before_request(self):
+        profile = RequestProfile()
+        if self.sample_rate and random.random() < self.sample_rate:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                profile.profiler = profiler
+            except ValueError:
+                # Другой профилировщик уже активен
+                pass
+        g.request_profile = profile
+    
+    def _after_request(self, response):
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return response
+        if profile.profiler is not None:
+            profile.profiler.disable()
+        duration = time.perf_counter() - profile.started
+        endpoint = request.endpoint or 'unmatched'
+        suspects = [(statement, count) for statement, count in profile.statements.items()
+                    if count >= self.n_plus_one_threshold]
+        
+        timings = [
+            f'app;dur={duration * 1000:.2f}',
+            f'db;dur={profile.sql_time * 1000:.2f};desc="{profile.sql_count} queries"',
+            f'serialize;dur={profile.serialization_time * 1000:.2f}',
+        ]
+        if suspects:
+            timings.append(f'n-plus-one;desc="{len(suspects)} repeated statements"')
+        response.headers.add('Server-Timing', ', '.join(timings))
+        
+        self._record(endpoint, request.method, response.status_code, duration, profile, len(suspects))
+        for statement, count in suspects:
+            current_app.logger.warning('Possible N+1 in %s: statement executed %d times: %s',
+                                       endpoint, count, ' '.join(statement.split())[:300])
+        if profile.profiler is not None and duration >= self.slow_request_seconds:
+            self._dump_profile(profile.profiler, endpoint, duration)
+        return response
+    
+    def _record(self, endpoint, method, status, duration, profile, suspects):
+        key = (endpoint, method)
+        with self._lock:
+            metrics = self._metrics.get(key)
+            if metrics is None:
+                metrics = self._metrics[key] = {
+                    'statuses': Counter(), 'buckets': [0] * len(DURATION_BUCKETS), 'duration': 0.0,
+                    'count': 0, 'sql_count': 0, 'sql_time': 0.0, 'serialization_time': 0.0
+                }
+            metrics['statuses'][status] += 1
+            metrics['count'] += 1
+            metrics['duration'] += duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    metrics['buckets'][i] += 1
+            metrics['sql_count'] += profile.sql_count
+            metrics['sql_time'] += profile.sql_time
+            metrics['serialization_time'] += profile.serialization_time
+            if suspects:
+                self._n_plus_one[endpoint] += suspects
+    
+    def _dump_profile(self, profiler, endpoint, duration):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        name = re.sub(r'[^\w.-]', '_', endpoint)
+        path = os.path.join(self.profile_dir, f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{name}-{duration * 1000:.0f}ms.prof")
+        profiler.dump_stats(path)
+        current_app.logger.info('Slow request %s (%.0f ms), profile saved to %s', endpoint, duration * 1000, path)
+    
+    def render_metrics(self):
+        """Метрики в текстовом формате Prometheus"""
+        lines = []
+        
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+        
+        with self._lock:
+            items = sorted(self._metrics.items())
+            n_plus_one = sorted(self._n_plus_one.items())
+            
+            family('fleet_http_requests_total', 'counter', 'HTTP requests by endpoint, method and status')
+            for (endpoint, method), metrics in items:
+                for status, count in sorted(metrics['statuses'].items()):
+                    lines.append(f'fleet_http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+            
+            family('fleet_http_request_duration_seconds', 'histogram', 'Request processing time')
+            for (endpoint, method), metrics in items:
+                labels = f'endpoint="{endpoint}",method="{method}"'
+                for bound, count in zip(DURATION_BUCKETS, metrics['buckets']):
+                    lines.append(f'fleet_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'fleet_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {metrics["count"]}')
+                lines.append(f'fleet_http_request_duration_seconds_sum{{{labels}}} {metrics["duration"]:.6f}')
+                lines.append(f'fleet_http_request_duration_seconds_count{{{labels}}} {metrics["count"]}')
+            
+            for name, field, help_text, fmt in (
+                ('fleet_sql_statements_total', 'sql_count', 'SQL statements executed while handling requests', '{}'),
+                ('fleet_sql_duration_seconds_total', 'sql_time', 'Time spent in SQL statements', '{:.6f}'),
+                ('fleet_serialization_duration_seconds_total', 'serialization_time', 'Time spent encoding JSON', '{:.6f}'),
+            ):
+                family(name, 'counter', help_text)
+                for (endpoint, method), metrics in items:
+                    lines.append(f'{name}{{endpoint="{endpoint}",method="{method}"}} {fmt.format(metrics[field])}')
+            
+            family('fleet_n_plus_one_suspects_total', 'counter', 'Statements repeated within one request (possible N+1)')
+            for endpoint, count in n_plus_one:
+                lines.append(f'fleet_n_plus_one_suspects_total{{endpoint="{endpoint}"}} {count}')
+        
+        return '\n'.join(lines) + '\n'
+    
+    def _metrics_allowed(self, address):
+        try:
+            address = ipaddress.ip_address(address or '')
+        except ValueError:
+            return False
+        return any(address in network for network in self.metrics_allow)
+    
+    def metrics_view(self):
+        # Метрики раскрывают маршруты, время и SQL-нагрузку - только для доверенных адресов
+        if not self._metrics_allowed(request.remote_addr):
+            return jsonify({'error': 'Access denied'}), 403
+        return Response(self.render_metrics(), mimetype='text/plain; version=0.0.4')
+    
+    def reset(self):
+        with self._lock:
+            self._metrics.clear()
+            self._n_plus_one.clear()
+
+def _current_profile():
+    return g.get('request_profile') if has_app_context() else None
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile()
+    if profile is not None:
+        profile._sql_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile()
+    if profile is None or profile._sql_started is None:
+        return
+    profile.sql_time += time.perf_counter() - profile._sql_started
+    profile._sql_started = None
+    profile.sql_count += 1
+    profile.statements[statement] += 1
@@ -0,0 +1,145 @@
+import threading
+from datetime import datetime, date
+from flask import current_app
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Vehicle, User, UserRole, MaintenanceReminderState
+from app.utils import predict_next_maintenance_batch, maintenance_status_from_prediction, chunks
+from app.email_utils import build_maintenance_notification
+from app.notifications import enqueue_emails
+
+def _claim_transition(vehicle_id, previous_status, status, predicted_date, now):
+    """
+    Фиксация смены статуса ТС. Условный UPDATE (или INSERT для нового ТС) гарантирует,
+    что при повторном или параллельном запуске напоминание не будет отправлено дважды
+    """
+    if previous_status is None:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(MaintenanceReminderState).values(
+                    vehicle_id=vehicle_id, status=status, predicted_date=predicted_date,
+                    notified_at=now, updated_at=now
+                ))
+        except IntegrityError:
+            return False
+        return True
+    
+    result = db.session.execute(
+        update(MaintenanceReminderState)
+        .where(MaintenanceReminderState.vehicle_id == vehicle_id,
+               MaintenanceReminderState.status == previous_status)
+        .values(status=status, predicted_date=predicted_date, notified_at=now, updated_at=now)
+    )
+    return result.rowcount == 1
+
+def _insert_states(rows):
+    """
+    Пакетная запись состояния новых ТС (без напоминаний). Параллельный запуск мог уже
+    записать состояние части из них - тогда строки вставляются по одной, как в
+    _claim_transition, а существующие пропускаются
+    """
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(MaintenanceReminderState), rows)
+    except IntegrityError:
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(MaintenanceReminderState).values(**row))
+            except IntegrityError:
+                pass
+
+def run_maintenance_reminders():
+    """
+    Пакетный расчет прогнозов ТО для всех активных ТС и постановка в очередь
+    уведомлений напоминаний для ТС, перешедших в статусы REMINDER_STATUSES
+    (warning, urgent). Одно напоминание на каждый переход: текущие статусы
+    сохраняются в MaintenanceReminderState, повторный запуск писем не дублирует.
+    Возвращает счетчики {'vehicles', 'transitions', 'reminders'}
+    """
+    reminder_statuses = set(current_app.config.get('REMINDER_STATUSES', ('warning', 'urgent')))
+    recipient_roles = [UserRole(role) for role in current_app.config.get('REMINDER_RECIPIENT_ROLES', ('admin', 'mechanic'))]
+    now = datetime.utcnow()
+    
+    vehicle_ids = [row.id for row in db.session.query(Vehicle.id).filter_by(status='active')]
+    predictions = predict_next_maintenance_batch(vehicle_ids)
+    states = dict(db.session.query(MaintenanceReminderState.vehicle_id, MaintenanceReminderState.status))
+    
+    new_states, changed_states, transitions = [], [], []
+    for vehicle_id, prediction in predictions.items():
+        status = maintenance_status_from_prediction(prediction)
+        previous_status = states.get(vehicle_id)
+        if previous_status == status:
+            continue
+        
+        predicted_date = date.fromisoformat(prediction['predicted_date'])
+        if status in reminder_statuses:
+            transitions.append((vehicle_id, previous_status, status, predicted_date, prediction))
+            continue
+        
+        row = {'vehicle_id': vehicle_id, 'status': status, 'predicted_date': predicted_date, 'updated_at': now}
+        if previous_status is None:
+            new_states.append(row)
+        else:
+            changed_states.append(row)
+    
+    # Смены статуса без напоминаний сохраняются пакетно
+    if new_states:
+        _insert_states(new_states)
+    if changed_states:
+        db.session.execute(update(MaintenanceReminderState), changed_states)
+    
+    claimed = {}
+    for vehicle_id, previous_status, status, predicted_date, prediction in transitions:
+        if _claim_transition(vehicle_id, previous_status, status, predicted_date, now):
+            claimed[vehicle_id] = prediction
+    
+    messages = []
+    if claimed:
+        recipients = [row.email for row in db.session.query(User.email).filter(
+            User.role.in_(recipient_roles), User.is_active.is_(True)
+        )]
+        for chunk in chunks(claimed):
+            for vehicle in Vehicle.query.filter(Vehicle.id.in_(chunk)):
+                prediction = claimed[vehicle.id]
+                subject, body_html, body_text = build_maintenance_notification(
+                    vehicle, prediction['predicted_date'], prediction['days_remaining']
+                )
+                messages.extend((email, subject, body_html, body_text) for email in recipients)
+        enqueue_emails(messages)
+    
+    # Состояние и письма фиксируются одной транзакцией
+    db.session.commit()
+    
+    return {'vehicles': len(predictions), 'transitions': len(claimed), 'reminders': len(messages)}
+
+def run_reminder_scheduler(app, stop_event, interval=None):
+    """
+    Цикл планировщика напоминаний о ТО
+    """
+    interval = interval or app.config.get('REMINDER_INTERVAL_SECONDS', 3600)
+    while not stop_event.is_set():
+        with app.app_context():
+            try:
+                counts = run_maintenance_reminders()
+                app.logger.info('Maintenance reminders: %s', counts)
+            except Exception:
+                app.logger.exception('Maintenance reminder job failed')
+                db.session.rollback()
+            finally:
+                db.session.remove()
+        stop_event.wait(interval)
+
+def start_reminder_scheduler(app):
+    """
+    Запуск планировщика напоминаний в фоновом потоке текущего процесса.
+    Возвращает событие, установка которого останавливает планировщик
+    """
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=run_reminder_scheduler, args=(app, stop_event),
+        name='maintenance-reminders', daemon=True
+    )
+    thread.start()
+    return stop_event
@@ -1,15 +1,35 @@
-from flask import Blueprint, request, jsonify, render_template
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
-from app import db
-from app.models import User, Vehicle, Maintenance, Repair, MileageLog, UserRole, VehicleType, MaintenanceType, RepairStatus
-from app.utils import validate_vin, predict_next_maintenance, get_maintenance_status, calculate_daily_mileage
-from app.email_utils import send_maintenance_notification, send_repair_notification
+from flask import Blueprint, Response, request, jsonify, render_template, stream_with_context, current_app, send_file
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt
+from app import db, prediction_cache, login_guard
+from app.models import User, Vehicle, Maintenance, Repair, MileageLog, NotificationOutbox, UserRole, VehicleType, MaintenanceType, RepairStatus, NotificationStatus
+from app.utils import validate_vin, get_prediction_summaries, update_mileage_stats, MileageRollupHistory
+from app.pagination import encode_cursor, decode_cursor, parse_limit, parse_fields, serialize_column, InvalidCursor, keyset_filter, keyset_order, paginated_list, fetch_keyset_page, serialize_rows
+from app.serialization import serialize_tuples
+from app.export_utils import stream_csv, stream_ndjson, export_to_excel_stream
+from app.email_utils import build_repair_notification
+from app.notifications import enqueue_email
+from app.ingest import ingest_mileage_readings, iter_ndjson
+from app.auth import roles_required
+from app.security import LoginBusy
+from app.versioning import versioned, PREDICTION_TABLES
+from app.analytics import fleet_report, AnalyticsUnavailable
 from datetime import datetime, date, timedelta
 import json
+import time
 
 api_bp = Blueprint('api', __name__)
 web_bp = Blueprint('web', __name__)
 
+def _parse_date_arg(name):
+    """Разбор параметра запроса с датой в формате YYYY-MM-DD"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'{name} must be a date in YYYY-MM-DD format')
+
 # ============ API Routes ============
 
 @api_bp.route('/auth/login', methods=['POST'])
@@ -22,10 +42,31 @@ def login():
     if not username or not password:
         return jsonify({'error': 'Username and password required'}), 400
     
+    retry_after = login_guard.rate_limited(username, request.remote_addr)
+    if retry_after:
+        return jsonify({'error': 'Too many login attempts'}), 429, {'Retry-After': str(retry_after)}
+    
     user = User.query.filter_by(username=username).first()
     
-    if not user or not user.check_password(password) or not user.is_active:
+    # Хэширование выполняется в ограниченном пуле, поток запроса только ждет результат.
+    # Для неизвестного имени пароль тоже хэшируется - время ответа не выдает существование учетной записи
+    try:
+        valid = login_guard.check_password(user.password_hash if user else None, password)
+    except LoginBusy:
+        return jsonify({'error': 'Login is temporarily overloaded, try again'}), 503, {'Retry-After': '1'}
+    
+    if not valid or not user.is_active:
+        login_guard.record_failure(username)
         return jsonify({'error': 'Invalid credentials'}), 401
+    login_guard.record_success(username)
+    
+    # Переход на текущий метод и стоимость хэширования
+    if login_guard.needs_rehash(user.password_hash):
+        try:
+            user.password_hash = login_guard.hash_password(password)
+            db.session.commit()
+        except LoginBusy:
+            pass
     
     access_token = create_access_token(
         identity=str(user.id),
@@ -38,15 +79,9 @@ def login():
     }), 200
 
 @api_bp.route('/auth/register', methods=['POST'])
-@jwt_required()
+@roles_required(UserRole.ADMIN)
 def register():
     """Регистрация нового пользователя (только для админов)"""
-    current_user_id = int(get_jwt_identity())
-    current_user = User.query.get(current_user_id)
-    
-    if current_user.role != UserRole.ADMIN:
-        return jsonify({'error': 'Admin access required'}), 403
-    
     data = request.get_json()
     username = data.get('username')
     email = data.get('email')
@@ -75,28 +110,23 @@ def register():
 # Vehicles API
 @api_bp.route('/vehicles', methods=['GET'])
 @jwt_required()
+@versioned('vehicles')
 def get_vehicles():
-    """Получение списка транспортных средств"""
-    vehicles = Vehicle.query.all()
-    return jsonify([v.to_dict() for v in vehicles]), 200
+    """Получение списка транспортных средств (limit, cursor, fields)"""
+    return paginated_list(Vehicle, Vehicle.query, (Vehicle.id,))
 
 @api_bp.route('/vehicles/<int:vehicle_id>', methods=['GET'])
 @jwt_required()
+@versioned('vehicles')
 def get_vehicle(vehicle_id):
     """Получение информации о транспортном средстве"""
     vehicle = Vehicle.query.get_or_404(vehicle_id)
     return jsonify(vehicle.to_dict()), 200
 
 @api_bp.route('/vehicles', methods=['POST'])
-@jwt_required()
+@roles_required(UserRole.ADMIN, UserRole.MECHANIC)
 def create_vehicle():
     """Создание нового транспортного средства"""
-    current_user_id = int(get_jwt_identity())
-    current_user = User.query.get(current_user_id)
-    
-    if current_user.role not in [UserRole.ADMIN, UserRole.MECHANIC]:
-        return jsonify({'error': 'Access denied'}), 403
-    
     data = request.get_json()
     
     if not validate_vin(data.get('vin')):
@@ -126,15 +156,9 @@ def create_vehicle():
     return jsonify({'message': 'Vehicle created', 'vehicle': vehicle.to_dict()}), 201
 
 @api_bp.route('/vehicles/<int:vehicle_id>', methods=['PUT'])
-@jwt_required()
+@roles_required(UserRole.ADMIN, UserRole.MECHANIC)
 def update_vehicle(vehicle_id):
     """Обновление транспортного средства"""
-    current_user_id = int(get_jwt_identity())
-    current_user = User.query.get(current_user_id)
-    
-    if current_user.role not in [UserRole.ADMIN, UserRole.MECHANIC]:
-        return jsonify({'error': 'Access denied'}), 403
-    
     vehicle = Vehicle.query.get_or_404(vehicle_id)
     data = request.get_json()
     
@@ -159,43 +183,33 @@ def update_vehicle(vehicle_id):
         vehicle.status = data['status']
     
     db.session.commit()
+    prediction_cache.invalidate(vehicle_id)
     return jsonify({'message': 'Vehicle updated', 'vehicle': vehicle.to_dict()}), 200
 
 @api_bp.route('/vehicles/<int:vehicle_id>', methods=['DELETE'])
-@jwt_required()
+@roles_required(UserRole.ADMIN)
 def delete_vehicle(vehicle_id):
     """Удаление транспортного средства"""
-    current_user_id = int(get_jwt_identity())
-    current_user = User.query.get(current_user_id)
-    
-    if current_user.role != UserRole.ADMIN:
-        return jsonify({'error': 'Admin access required'}), 403
-    
     vehicle = Vehicle.query.get_or_404(vehicle_id)
     db.session.delete(vehicle)
     db.session.commit()
+    prediction_cache.invalidate(vehicle_id)
     
     return jsonify({'message': 'Vehicle deleted'}), 200
 
 # Maintenance API
 @api_bp.route('/vehicles/<int:vehicle_id>/maintenance', methods=['GET'])
 @jwt_required()
+@versioned('maintenance')
 def get_maintenance(vehicle_id):
-    """Получение истории ТО для транспортного средства"""
-    maintenance = Maintenance.query.filter_by(vehicle_id=vehicle_id)\
-        .order_by(Maintenance.date.desc()).all()
-    return jsonify([m.to_dict() for m in maintenance]), 200
+    """Получение истории ТО для транспортного средства (limit, cursor, fields)"""
+    query = Maintenance.query.filter_by(vehicle_id=vehicle_id)
+    return paginated_list(Maintenance, query, (Maintenance.date, Maintenance.id), descending=True, stream=True)
 
 @api_bp.route('/maintenance', methods=['POST'])
-@jwt_required()
+@roles_required(UserRole.ADMIN, UserRole.MECHANIC)
 def create_maintenance():
     """Создание записи о ТО"""
-    current_user_id = int(get_jwt_identity())
-    current_user = User.query.get(current_user_id)
-    
-    if current_user.role not in [UserRole.ADMIN, UserRole.MECHANIC]:
-        return jsonify({'error': 'Access denied'}), 403
-    
     data = request.get_json()
     vehicle = Vehicle.query.get_or_404(data['vehicle_id'])
     
@@ -215,19 +229,14 @@ def create_maintenance():
     
     db.session.add(maintenance)
     db.session.commit()
+    prediction_cache.invalidate(maintenance.vehicle_id)
     
     return jsonify({'message': 'Maintenance created', 'maintenance': maintenance.to_dict()}), 201
 
 @api_bp.route('/maintenance/<int:maintenance_id>', methods=['PUT'])
-@jwt_required()
+@roles_required(UserRole.ADMIN, UserRole.MECHANIC)
 def update_maintenance(maintenance_id):
     """Обновление записи о ТО"""
-    current_user_id = int(get_jwt_identity())
-    current_user = User.query.get(current_user_id)
-    
-    if current_user.role not in [UserRole.ADMIN, UserRole.MECHANIC]:
-        return jsonify({'error': 'Access denied'}), 403
-    
     maintenance = Maintenance.query.get_or_404(maintenance_id)
     data = request.get_json()
     
@@ -249,38 +258,37 @@ def update_maintenance(maintenance_id):
         maintenance.next_maintenance_km = data.get('next_maintenance_km')
     
     db.session.commit()
+    prediction_cache.invalidate(maintenance.vehicle_id)
     return jsonify({'message': 'Maintenance updated', 'maintenance': maintenance.to_dict()}), 200
 
 @api_bp.route('/maintenance/<int:maintenance_id>', methods=['DELETE'])
-@jwt_required()
+@roles_required(UserRole.ADMIN, UserRole.MECHANIC)
 def delete_maintenance(maintenance_id):
     """Удаление записи о ТО"""
-    current_user_id = int(get_jwt_identity())
-    current_user = User.query.get(current_user_id)
-    
-    if current_user.role not in [UserRole.ADMIN, UserRole.MECHANIC]:
-        return jsonify({'error': 'Access denied'}), 403
-    
     maintenance = Maintenance.query.get_or_404(maintenance_id)
+    vehicle_id = maintenance.vehicle_id
     db.session.delete(maintenance)
     db.session.commit()
+    prediction_cache.invalidate(vehicle_id)
     
     return jsonify({'message': 'Maintenance deleted'}), 200
 
 @api_bp.route('/maintenance/upcoming', methods=['GET'])
 @jwt_required()
+@versioned(*PREDICTION_TABLES, daily=True)
 def get_upcoming_maintenance():
     """Получение предстоящих ТО"""
     vehicles = Vehicle.query.filter_by(status='active').all()
+    summaries = get_prediction_summaries([v.id for v in vehicles])
     upcoming = []
     
     for vehicle in vehicles:
-        prediction = predict_next_maintenance(vehicle.id)
-        if prediction:
+        summary = summaries.get(vehicle.id)
+        if summary:
             upcoming.append({
                 'vehicle': vehicle.to_dict(),
-                'prediction': prediction,
-                'status': get_maintenance_status(vehicle.id)
+                'prediction': summary['prediction'],
+                'status': summary['status']
             })
     
     # Сортируем по дате (predicted_date уже в формате ISO строки)
@@ -290,46 +298,84 @@ def get_upcoming_maintenance():
 
 @api_bp.route('/maintenance/all', methods=['GET'])
 @jwt_required()
+@versioned('maintenance', 'vehicles')
 def get_all_maintenance():
-    """Получение всех записей ТО с информацией о ТС"""
-    maintenance_records = Maintenance.query.order_by(Maintenance.date.desc()).all()
-    result = []
-    
-    for m in maintenance_records:
-        vehicle = Vehicle.query.get(m.vehicle_id)
-        if vehicle:
-            result.append({
-                'id': m.id,
-                'vehicle': vehicle.to_dict(),
-                'type': m.type.value,
-                'date': m.date.isoformat() if m.date else None,
-                'mileage': m.mileage,
-                'cost': float(m.cost) if m.cost else 0,
-                'description': m.description,
-                'next_maintenance_km': m.next_maintenance_km
-            })
+    """
+    Получение записей ТО с информацией о ТС (постранично, по курсору на (date, id)).
+    Фильтры: vehicle_id, type, date_from, date_to; параметры страницы: limit, cursor.
+    Данные ТС возвращаются один раз в словаре vehicles, записи ссылаются на них по vehicle_id
+    """
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        vehicle_id = request.args.get('vehicle_id', type=int)
+        maintenance_type = request.args.get('type')
+        if maintenance_type:
+            maintenance_type = MaintenanceType[maintenance_type.upper()]
+        date_from = _parse_date_arg('date_from')
+        date_to = _parse_date_arg('date_to')
+        cursor = request.args.get('cursor')
+        if cursor:
+            cursor_values = decode_cursor(cursor, (date, int))
+    except KeyError:
+        return jsonify({'error': 'Invalid maintenance type'}), 400
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Колонки записей ТО и ТС одной строкой-кортежем, без загрузки объектов моделей
+    maintenance_columns = [getattr(Maintenance, f) for f in Maintenance.API_FIELDS]
+    vehicle_columns = [getattr(Vehicle, f).label(f'v_{f}') for f in Vehicle.API_FIELDS]
+    query = db.session.query(*maintenance_columns, *vehicle_columns)\
+        .join(Vehicle, Maintenance.vehicle_id == Vehicle.id)
+    
+    if vehicle_id:
+        query = query.filter(Maintenance.vehicle_id == vehicle_id)
+    if maintenance_type:
+        query = query.filter(Maintenance.type == maintenance_type)
+    if date_from:
+        query = query.filter(Maintenance.date >= date_from)
+    if date_to:
+        query = query.filter(Maintenance.date <= date_to)
+    keys = (Maintenance.date, Maintenance.id)
+    if cursor:
+        query = query.filter(keyset_filter(keys, cursor_values, descending=True))
+    
+    rows = query.order_by(*keyset_order(keys, descending=True))\
+        .limit(limit + 1).all()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    items = serialize_tuples(maintenance_columns, rows, Maintenance.API_FIELDS)
+    offset = len(maintenance_columns)
+    vehicle_rows = list(dict.fromkeys(tuple(row[offset:]) for row in rows))
+    vehicles = serialize_tuples(vehicle_columns, vehicle_rows, Vehicle.API_FIELDS)
+    
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor((last.date, last.id))
     
-    return jsonify(result), 200
+    return jsonify({
+        'items': items,
+        'vehicles': {str(v['id']): v for v in vehicles},
+        'next_cursor': next_cursor
+    }), 200
 
 # Repairs API
 @api_bp.route('/vehicles/<int:vehicle_id>/repairs', methods=['GET'])
 @jwt_required()
+@versioned('repairs')
 def get_repairs(vehicle_id):
-    """Получение истории ремонтов"""
-    repairs = Repair.query.filter_by(vehicle_id=vehicle_id)\
-        .order_by(Repair.start_date.desc()).all()
-    return jsonify([r.to_dict() for r in repairs]), 200
+    """Получение истории ремонтов (limit, cursor, fields)"""
+    query = Repair.query.filter_by(vehicle_id=vehicle_id)
+    return paginated_list(Repair, query, (Repair.start_date, Repair.id), descending=True, stream=True)
 
 @api_bp.route('/repairs', methods=['POST'])
-@jwt_required()
+@roles_required(UserRole.ADMIN, UserRole.MECHANIC)
 def create_repair():
     """Создание записи о ремонте"""
-    current_user_id = int(get_jwt_identity())
-    current_user = User.query.get(current_user_id)
-    
-    if current_user.role not in [UserRole.ADMIN, UserRole.MECHANIC]:
-        return jsonify({'error': 'Access denied'}), 403
-    
     data = request.get_json()
     vehicle = Vehicle.query.get_or_404(data['vehicle_id'])
     
@@ -346,12 +392,15 @@ def create_repair():
         vehicle.status = 'repair'
     
     db.session.add(repair)
-    db.session.commit()
+    db.session.flush()
     
-    # Отправка уведомления
+    # Уведомления ставятся в очередь в той же транзакции и отправляются фоновым обработчиком
+    subject, body_html, body_text = build_repair_notification(vehicle, repair)
     admin_users = User.query.filter_by(role=UserRole.ADMIN).all()
     for admin in admin_users:
-        send_repair_notification(admin.email, vehicle, repair)
+        enqueue_email(admin.email, subject, body_html, body_text)
+    
+    db.session.commit()
     
     return jsonify({'message': 'Repair created', 'repair': repair.to_dict()}), 201
 
@@ -376,36 +425,302 @@ def log_mileage(vehicle_id):
         vehicle.current_mileage = data['mileage']
     
     db.session.add(mileage_log)
+    update_mileage_stats(mileage_log)
     db.session.commit()
+    prediction_cache.invalidate(vehicle_id)
     
     return jsonify({'message': 'Mileage logged', 'log': mileage_log.to_dict()}), 201
 
+@api_bp.route('/mileage/bulk', methods=['POST'])
+@jwt_required()
+def log_mileage_bulk():
+    """
+    Пакетная загрузка показаний пробега от телематики: JSON-массив
+    (или {"readings": [...]}) либо поток NDJSON (Content-Type: application/x-ndjson).
+    Некорректные показания отклоняются построчно, остальные сохраняются
+    """
+    if request.mimetype == 'application/x-ndjson':
+        items = iter_ndjson(request.stream)
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            data = data.get('readings')
+        if not isinstance(data, list):
+            return jsonify({'error': 'Expected a JSON array of readings or NDJSON stream'}), 400
+        items = enumerate(data)
+    
+    result = ingest_mileage_readings(items)
+    
+    return jsonify(result), 200
+
 @api_bp.route('/vehicles/<int:vehicle_id>/mileage', methods=['GET'])
 @jwt_required()
+@versioned('mileage_logs', 'mileage_rollups')
 def get_mileage_logs(vehicle_id):
-    """Получение журнала пробега"""
-    logs = MileageLog.query.filter_by(vehicle_id=vehicle_id)\
-        .order_by(MileageLog.date.desc()).all()
-    return jsonify([l.to_dict() for l in logs]), 200
+    """
+    Получение журнала пробега (limit, cursor, fields).
+    Старые периоды возвращаются сводками (последнее показание дня или месяца, отрицательный id)
+    """
+    query = MileageLog.query.filter_by(vehicle_id=vehicle_id)
+    # Сводки старше исходных записей и уникальны по дате, поэтому читаются следующим уровнем
+    rollups = db.session.query(MileageRollupHistory).filter(MileageRollupHistory.vehicle_id == vehicle_id)
+    return paginated_list(
+        MileageLog, query, (MileageLog.date, MileageLog.id), descending=True,
+        tiers=[(MileageRollupHistory, rollups, (MileageRollupHistory.date,))], stream=True
+    )
 
 # Predictions API
 @api_bp.route('/vehicles/<int:vehicle_id>/prediction', methods=['GET'])
 @jwt_required()
+@versioned(*PREDICTION_TABLES, daily=True)
 def get_prediction(vehicle_id):
     """Получение прогноза следующего ТО"""
-    prediction = predict_next_maintenance(vehicle_id)
-    if not prediction:
+    summary = get_prediction_summaries([vehicle_id]).get(vehicle_id)
+    if not summary:
         return jsonify({'error': 'Vehicle not found'}), 404
     
-    vehicle = Vehicle.query.get(vehicle_id)
-    daily_mileage = calculate_daily_mileage(vehicle_id)
+    return jsonify(summary), 200
+
+# Dashboard API
+@api_bp.route('/fleet/dashboard', methods=['GET'])
+@jwt_required()
+@versioned(*PREDICTION_TABLES, daily=True)
+def get_fleet_dashboard():
+    """
+    Прогнозы ТО, среднесуточный пробег и статус ТО всего парка одним ответом
+    (фильтр status по статусу ТС, по умолчанию active; all - все ТС).
+    Прогнозы рассчитываются пакетно, записи отсортированы по дате прогноза
+    """
+    query = Vehicle.query
+    status = request.args.get('status', 'active')
+    if status != 'all':
+        query = query.filter_by(status=status)
+    fields = Vehicle.API_FIELDS
+    rows = query.with_entities(*[getattr(Vehicle, f) for f in fields]).order_by(Vehicle.id).all()
+    vehicles = serialize_rows(Vehicle, rows, fields)
+    summaries = get_prediction_summaries([v['id'] for v in vehicles])
+    
+    items = []
+    counts = {}
+    for vehicle in vehicles:
+        summary = summaries.get(vehicle['id'])
+        if not summary:
+            continue
+        counts[summary['status']] = counts.get(summary['status'], 0) + 1
+        items.append({'vehicle': vehicle, **summary})
+    
+    # ТС без прогноза - в конце списка
+    items.sort(key=lambda x: (x['prediction'] is None, x['prediction']['predicted_date'] if x['prediction'] else ''))
     
+    return jsonify({'vehicles': items, 'counts': counts, 'total': len(items)}), 200
+
+@api_bp.route('/vehicles/<int:vehicle_id>/bundle', methods=['GET'])
+@jwt_required()
+@versioned(*PREDICTION_TABLES, 'repairs', daily=True)
+def get_vehicle_bundle(vehicle_id):
+    """
+    Данные страницы ТС одним ответом: ТС, последние записи ТО и ремонтов (limit,
+    по умолчанию 100), журнал пробега (дата и пробег, mileage_limit, по умолчанию 30)
+    и прогноз. Если записей больше, в cursors передаются курсоры для продолжения
+    через списочные эндпоинты
+    """
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        mileage_limit = parse_limit(request.args.get('mileage_limit'), default=30)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    vehicle = Vehicle.query.get_or_404(vehicle_id)
+    maintenance, maintenance_cursor = fetch_keyset_page(
+        Maintenance, Maintenance.query.filter_by(vehicle_id=vehicle_id),
+        (Maintenance.date, Maintenance.id), limit, descending=True, fields=Maintenance.API_FIELDS
+    )
+    repairs, repairs_cursor = fetch_keyset_page(
+        Repair, Repair.query.filter_by(vehicle_id=vehicle_id), (Repair.start_date, Repair.id), limit,
+        descending=True, fields=Repair.API_FIELDS
+    )
+    mileage_fields = ['date', 'mileage']
+    rollups = db.session.query(MileageRollupHistory).filter(MileageRollupHistory.vehicle_id == vehicle_id)
+    mileage, mileage_cursor = fetch_keyset_page(
+        MileageLog, MileageLog.query.filter_by(vehicle_id=vehicle_id), (MileageLog.date, MileageLog.id),
+        mileage_limit, descending=True, fields=mileage_fields,
+        tiers=[(MileageRollupHistory, rollups, (MileageRollupHistory.date,))]
+    )
+    
+    cursors = {
+        name: cursor
+        for name, cursor in (('maintenance', maintenance_cursor), ('repairs', repairs_cursor), ('mileage', mileage_cursor))
+        if cursor
+    }
     return jsonify({
-        'prediction': prediction,
-        'daily_mileage': round(daily_mileage, 2),
-        'status': get_maintenance_status(vehicle_id)
+        'vehicle': vehicle.to_dict(),
+        'maintenance': serialize_rows(Maintenance, maintenance, Maintenance.API_FIELDS),
+        'repairs': serialize_rows(Repair, repairs, Repair.API_FIELDS),
+        'mileage': serialize_rows(MileageLog, mileage, mileage_fields),
+        'prediction': get_prediction_summaries([vehicle_id]).get(vehicle_id),
+        'cursors': cursors
     }), 200
 
+# Reports API
+# Период отчета по умолчанию (дней, включая date_to)
+REPORT_DEFAULT_DAYS = 365
+
+@api_bp.route('/reports/fleet', methods=['GET'])
+@jwt_required()
+@versioned('vehicles', 'maintenance', 'repairs', 'mileage_logs', 'mileage_rollups', daily=True)
+def get_fleet_report():
+    """
+    Отчет по затратам и использованию парка за период date_from..date_to
+    (по умолчанию последние 365 дней): по ТС, по типам ТС (фильтр vehicle_type),
+    помесячные расходы и итоги. Расчет векторный (NumPy), см. app.analytics
+    """
+    try:
+        date_to = _parse_date_arg('date_to') or date.today()
+        date_from = _parse_date_arg('date_from') or date_to - timedelta(days=REPORT_DEFAULT_DAYS - 1)
+        vehicle_type = request.args.get('vehicle_type')
+        if vehicle_type:
+            vehicle_type = VehicleType[vehicle_type.upper()]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except KeyError:
+        return jsonify({'error': 'Invalid vehicle type'}), 400
+    if date_from > date_to:
+        return jsonify({'error': 'date_from must not be later than date_to'}), 400
+    
+    try:
+        report = fleet_report(date_from, date_to, vehicle_type or None)
+    except AnalyticsUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+    return jsonify(report), 200
+
+# Notifications API
+@api_bp.route('/notifications/outbox', methods=['GET'])
+@roles_required(UserRole.ADMIN)
+@versioned('notification_outbox')
+def get_notification_outbox():
+    """Статус доставки уведомлений (только для админов; фильтр status, limit, cursor, fields)"""
+    query = NotificationOutbox.query
+    if request.args.get('status'):
+        try:
+            query = query.filter_by(status=NotificationStatus[request.args['status'].upper()])
+        except KeyError:
+            return jsonify({'error': 'Invalid status'}), 400
+    return paginated_list(NotificationOutbox, query, (NotificationOutbox.id,), descending=True, default_limit=100)
+
+# Export API
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', stream_csv),
+    'ndjson': ('application/x-ndjson', stream_ndjson)
+}
+
+def _export_query(entity):
+    """
+    Запрос для выгрузки с фильтрами из параметров запроса.
+    Возвращает (модель, запрос, ключ сортировки, по убыванию) или None для неизвестной сущности
+    """
+    vehicle_id = request.args.get('vehicle_id', type=int)
+    date_from = _parse_date_arg('date_from')
+    date_to = _parse_date_arg('date_to')
+    
+    if entity == 'vehicles':
+        query = Vehicle.query
+        if request.args.get('status'):
+            query = query.filter(Vehicle.status == request.args['status'])
+        if request.args.get('vehicle_type'):
+            query = query.filter(Vehicle.vehicle_type == VehicleType[request.args['vehicle_type'].upper()])
+        return Vehicle, query, (Vehicle.id,), False
+    
+    if entity == 'maintenance':
+        model, date_column = Maintenance, Maintenance.date
+        query = Maintenance.query
+        if request.args.get('type'):
+            query = query.filter(Maintenance.type == MaintenanceType[request.args['type'].upper()])
+    elif entity == 'repairs':
+        model, date_column = Repair, Repair.start_date
+        query = Repair.query
+        if request.args.get('status'):
+            query = query.filter(Repair.status == RepairStatus[request.args['status'].upper()])
+    elif entity == 'mileage':
+        model, date_column = MileageLog, MileageLog.date
+        query = MileageLog.query
+    else:
+        return None
+    
+    if vehicle_id:
+        query = query.filter(model.vehicle_id == vehicle_id)
+    if date_from:
+        query = query.filter(date_column >= date_from)
+    if date_to:
+        query = query.filter(date_column <= date_to)
+    return model, query, (date_column, model.id), True
+
+@api_bp.route('/export/<entity>', methods=['GET'])
+@jwt_required()
+def export_data(entity):
+    """
+    Потоковая выгрузка ТС, ТО, ремонтов или журнала пробега в CSV/NDJSON/XLSX.
+    Строки читаются с сервера порциями (yield_per) и сразу отдаются клиенту
+    (XLSX собирается в write-only книге и отдается после записи файла).
+    Параметры: format (csv, ndjson, xlsx), fields и фильтры vehicle_id, type, status,
+    vehicle_type, date_from, date_to
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS and export_format != 'xlsx':
+        return jsonify({'error': 'Unsupported format'}), 400
+    
+    try:
+        export = _export_query(entity)
+        if export is None:
+            return jsonify({'error': 'Unknown export entity'}), 404
+        model, query, keys, descending = export
+        fields = parse_fields(request.args.get('fields'), model.API_FIELDS) or list(model.API_FIELDS)
+    except KeyError:
+        return jsonify({'error': 'Invalid filter value'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    columns = [getattr(model, f) for f in fields]
+    rows = query.with_entities(*columns)\
+        .order_by(*keyset_order(keys, descending))\
+        .yield_per(1000)
+    filename = f'{entity}_{date.today().isoformat()}.{export_format}'
+    
+    if export_format == 'xlsx':
+        started = time.perf_counter()
+        output = export_to_excel_stream(rows, fields, entity)
+        current_app.logger.info('Export %s (xlsx): built in %.2fs', entity, time.perf_counter() - started)
+        return send_file(
+            output,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=filename
+        )
+    
+    mimetype, writer = EXPORT_FORMATS[export_format]
+    
+    def generate():
+        started = time.perf_counter()
+        count = 0
+        
+        def values():
+            nonlocal count
+            for row in rows:
+                count += 1
+                yield tuple(serialize_column(column, value) for column, value in zip(columns, row))
+        
+        yield from writer(values(), fields)
+        
+        elapsed = time.perf_counter() - started
+        current_app.logger.info(
+            'Export %s (%s): %d rows in %.2fs, %.0f rows/s',
+            entity, export_format, count, elapsed, count / elapsed if elapsed else 0
+        )
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
 
 # ============ Web Routes ============
 
@@ -443,4 +758,3 @@ def notifications():
 def login_page():
     """Страница входа"""
     return render_template('login.html')
-
@@ -0,0 +1,81 @@
+from sqlalchemy import MetaData, inspect, text
+from app import db
+
+# Индексы прежних версий, замененные составными индексами моделей
+LEGACY_INDEXES = {
+    'maintenance': ('ix_maintenance_vehicle_id', 'ix_maintenance_date'),
+    'repairs': ('ix_repairs_vehicle_id', 'ix_repairs_start_date'),
+    'mileage_logs': ('ix_mileage_logs_vehicle_id', 'ix_mileage_logs_date', 'ix_mileage_logs_date_id'),
+}
+
+def _table_partitions(connection, table_name):
+    """Секции секционированной таблицы PostgreSQL или None для обычной таблицы"""
+    relkind = connection.execute(text(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"
+    ), {'name': table_name}).scalar()
+    if relkind != 'p':
+        return None
+    return connection.execute(text(
+        'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+        'WHERE i.inhparent = to_regclass(:name) ORDER BY c.relname'
+    ), {'name': table_name}).scalars().all()
+
+def _partition_index(index, partition):
+    """Копия индекса модели для секции (имя секции - префикс имени индекса)"""
+    table = index.table.to_metadata(MetaData(), name=partition)
+    copy = next(i for i in table.indexes if i.name == index.name)
+    copy.name = f'{partition}_{index.name}'
+    return copy
+
+def _create_index_concurrently(connection, index):
+    index.dialect_options['postgresql']['concurrently'] = True
+    try:
+        index.create(connection, checkfirst=True)
+    finally:
+        index.dialect_options['postgresql']['concurrently'] = False
+
+def upgrade_indexes(drop_legacy=True):
+    """
+    Приведение индексов существующей БД к объявленным в моделях: db.create_all
+    создает индексы только вместе с новыми таблицами. Недостающие индексы создаются
+    (в PostgreSQL - CREATE INDEX CONCURRENTLY, без блокировки записи), замененные
+    индексы удаляются. Для секционированной таблицы (flask partition-mileage-logs)
+    CONCURRENTLY недопустим: индекс строится отдельно в каждой секции, затем обычный
+    CREATE INDEX на таблице только присоединяет их (запись блокируется ненадолго);
+    замененные индексы удаляются обычным DROP INDEX. Возвращает (созданные,
+    удаленные) имена индексов
+    """
+    engine = db.engine
+    postgresql = engine.dialect.name == 'postgresql'
+    inspector = inspect(engine)
+    created, dropped = [], []
+    
+    # CONCURRENTLY недопустим внутри транзакции
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+            partitions = _table_partitions(connection, table.name) if postgresql else None
+            
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                if partitions is not None:
+                    for partition in partitions:
+                        _create_index_concurrently(connection, _partition_index(index, partition))
+                    index.create(connection)
+                elif postgresql:
+                    _create_index_concurrently(connection, index)
+                else:
+                    index.create(connection)
+                created.append(index.name)
+            
+            if drop_legacy:
+                for name in LEGACY_INDEXES.get(table.name, ()):
+                    if name in existing:
+                        concurrently = ' CONCURRENTLY' if postgresql and partitions is None else ''
+                        connection.execute(text(f'DROP INDEX{concurrently} IF EXISTS {name}'))
+                        dropped.append(name)
+    
+    return created, dropped
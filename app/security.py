@@ -0,0 +1,154 @@
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_PASSWORD_HASH_METHOD = 'pbkdf2:sha256:600000'
+
+class LoginBusy(Exception):
+    """Пул проверки паролей перегружен"""
+
+def hash_method(password_hash):
+    """Метод с параметрами из строки хэша werkzeug ('pbkdf2:sha256:600000', 'scrypt:32768:8:1')"""
+    return password_hash.split('$', 1)[0]
+
+class RateLimiter:
+    """
+    Скользящее окно: не более limit событий по ключу за window секунд.
+    Счетчики внутрипроцессные
+    """
+    
+    def __init__(self, limit, window, max_keys=100000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._events = {}
+        self._lock = threading.Lock()
+    
+    def _prune(self, events, now):
+        while events and events[0] <= now - self.window:
+            events.popleft()
+    
+    def retry_after(self, key):
+        """Секунды до снятия ограничения или 0, если событие допустимо"""
+        if not self.limit:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            events = self._events.get(key)
+            if not events:
+                return 0
+            self._prune(events, now)
+            if len(events) < self.limit:
+                return 0
+            return max(1, int(events[0] + self.window - now) + 1)
+    
+    def hit(self, key):
+        if not self.limit:
+            return
+        now = time.monotonic()
+        with self._lock:
+            events = self._events.get(key)
+            if events is None:
+                if len(self._events) >= self.max_keys:
+                    self._evict(now)
+                events = self._events[key] = deque()
+            self._prune(events, now)
+            events.append(now)
+    
+    def reset(self, key):
+        with self._lock:
+            self._events.pop(key, None)
+    
+    def _evict(self, now):
+        for key in [k for k, events in self._events.items() if not events or events[-1] <= now - self.window]:
+            del self._events[key]
+        # Все ключи активны - освобождаем место за счет самых старых
+        while len(self._events) >= self.max_keys:
+            self._events.pop(next(iter(self._events)))
+
+class LoginGuard:
+    """
+    Проверка паролей при входе: хэширование выполняется в ограниченном пуле
+    потоков (LOGIN_HASH_WORKERS), не больше LOGIN_HASH_MAX_PENDING запросов ждут
+    очереди - остальные сразу получают LoginBusy, а не занимают потоки сервера.
+    Ограничение частоты: неудачные попытки по имени пользователя и все попытки с
+    одного IP за LOGIN_RATE_LIMIT_WINDOW секунд. Хэши, созданные другим методом
+    или стоимостью, чем PASSWORD_HASH_METHOD, пересчитываются при успешном входе
+    """
+    
+    def __init__(self, app=None):
+        self.method = DEFAULT_PASSWORD_HASH_METHOD
+        self.dummy_hash = None
+        self.executor = None
+        self.timeout = 10
+        self._slots = None
+        self.user_limiter = RateLimiter(10, 60)
+        self.ip_limiter = RateLimiter(50, 60)
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        # Хэш случайного пароля текущим методом: с ним сверяется пароль неизвестного
+        # пользователя, чтобы ответ занимал столько же времени, как для существующего
+        method = app.config.get('PASSWORD_HASH_METHOD', DEFAULT_PASSWORD_HASH_METHOD)
+        self.dummy_hash = generate_password_hash(secrets.token_urlsafe(16), method)
+        # Метод в форме, которую werkzeug записывает в хэш ('scrypt' -> 'scrypt:32768:8:1'),
+        # иначе needs_rehash срабатывал бы при каждом входе
+        self.method = hash_method(self.dummy_hash)
+        workers = app.config.get('LOGIN_HASH_WORKERS', 2)
+        self.timeout = app.config.get('LOGIN_HASH_TIMEOUT', 10)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        # 0 - проверка в потоке запроса
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash') if workers else None
+        self._slots = threading.BoundedSemaphore(workers + app.config.get('LOGIN_HASH_MAX_PENDING', 16)) if workers else None
+        
+        window = app.config.get('LOGIN_RATE_LIMIT_WINDOW', 60)
+        self.user_limiter = RateLimiter(app.config.get('LOGIN_RATE_LIMIT_USER_FAILURES', 10), window)
+        self.ip_limiter = RateLimiter(app.config.get('LOGIN_RATE_LIMIT_IP_ATTEMPTS', 50), window)
+        app.extensions['login_guard'] = self
+    
+    def _run(self, func, *args):
+        if self.executor is None:
+            return func(*args)
+        if not self._slots.acquire(blocking=False):
+            raise LoginBusy()
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise LoginBusy()
+    
+    def check_password(self, password_hash, password):
+        """Проверка пароля; без хэша (пользователь не найден) - сверка с dummy_hash, всегда False"""
+        if password_hash is None:
+            self._run(check_password_hash, self.dummy_hash, password)
+            return False
+        return self._run(check_password_hash, password_hash, password)
+    
+    def hash_password(self, password):
+        return self._run(generate_password_hash, password, self.method)
+    
+    def needs_rehash(self, password_hash):
+        return hash_method(password_hash) != self.method
+    
+    def rate_limited(self, username, ip):
+        """Секунды до следующей допустимой попытки или 0; попытка с IP учитывается"""
+        retry_after = max(self.user_limiter.retry_after(username), self.ip_limiter.retry_after(ip))
+        if not retry_after:
+            self.ip_limiter.hit(ip)
+        return retry_after
+    
+    def record_failure(self, username):
+        self.user_limiter.hit(username)
+    
+    def record_success(self, username):
+        self.user_limiter.reset(username)
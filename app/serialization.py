@@ -0,0 +1,110 @@
+from operator import itemgetter, methodcaller
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import Date, DateTime, Enum, Numeric
+
+try:
+    import orjson
+except ImportError:  # Необязательная зависимость: без нее ответы кодирует стандартный json
+    orjson = None
+
+_COMPACT_SEPARATORS = (',', ':')
+
+def _nullable(column):
+    prop = getattr(column, 'property', None)
+    if prop is not None and getattr(prop, 'columns', None):
+        return prop.columns[0].nullable
+    return getattr(column, 'nullable', True)
+
+def column_converter(column):
+    """
+    Функция преобразования значения колонки к JSON-виду (как serialize_column
+    и методы to_dict()) или None, если значение передается как есть
+    """
+    column_type = column.type
+    nullable = _nullable(column)
+    if isinstance(column_type, Enum) and column_type.enum_class is not None:
+        values = {member: member.value for member in column_type.enum_class}
+        values[None] = None
+        return values.__getitem__
+    if isinstance(column_type, (Date, DateTime)):
+        isoformat = methodcaller('isoformat')
+        if not nullable:
+            return isoformat
+        return lambda value: isoformat(value) if value else None
+    if isinstance(column_type, Numeric):
+        return lambda value: float(value) if value else 0
+    return None
+
+def serialize_tuples(columns, rows, names=None):
+    """
+    Строки-кортежи (первые len(columns) значений строки) в виде словарей.
+    Значения преобразуются по колонкам: один конвертер на колонку применяется
+    ко всем строкам через map, без атрибутного доступа и проверки типа на каждое значение
+    """
+    names = list(names or [column.key for column in columns])
+    values = []
+    for i, column in enumerate(columns):
+        column_values = map(itemgetter(i), rows)
+        convert = column_converter(column)
+        values.append(column_values if convert is None else map(convert, column_values))
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON-провайдер Flask на orjson. Компактные ответы (jsonify вне режима отладки)
+    кодируются orjson с теми же правилами, что и у DefaultJSONProvider: сортировка
+    ключей, даты и Decimal через default провайдера. Прочие вызовы dumps (отступы,
+    другие разделители) и значения, которые orjson не кодирует (например, целые
+    больше 64 бит), - стандартным json.
+    orjson не экранирует не-ASCII символы, поэтому провайдер выбирается только без
+    ensure_ascii (json_provider_class); при включенном ensure_ascii все ответы кодирует
+    стандартный json. Отличие от стандартного json только в записи вещественных чисел
+    вне диапазона 1e-4..1e16 (0.000094 вместо 9.4e-05, 1e16 вместо 1e+16) - значения те же
+    """
+    ensure_ascii = False
+    
+    def dumps(self, obj, **kwargs):
+        if kwargs != {'separators': _COMPACT_SEPARATORS} or self.ensure_ascii:
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            text = orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+        return text
+
+def stream_json_array(chunks):
+    """
+    Потоковый JSON-массив: chunks - итератор списков элементов. Каждая порция
+    кодируется JSON-провайдером приложения в компактном виде (как jsonify) и
+    отдается сразу, первая - вместе с открывающей скобкой. Склеенное тело
+    совпадает с jsonify(все элементы) вне режима отладки
+    """
+    dumps = current_app.json.dumps
+    prefix = '['
+    for items in chunks:
+        if items:
+            yield prefix + dumps(items, separators=_COMPACT_SEPARATORS)[1:-1]
+            prefix = ','
+    yield ']\n' if prefix == ',' else '[]\n'
+
+def json_provider_class(backend='auto', ensure_ascii=None):
+    """
+    Класс JSON-провайдера по настройкам JSON_BACKEND и JSON_ENSURE_ASCII: auto - orjson,
+    если установлен и не требуется экранирование не-ASCII символов (ensure_ascii не True),
+    orjson - обязательно orjson, json - стандартный провайдер Flask
+    """
+    if backend == 'json':
+        return DefaultJSONProvider
+    if orjson is None:
+        if backend == 'orjson':
+            raise RuntimeError('JSON_BACKEND=orjson requires the orjson package')
+        return DefaultJSONProvider
+    if ensure_ascii:
+        if backend == 'orjson':
+            raise RuntimeError('JSON_BACKEND=orjson does not escape non-ASCII characters: set JSON_ENSURE_ASCII=false')
+        return DefaultJSONProvider
+    return OrjsonProvider
@@ -1,6 +1,9 @@
 from datetime import datetime, timedelta, date
-from app.models import Vehicle, Maintenance, MileageLog
-from app import db
+from collections import namedtuple
+from app.models import Vehicle, Maintenance, MileageLog, MileageRollup, MileageStats
+from app import db, prediction_cache
+from sqlalchemy import func, case, or_, insert, update, select, union_all, cast, null, String, Text
+from sqlalchemy.orm import aliased
 import re
 
 def validate_vin(vin):
@@ -14,43 +17,362 @@ def validate_vin(vin):
     pattern = r'^[A-HJ-NPR-Z0-9]{17}$'
     return bool(re.match(pattern, vin.upper()))
 
-def calculate_daily_mileage(vehicle_id):
+def _rollup_readings(date_column, mileage_column):
+    """Показания сводок MileageRollup в колонках MileageLog (отрицательный id)"""
+    return select(
+        (-MileageRollup.id).label('id'),
+        MileageRollup.vehicle_id,
+        date_column.label('date'),
+        mileage_column.label('mileage'),
+        cast(null(), String(200)).label('driver'),
+        cast(null(), Text).label('notes'),
+        MileageRollup.updated_at.label('created_at')
+    )
+
+def _mileage_readings_subquery():
     """
-    Расчет среднесуточного пробега на основе последних записей в журнале пробега
+    Все известные показания по уровням хранения: исходные записи журнала,
+    первое и последнее показание каждой сводки
     """
-    logs = MileageLog.query.filter_by(vehicle_id=vehicle_id)\
-        .order_by(MileageLog.date.desc()).limit(30).all()
-    
-    if len(logs) < 2:
+    raw = select(
+        MileageLog.id, MileageLog.vehicle_id, MileageLog.date, MileageLog.mileage,
+        MileageLog.driver, MileageLog.notes, MileageLog.created_at
+    )
+    return union_all(
+        raw,
+        _rollup_readings(MileageRollup.last_date, MileageRollup.last_mileage),
+        _rollup_readings(MileageRollup.first_date, MileageRollup.first_mileage)
+        .where(MileageRollup.first_date < MileageRollup.last_date)
+    ).subquery('mileage_readings')
+
+# Сущности с колонками MileageLog для чтения сводок вместе с журналом (только для чтения).
+# Исходные записи новее сводок, а даты показаний разных сводок не пересекаются,
+# поэтому порядок (date, id) сохраняется.
+# MileageRollupHistory - одна строка на сводку (последнее показание периода), уровень
+# журнала в API; MileageReadings - все показания (расчет среднесуточного пробега)
+MileageRollupHistory = aliased(
+    MileageLog, _rollup_readings(MileageRollup.last_date, MileageRollup.last_mileage).subquery('mileage_rollup_history'),
+    name='mileage_rollup_history', adapt_on_names=True
+)
+MileageReadings = aliased(MileageLog, _mileage_readings_subquery(), name='mileage_readings', adapt_on_names=True)
+
+# Размер окна журнала пробега для расчета среднесуточного пробега
+MILEAGE_WINDOW_SIZE = 30
+
+# Максимальное число ID в одном IN (...) при пакетных запросах
+BATCH_CHUNK_SIZE = 900
+
+def chunks(items, size=BATCH_CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+# Коэффициент сглаживания экспоненциально взвешенного среднесуточного пробега
+MILEAGE_EWMA_ALPHA = 0.2
+
+# Окно журнала пробега: крайние записи (старая/новая) и число записей
+MileageWindow = namedtuple('MileageWindow', 'first_date first_mileage last_date last_mileage count')
+
+def _daily_mileage_from_window(window):
+    """
+    Среднесуточный пробег по крайним записям окна
+    """
+    if window is None or window.count < 2:
         return 0
     
-    # Сортируем по дате (старые сначала)
-    logs_sorted = sorted(logs, key=lambda x: x.date)
-    
-    total_km = logs_sorted[-1].mileage - logs_sorted[0].mileage
-    total_days = (logs_sorted[-1].date - logs_sorted[0].date).days
+    total_km = window.last_mileage - window.first_mileage
+    total_days = (window.last_date - window.first_date).days
     
     if total_days == 0:
         return 0
     
     return total_km / total_days
 
-def predict_next_maintenance(vehicle_id):
+def _scan_mileage_windows(vehicle_ids, since=None):
     """
-    Прогнозирование даты следующего ТО на основе:
-    - Последнего ТО
-    - Текущего пробега
-    - Среднесуточного пробега
-    - Периодичности ТО (10000 км или 180 дней)
+    Расчет окна журнала пробега (последние MILEAGE_WINDOW_SIZE записей) по самому
+    журналу одним оконным запросом на каждую порцию ID. since ограничивает просмотр
+    записями не старше этой даты (окно должно целиком попадать в диапазон).
+    Возвращает {vehicle_id: MileageWindow}
+    """
+    windows = {}
+    
+    for chunk in chunks(vehicle_ids):
+        ranked = db.session.query(
+            MileageReadings.vehicle_id.label('vehicle_id'),
+            MileageReadings.date.label('date'),
+            MileageReadings.mileage.label('mileage'),
+            func.row_number().over(
+                partition_by=MileageReadings.vehicle_id,
+                order_by=(MileageReadings.date.desc(), MileageReadings.id.desc())
+            ).label('rn'),
+            func.count().over(partition_by=MileageReadings.vehicle_id).label('cnt')
+        ).filter(MileageReadings.vehicle_id.in_(chunk))
+        if since is not None:
+            ranked = ranked.filter(MileageReadings.date >= since)
+        ranked = ranked.subquery()
+        
+        window_end = case(
+            (ranked.c.cnt < MILEAGE_WINDOW_SIZE, ranked.c.cnt),
+            else_=MILEAGE_WINDOW_SIZE
+        )
+        rows = db.session.query(ranked).filter(
+            or_(ranked.c.rn == 1, ranked.c.rn == window_end)
+        ).all()
+        
+        edges = {}
+        for row in rows:
+            first, last = edges.get(row.vehicle_id, (None, None))
+            if row.rn == 1:
+                last = row
+            if row.rn == min(row.cnt, MILEAGE_WINDOW_SIZE):
+                first = row
+            edges[row.vehicle_id] = (first, last)
+        
+        for vehicle_id, (first, last) in edges.items():
+            windows[vehicle_id] = MileageWindow(
+                first.date, first.mileage, last.date, last.mileage,
+                min(last.cnt, MILEAGE_WINDOW_SIZE)
+            )
+    
+    return windows
+
+def _load_mileage_windows(vehicle_ids):
+    """
+    Загрузка окна журнала пробега из таблицы MileageStats (одно обращение по
+    первичному ключу на порцию ID). Для ТС без статистики окно считается по журналу.
+    Возвращает {vehicle_id: MileageWindow}
+    """
+    vehicle_ids = list(vehicle_ids)
+    windows = {}
+    
+    for chunk in chunks(vehicle_ids):
+        rows = MileageStats.query.filter(MileageStats.vehicle_id.in_(chunk)).all()
+        for stats in rows:
+            windows[stats.vehicle_id] = MileageWindow(
+                stats.first_date, stats.first_mileage,
+                stats.last_date, stats.last_mileage, stats.count
+            )
+    
+    missing = [vehicle_id for vehicle_id in vehicle_ids if vehicle_id not in windows]
+    if missing:
+        windows.update(_scan_mileage_windows(missing))
+    
+    return windows
+
+def update_mileage_stats(mileage_log):
+    """
+    Инкрементальное обновление статистики пробега при добавлении записи в журнал.
+    Запись должна быть уже добавлена в сессию; коммит выполняет вызывающий код.
+    Записи задним числом и ТС без статистики пересчитываются по журналу
+    """
+    db.session.flush()
+    stats = db.session.get(MileageStats, mileage_log.vehicle_id)
+    
+    if stats is None or stats.count == 0 or mileage_log.date < stats.last_date:
+        rebuild_mileage_stats([mileage_log.vehicle_id])
+        return
+    
+    days = (mileage_log.date - stats.last_date).days
+    if days > 0:
+        rate = (mileage_log.mileage - stats.last_mileage) / days
+        if stats.ewma_daily_mileage is None:
+            stats.ewma_daily_mileage = rate
+        else:
+            stats.ewma_daily_mileage = MILEAGE_EWMA_ALPHA * rate + (1 - MILEAGE_EWMA_ALPHA) * stats.ewma_daily_mileage
+    
+    stats.last_date = mileage_log.date
+    stats.last_mileage = mileage_log.mileage
+    
+    if stats.count < MILEAGE_WINDOW_SIZE:
+        stats.count += 1
+    else:
+        # Окно сдвигается: новой самой старой записью становится MILEAGE_WINDOW_SIZE-я с конца
+        first = db.session.query(MileageReadings.date, MileageReadings.mileage)\
+            .filter(MileageReadings.vehicle_id == mileage_log.vehicle_id)\
+            .order_by(MileageReadings.date.desc(), MileageReadings.id.desc())\
+            .offset(MILEAGE_WINDOW_SIZE - 1).first()
+        stats.first_date = first.date
+        stats.first_mileage = first.mileage
+
+def get_last_mileage_readings(vehicle_ids):
+    """
+    Последние записи журнала пробега: {vehicle_id: (date, mileage)}.
+    ТС без записей в результат не попадают
+    """
+    return {
+        vehicle_id: (window.last_date, window.last_mileage)
+        for vehicle_id, window in _load_mileage_windows(vehicle_ids).items()
+        if window.count
+    }
+
+def update_mileage_stats_batch(readings):
+    """
+    Пакетное обновление статистики пробега после вставки новых записей журнала.
+    readings - {vehicle_id: [(date, mileage), ...]} в хронологическом порядке, все записи
+    не старше последней учтенной. Статистика читается и записывается без загрузки
+    объектов в сессию (один UPDATE по первичному ключу на порцию).
+    ТС без статистики пересчитываются по журналу
+    """
+    columns = (MileageStats.vehicle_id, MileageStats.first_date, MileageStats.first_mileage,
+               MileageStats.last_date, MileageStats.last_mileage, MileageStats.count,
+               MileageStats.ewma_daily_mileage)
+    stats_by_vehicle = {}
+    for chunk in chunks(readings):
+        for row in db.session.query(*columns).filter(MileageStats.vehicle_id.in_(chunk)):
+            stats_by_vehicle[row.vehicle_id] = row._asdict()
+    
+    now = datetime.utcnow()
+    missing, sliding = [], []
+    for vehicle_id, vehicle_readings in readings.items():
+        stats = stats_by_vehicle.get(vehicle_id)
+        if stats is None or stats['count'] == 0:
+            stats_by_vehicle.pop(vehicle_id, None)
+            missing.append(vehicle_id)
+            continue
+        
+        ewma, last_date, last_mileage = stats['ewma_daily_mileage'], stats['last_date'], stats['last_mileage']
+        for reading_date, mileage in vehicle_readings:
+            days = (reading_date - last_date).days
+            if days > 0:
+                rate = (mileage - last_mileage) / days
+                ewma = rate if ewma is None else MILEAGE_EWMA_ALPHA * rate + (1 - MILEAGE_EWMA_ALPHA) * ewma
+            last_date, last_mileage = reading_date, mileage
+        stats.update(ewma_daily_mileage=ewma, last_date=last_date, last_mileage=last_mileage, updated_at=now)
+        
+        count = stats['count'] + len(vehicle_readings)
+        if count <= MILEAGE_WINDOW_SIZE:
+            stats['count'] = count
+        elif len(vehicle_readings) >= MILEAGE_WINDOW_SIZE:
+            # Окно целиком состоит из новых записей
+            stats['first_date'], stats['first_mileage'] = vehicle_readings[-MILEAGE_WINDOW_SIZE]
+            stats['count'] = MILEAGE_WINDOW_SIZE
+        else:
+            sliding.append(vehicle_id)
+    
+    # Начало сдвинутого окна берется из журнала одним оконным запросом на порцию ID.
+    # Новое окно лежит внутри старого и новых записей, поэтому история раньше
+    # начала старых окон не просматривается
+    if sliding:
+        since = min(stats_by_vehicle[vehicle_id]['first_date'] for vehicle_id in sliding)
+        for vehicle_id, window in _scan_mileage_windows(sliding, since).items():
+            stats_by_vehicle[vehicle_id].update(
+                first_date=window.first_date, first_mileage=window.first_mileage, count=MILEAGE_WINDOW_SIZE
+            )
+    
+    if stats_by_vehicle:
+        db.session.execute(update(MileageStats), list(stats_by_vehicle.values()))
+    if missing:
+        rebuild_mileage_stats(missing)
+
+def _ewma_from_history(vehicle_ids):
+    """
+    Расчет экспоненциально взвешенного среднесуточного пробега по полной истории
+    журнала (потоковое чтение без загрузки таблицы в память)
+    """
+    result = {}
+    
+    for chunk in chunks(vehicle_ids):
+        rows = db.session.query(MileageReadings.vehicle_id, MileageReadings.date, MileageReadings.mileage)\
+            .filter(MileageReadings.vehicle_id.in_(chunk))\
+            .order_by(MileageReadings.vehicle_id, MileageReadings.date, MileageReadings.id)\
+            .yield_per(5000)
+        
+        prev = None
+        for row in rows:
+            if prev is not None and prev.vehicle_id == row.vehicle_id:
+                days = (row.date - prev.date).days
+                if days > 0:
+                    rate = (row.mileage - prev.mileage) / days
+                    ewma = result.get(row.vehicle_id)
+                    result[row.vehicle_id] = rate if ewma is None else \
+                        MILEAGE_EWMA_ALPHA * rate + (1 - MILEAGE_EWMA_ALPHA) * ewma
+            prev = row
+    
+    return result
+
+def rebuild_mileage_stats(vehicle_ids=None):
+    """
+    Пересчет статистики пробега по полной истории журнала (исправление расхождений).
+    Без vehicle_ids пересчитываются все ТС. Возвращает число обработанных ТС
+    """
+    if vehicle_ids is None:
+        vehicle_ids = [row.id for row in db.session.query(Vehicle.id)]
+    vehicle_ids = list(vehicle_ids)
+    
+    windows = _scan_mileage_windows(vehicle_ids)
+    ewma = _ewma_from_history(vehicle_ids)
+    
+    for chunk in chunks(vehicle_ids):
+        MileageStats.query.filter(MileageStats.vehicle_id.in_(chunk))\
+            .delete(synchronize_session=False)
+    db.session.expire_all()
+    
+    rows = []
+    for vehicle_id in vehicle_ids:
+        window = windows.get(vehicle_id)
+        rows.append({
+            'vehicle_id': vehicle_id,
+            'first_date': window.first_date if window else None,
+            'first_mileage': window.first_mileage if window else None,
+            'last_date': window.last_date if window else None,
+            'last_mileage': window.last_mileage if window else None,
+            'count': window.count if window else 0,
+            'ewma_daily_mileage': ewma.get(vehicle_id),
+            'updated_at': datetime.utcnow()
+        })
+    
+    if rows:
+        db.session.execute(insert(MileageStats), rows)
+    
+    return len(rows)
+
+def _load_last_maintenance(vehicle_ids):
     """
-    vehicle = Vehicle.query.get(vehicle_id)
-    if not vehicle:
-        return None
+    Загрузка последнего ТО для набора ТС одним оконным запросом на каждую порцию ID.
+    Возвращает {vehicle_id: запись (date, mileage, next_maintenance_km)}
+    """
+    result = {}
     
-    # Получаем последнее ТО
-    last_maintenance = Maintenance.query.filter_by(vehicle_id=vehicle_id)\
-        .order_by(Maintenance.date.desc()).first()
+    for chunk in chunks(vehicle_ids):
+        ranked = db.session.query(
+            Maintenance.vehicle_id.label('vehicle_id'),
+            Maintenance.date.label('date'),
+            Maintenance.mileage.label('mileage'),
+            Maintenance.next_maintenance_km.label('next_maintenance_km'),
+            func.row_number().over(
+                partition_by=Maintenance.vehicle_id,
+                order_by=(Maintenance.date.desc(), Maintenance.id.desc())
+            ).label('rn')
+        ).filter(Maintenance.vehicle_id.in_(chunk)).subquery()
+        
+        for row in db.session.query(ranked).filter(ranked.c.rn == 1):
+            result[row.vehicle_id] = row
     
+    return result
+
+def calculate_daily_mileage_batch(vehicle_ids):
+    """
+    Пакетный расчет среднесуточного пробега.
+    Возвращает {vehicle_id: км/сутки}
+    """
+    vehicle_ids = list(vehicle_ids)
+    windows = _load_mileage_windows(vehicle_ids)
+    return {
+        vehicle_id: _daily_mileage_from_window(windows.get(vehicle_id))
+        for vehicle_id in vehicle_ids
+    }
+
+def calculate_daily_mileage(vehicle_id):
+    """
+    Расчет среднесуточного пробега на основе последних записей в журнале пробега
+    """
+    return calculate_daily_mileage_batch([vehicle_id])[vehicle_id]
+
+def _compute_prediction(vehicle, last_maintenance, daily_mileage, today):
+    """
+    Прогноз для одного ТС по уже загруженным данным (без обращений к БД)
+    """
     # Периодичность ТО
     maintenance_interval_km = 10000
     maintenance_interval_days = 180
@@ -69,16 +391,13 @@ def predict_next_maintenance(vehicle_id):
     if remaining_km <= 0:
         # ТО уже просрочено
         return {
-            'predicted_date': date.today().isoformat(),
+            'predicted_date': today.isoformat(),
             'predicted_mileage': vehicle.current_mileage,
             'is_overdue': True,
             'days_remaining': 0,
             'km_remaining': 0
         }
     
-    # Рассчитываем среднесуточный пробег
-    daily_mileage = calculate_daily_mileage(vehicle_id)
-    
     if daily_mileage > 0:
         days_by_mileage = remaining_km / daily_mileage
     else:
@@ -87,7 +406,7 @@ def predict_next_maintenance(vehicle_id):
     
     # Расчет по времени (от последнего ТО или от текущей даты)
     if last_maintenance:
-        days_since_maintenance = (date.today() - last_maintenance.date).days
+        days_since_maintenance = (today - last_maintenance.date).days
         days_by_time = maintenance_interval_days - days_since_maintenance
     else:
         days_by_time = maintenance_interval_days
@@ -95,7 +414,7 @@ def predict_next_maintenance(vehicle_id):
     # Берем минимальное значение (что наступит раньше)
     days_remaining = min(days_by_mileage, days_by_time)
     
-    predicted_date = date.today() + timedelta(days=int(days_remaining))
+    predicted_date = today + timedelta(days=int(days_remaining))
     
     return {
         'predicted_date': predicted_date.isoformat(),
@@ -105,12 +424,83 @@ def predict_next_maintenance(vehicle_id):
         'km_remaining': remaining_km
     }
 
-def get_maintenance_status(vehicle_id):
+def _predict_batch(vehicle_ids):
     """
-    Получение статуса ТО для транспортного средства
+    Пакетный расчет прогноза и среднесуточного пробега.
+    Возвращает {vehicle_id: (прогноз, км/сутки)}
     """
-    prediction = predict_next_maintenance(vehicle_id)
+    vehicle_ids = list(dict.fromkeys(vehicle_ids))
+    if not vehicle_ids:
+        return {}
+    
+    vehicles = []
+    for chunk in chunks(vehicle_ids):
+        vehicles.extend(db.session.query(
+            Vehicle.id, Vehicle.initial_mileage, Vehicle.current_mileage
+        ).filter(Vehicle.id.in_(chunk)).all())
+    
+    found_ids = [v.id for v in vehicles]
+    last_maintenance = _load_last_maintenance(found_ids)
+    windows = _load_mileage_windows(found_ids)
+    today = date.today()
+    
+    result = {}
+    for vehicle in vehicles:
+        daily_mileage = _daily_mileage_from_window(windows.get(vehicle.id))
+        prediction = _compute_prediction(
+            vehicle, last_maintenance.get(vehicle.id), daily_mileage, today
+        )
+        result[vehicle.id] = (prediction, daily_mileage)
     
+    return result
+
+def predict_next_maintenance_batch(vehicle_ids):
+    """
+    Пакетное прогнозирование следующего ТО для набора ТС.
+    Данные загружаются фиксированным числом запросов (ТС, последнее ТО,
+    окно журнала пробега) на каждую порцию ID, независимо от размера парка.
+    Возвращает {vehicle_id: прогноз}; отсутствующие ТС в результат не попадают
+    """
+    return {
+        vehicle_id: prediction
+        for vehicle_id, (prediction, _) in _predict_batch(vehicle_ids).items()
+    }
+
+def get_prediction_summaries(vehicle_ids):
+    """
+    Прогноз, среднесуточный пробег и статус ТО для набора ТС с использованием
+    кэша прогнозов. Рассчитываются пакетно только отсутствующие в кэше ТС.
+    Возвращает {vehicle_id: {'prediction', 'daily_mileage', 'status'}}
+    """
+    vehicle_ids = list(dict.fromkeys(vehicle_ids))
+    summaries = prediction_cache.get_many(vehicle_ids)
+    
+    missing = [vehicle_id for vehicle_id in vehicle_ids if vehicle_id not in summaries]
+    for vehicle_id, (prediction, daily_mileage) in _predict_batch(missing).items():
+        summary = {
+            'prediction': prediction,
+            'daily_mileage': round(daily_mileage, 2),
+            'status': maintenance_status_from_prediction(prediction)
+        }
+        prediction_cache.set(vehicle_id, summary)
+        summaries[vehicle_id] = summary
+    
+    return summaries
+
+def predict_next_maintenance(vehicle_id):
+    """
+    Прогнозирование даты следующего ТО на основе:
+    - Последнего ТО
+    - Текущего пробега
+    - Среднесуточного пробега
+    - Периодичности ТО (10000 км или 180 дней)
+    """
+    return predict_next_maintenance_batch([vehicle_id]).get(vehicle_id)
+
+def maintenance_status_from_prediction(prediction):
+    """
+    Статус ТО по готовому прогнозу
+    """
     if not prediction:
         return 'unknown'
     
@@ -126,3 +516,12 @@ def get_maintenance_status(vehicle_id):
     else:
         return 'normal'
 
+def get_maintenance_status(vehicle_id, prediction=None):
+    """
+    Получение статуса ТО для транспортного средства.
+    Если прогноз уже рассчитан (например, пакетно), он передается в prediction
+    """
+    if prediction is None:
+        prediction = predict_next_maintenance(vehicle_id)
+    
+    return maintenance_status_from_prediction(prediction)
@@ -0,0 +1,132 @@
+import hashlib
+import re
+from datetime import date, datetime
+from functools import wraps
+from flask import current_app, make_response, request
+from sqlalchemy import event, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import Pool
+from app import db
+from app.models import DataVersion
+
+# Таблицы, от которых зависит прогноз ТО
+PREDICTION_TABLES = ('vehicles', 'maintenance', 'mileage_logs', 'mileage_rollups', 'mileage_stats')
+
+_WRITE_STATEMENT = re.compile(
+    r'^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM|DROP\s+TABLE(?:\s+IF\s+EXISTS)?)\s+"?(\w+)"?',
+    re.IGNORECASE
+)
+
+def _tracked_table(name):
+    tables = db.metadata.tables
+    if name in tables and name != DataVersion.__tablename__:
+        return name
+    # Секции журнала пробега (mileage_logs_y2024m01, mileage_logs_default)
+    for table in tables:
+        if name.startswith(table + '_') and table != DataVersion.__tablename__:
+            return table
+    return None
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_write(conn, cursor, statement, parameters, context, executemany):
+    match = _WRITE_STATEMENT.match(statement)
+    if match:
+        table = _tracked_table(match.group(1))
+        if table:
+            conn.info.setdefault('changed_tables', set()).add(table)
+
+@event.listens_for(Engine, 'rollback')
+def _forget_writes(conn):
+    conn.info.pop('changed_tables', None)
+
+@event.listens_for(Pool, 'checkin')
+def _forget_writes_on_checkin(dbapi_connection, connection_record):
+    # info живет вместе с соединением DBAPI и переходит к следующему владельцу
+    connection_record.info.pop('changed_tables', None)
+
+@event.listens_for(Session, 'before_commit')
+def _bump_versions(session):
+    """
+    Увеличение версий измененных в транзакции таблиц в той же транзакции:
+    новая версия становится видна одновременно с данными
+    """
+    if not session.in_transaction():
+        return
+    session.flush()
+    connection = session.connection()
+    tables = connection.info.pop('changed_tables', None)
+    if not tables:
+        return
+    now = datetime.utcnow()
+    versions = DataVersion.__table__
+    for name in sorted(tables):
+        result = connection.execute(
+            update(versions).where(versions.c.name == name)
+            .values(version=versions.c.version + 1, updated_at=now)
+        )
+        if result.rowcount:
+            continue
+        try:
+            with connection.begin_nested():
+                connection.execute(versions.insert().values(name=name, version=1, updated_at=now))
+        except IntegrityError:
+            # Строку вставила параллельная транзакция
+            connection.execute(
+                update(versions).where(versions.c.name == name)
+                .values(version=versions.c.version + 1, updated_at=now)
+            )
+
+def get_versions(tables):
+    """{таблица: (версия, время изменения)}; для неизменявшихся таблиц - (0, None)"""
+    rows = db.session.query(DataVersion.name, DataVersion.version, DataVersion.updated_at).filter(
+        DataVersion.name.in_(tables)
+    ).all()
+    versions = {name: (0, None) for name in tables}
+    versions.update((row.name, (row.version, row.updated_at)) for row in rows)
+    return versions
+
+def versioned(*tables, daily=False):
+    """
+    Условный GET по версиям таблиц: ETag строится из адреса запроса и версий
+    tables (daily - и текущей даты, для ответов с прогнозами), Last-Modified -
+    время последнего изменения. При совпадении If-None-Match / If-Modified-Since
+    возвращается 304 без выполнения обработчика. Версии увеличиваются при фиксации
+    транзакции, изменившей таблицу (см. _bump_versions)
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = get_versions(tables)
+            stamp = '|'.join(f'{name}:{versions[name][0]}' for name in tables)
+            if daily:
+                stamp += f'|{date.today().isoformat()}'
+            etag = hashlib.sha1(f'{request.full_path}|{stamp}'.encode('utf-8')).hexdigest()
+            modified = [updated_at for _, updated_at in versions.values() if updated_at]
+            last_modified = max(modified).replace(microsecond=0) if modified and not daily else None
+            
+            if request.if_none_match:
+                # Слабое сравнение: сжатые ответы отдаются со слабым ETag (app/compression.py)
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = bool(last_modified and request.if_modified_since
+                                    and last_modified <= request.if_modified_since.replace(tzinfo=None))
+            if not_modified:
+                response = make_response('', 304)
+                # 304 несет тот же валидатор, что и ответ 200: слабый, если согласовано сжатие
+                compression = current_app.extensions.get('compression')
+                response.set_etag(etag, weak=bool(compression and compression.weak_etag(current_app.json.mimetype)))
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.set_etag(etag)
+            
+            if last_modified:
+                response.last_modified = last_modified
+            # Клиент повторно проверяет ответ при каждом запросе
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,99 @@
+"""
+Бенчмарк подготовки писем о ТО: рендеринг тела и сборка MIME.
+Прежняя реализация (HTML в f-строке + MIMEMultipart.as_string) сравнивается
+с компилированными Jinja-шаблонами и заранее собранным MIME-каркасом.
+В режиме рассылки каждое письмо о ТС получают несколько получателей
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_email_render --messages 10000 --recipients 3
+"""
+import argparse
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from types import SimpleNamespace
+from app.email_utils import build_maintenance_notification, build_mime_message
+
+def legacy_build(vehicle, maintenance_date, days_remaining):
+    """Копия прежней build_maintenance_notification"""
+    subject = f"Напоминание: ТО для {vehicle.brand} {vehicle.model} ({vehicle.reg_number})"
+    color = '#F39C12' if days_remaining > 7 else '#E74C3C'
+    status_text = 'требуется в ближайшее время' if days_remaining <= 7 else 'приближается'
+    body_html = f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; background-color: #ECF0F1; padding: 20px;">
+        <div style="max-width: 600px; margin: 0 auto; background-color: #FFFFFF; padding: 30px; border-radius: 5px;">
+            <h2 style="color: #2C3E50; margin-top: 0;">Уведомление о техническом обслуживании</h2>
+            <p style="color: #2C3E50;">Техническое обслуживание {status_text} для следующего транспортного средства:</p>
+            <div style="background-color: #ECF0F1; padding: 15px; border-radius: 5px; margin: 20px 0;">
+                <p style="margin: 5px 0;"><strong>Марка/Модель:</strong> {vehicle.brand} {vehicle.model}</p>
+                <p style="margin: 5px 0;"><strong>Гос. номер:</strong> {vehicle.reg_number}</p>
+                <p style="margin: 5px 0;"><strong>VIN:</strong> {vehicle.vin}</p>
+                <p style="margin: 5px 0;"><strong>Текущий пробег:</strong> {vehicle.current_mileage:,} км</p>
+            </div>
+            <div style="background-color: {color}; color: #FFFFFF; padding: 15px; border-radius: 5px; margin: 20px 0;">
+                <p style="margin: 5px 0; font-size: 18px;"><strong>Дата ТО:</strong> {maintenance_date}</p>
+                <p style="margin: 5px 0;"><strong>Осталось дней:</strong> {days_remaining}</p>
+            </div>
+            <p style="color: #7F8C8D; font-size: 12px; margin-top: 30px;">
+                Это автоматическое уведомление от системы управления автопарком.
+            </p>
+        </div>
+    </body>
+    </html>
+    """
+    body_text = f"""
+    Уведомление о техническом обслуживании
+    
+    Техническое обслуживание {status_text} для:
+    Марка/Модель: {vehicle.brand} {vehicle.model}
+    Гос. номер: {vehicle.reg_number}
+    VIN: {vehicle.vin}
+    Текущий пробег: {vehicle.current_mileage:,} км
+    
+    Дата ТО: {maintenance_date}
+    Осталось дней: {days_remaining}
+    """
+    return subject, body_html, body_text
+
+def legacy_mime(from_email, to_email, subject, body_html, body_text):
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = from_email
+    msg['To'] = to_email
+    msg.attach(MIMEText(body_text, 'plain'))
+    msg.attach(MIMEText(body_html, 'html'))
+    return msg.as_string()
+
+def make_vehicles(count):
+    return [
+        SimpleNamespace(brand='Лада', model='Веста', reg_number=f'А{i % 1000:03d}ВС77',
+                        vin=f'XTA{i:014d}', current_mileage=10000 + i * 7)
+        for i in range(count)
+    ]
+
+def run(build, mime, vehicles, recipients):
+    started = time.perf_counter()
+    for i, vehicle in enumerate(vehicles):
+        subject, body_html, body_text = build(vehicle, '2026-11-01', i % 30)
+        for r in range(recipients):
+            mime('fleet@localhost', f'user{r}@localhost', subject, body_html, body_text)
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=10000, help='Число ТС (писем на получателя)')
+    parser.add_argument('--recipients', type=int, default=3)
+    args = parser.parse_args()
+    
+    vehicles = make_vehicles(args.messages)
+    print(f"{'recipients':>10} {'legacy, s':>10} {'templates, s':>13} {'us/msg legacy':>14} {'us/msg new':>11}")
+    for recipients in sorted({1, args.recipients}):
+        total = args.messages * recipients
+        legacy = run(legacy_build, legacy_mime, vehicles, recipients)
+        current = run(build_maintenance_notification, build_mime_message, vehicles, recipients)
+        print(f'{recipients:>10} {legacy:>10.2f} {current:>13.2f} '
+              f'{legacy / total * 1e6:>14.1f} {current / total * 1e6:>11.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Бенчмарк отчета по затратам и использованию парка (GET /api/reports/fleet):
+векторный расчет app.analytics.fleet_report (колонки в массивах NumPy) против
+наивного цикла по объектам ORM (показания, ТО и ремонты каждого ТС по отдельности).
+Результаты обоих путей сравниваются по ТС и по месяцам; наивный путь пропускается,
+если показаний за период больше --naive-max-rows.
+База заполняется заранее генератором (benchmarks.fleet_generator)
+
+Запуск из корня проекта:
+    python -m benchmarks.fleet_generator --vehicles 2000 --years 13.7 --log-interval 1 1 --database-url sqlite:///analytics_bench.db
+    python -m benchmarks.bench_fleet_analytics --database-url sqlite:///analytics_bench.db --days 365 5000
+"""
+import argparse
+import math
+import time
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import func
+from app import create_app, db
+from app.analytics import fleet_report, np
+from app.models import Vehicle, Maintenance, Repair
+from app.utils import MileageReadings
+from config import Config
+
+def naive_report(first_day, last_day):
+    """
+    Те же показатели циклом по объектам ORM: {vehicle_id: показатели}, {месяц: (ТО, ремонты)}
+    """
+    vehicles = {}
+    monthly = defaultdict(lambda: [0.0, 0.0])
+    for vehicle in Vehicle.query.order_by(Vehicle.id).all():
+        readings = db.session.query(MileageReadings).filter(
+            MileageReadings.vehicle_id == vehicle.id, MileageReadings.date.between(first_day, last_day)
+        ).all()
+        days = {}
+        for reading in readings:
+            low, high = days.get(reading.date, (reading.mileage, reading.mileage))
+            days[reading.date] = (min(low, reading.mileage), max(high, reading.mileage))
+        active = 0
+        previous_max = None
+        for day in sorted(days):
+            low, high = days[day]
+            if high > low or (previous_max is not None and high > previous_max):
+                active += 1
+            previous_max = high
+        distance = max(h for _, h in days.values()) - min(l for l, _ in days.values()) if days else 0
+        
+        maintenance_cost = 0.0
+        for record in Maintenance.query.filter(Maintenance.vehicle_id == vehicle.id,
+                                               Maintenance.date.between(first_day, last_day)):
+            maintenance_cost += float(record.cost or 0)
+            monthly[record.date.strftime('%Y-%m')][0] += float(record.cost or 0)
+        
+        repair_cost = 0.0
+        downtime = set()
+        for repair in Repair.query.filter(Repair.vehicle_id == vehicle.id, Repair.start_date <= last_day):
+            end = repair.end_date or last_day
+            if end < first_day:
+                continue
+            if repair.start_date >= first_day:
+                repair_cost += float(repair.cost or 0)
+                monthly[repair.start_date.strftime('%Y-%m')][1] += float(repair.cost or 0)
+            day = max(repair.start_date, first_day)
+            while day <= min(end, last_day):
+                downtime.add(day)
+                day += timedelta(days=1)
+        
+        available = max((last_day - max(vehicle.purchase_date, first_day)).days + 1 - len(downtime), 0)
+        vehicles[vehicle.id] = {
+            'distance_km': distance, 'maintenance_cost': maintenance_cost, 'repair_cost': repair_cost,
+            'active_days': active, 'downtime_days': len(downtime), 'available_days': available
+        }
+        db.session.expunge_all()
+    return vehicles, monthly
+
+def same(report, naive):
+    """Совпадение векторного отчета с наивным расчетом (суммы - до копеек)"""
+    vehicles, monthly = naive
+    for row in report['vehicles']:
+        expected = vehicles.pop(row['vehicle_id'])
+        for key, value in expected.items():
+            if not math.isclose(row[key], value, abs_tol=0.011):
+                return f"NO (vehicle {row['vehicle_id']}, {key}: {row[key]} != {value})"
+    if vehicles:
+        return f'NO (missing vehicles {sorted(vehicles)[:5]})'
+    for row in report['monthly']:
+        maintenance, repairs = monthly.get(row['month'], (0, 0))
+        if not (math.isclose(row['maintenance_cost'], maintenance, abs_tol=0.011)
+                and math.isclose(row['repair_cost'], repairs, abs_tol=0.011)):
+            return f"NO (month {row['month']})"
+    return 'yes'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, nargs='+', default=[30, 365, 5000], help='Длина периода отчета')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--naive-max-rows', type=int, default=1000000,
+                        help='Наивный путь только при числе показаний за период не больше')
+    parser.add_argument('--database-url', default='sqlite:///fleet_bench.db')
+    args = parser.parse_args()
+    if np is None:
+        raise SystemExit('numpy не установлен: векторный отчет недоступен')
+    
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url
+        NOTIFICATION_WORKER_ENABLED = False
+    
+    app = create_app(BenchConfig)
+    print(f"{'days':>6}{'readings':>11}{'vehicles':>10}{'vector, s':>11}{'naive, s':>10}{'speedup':>9}  same")
+    with app.app_context():
+        last_day = db.session.query(func.max(MileageReadings.date)).scalar()
+        if last_day is None:
+            raise SystemExit('База пуста: заполните ее benchmarks.fleet_generator')
+        for days in args.days:
+            first_day = last_day - timedelta(days=days - 1)
+            readings = db.session.query(func.count()).select_from(MileageReadings).filter(
+                MileageReadings.date.between(first_day, last_day)
+            ).scalar()
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                report = fleet_report(first_day, last_day)
+                timings.append(time.perf_counter() - started)
+            vector = min(timings)
+            naive, speedup, result = '-', '-', '-'
+            if readings <= args.naive_max_rows:
+                started = time.perf_counter()
+                expected = naive_report(first_day, last_day)
+                elapsed = time.perf_counter() - started
+                naive, speedup, result = f'{elapsed:.2f}', f'{elapsed / vector:.1f}x', same(report, expected)
+            print(f"{days:>6}{readings:>11}{report['totals']['vehicles']:>10}{vector:>11.2f}{naive:>10}{speedup:>9}  {result}")
+
+if __name__ == '__main__':
+    main()
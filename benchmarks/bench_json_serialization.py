@@ -0,0 +1,122 @@
+"""
+Бенчмарк сериализации списочных ответов: прежний путь (объекты моделей, to_dict()
+и стандартный json) против кортежей колонок с преобразованием по колонкам
+(serialize_tuples) и стандартным json или orjson (если установлен).
+Время делится на выборку из БД, построение словарей и кодирование JSON;
+тело ответа каждого пути сравнивается с прежним (bytes - побайтно, content -
+после разбора JSON).
+ВНИМАНИЕ: таблицы указанной базы пересоздаются
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_json_serialization --rows 1000 10000 50000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import insert
+from app import create_app, db
+from app.models import Vehicle, VehicleType, Maintenance, MaintenanceType, MileageLog
+from app.serialization import orjson, OrjsonProvider, serialize_tuples
+from config import Config
+
+def fill(count, seed=42):
+    rnd = random.Random(seed)
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(Vehicle), [{
+        'id': 1, 'brand': 'КАМАЗ', 'model': '5490', 'year': 2020, 'vin': 'XTC00000000000001', 'reg_number': 'Т000001',
+        'purchase_date': date(2020, 1, 1), 'initial_mileage': 0, 'current_mileage': 0,
+        'vehicle_type': VehicleType.TRUCK, 'status': 'active'
+    }])
+    start = date.today() - timedelta(days=count)
+    db.session.execute(insert(Maintenance), [
+        {'vehicle_id': 1, 'type': rnd.choice(list(MaintenanceType)), 'date': start + timedelta(days=i),
+         'mileage': i * 100, 'cost': Decimal(rnd.randint(0, 500000)) / 100,
+         'description': rnd.choice(['Замена масла', 'Плановое ТО', None]),
+         'next_maintenance_km': rnd.choice([None, i * 100 + 10000])}
+        for i in range(count)
+    ])
+    db.session.execute(insert(MileageLog), [
+        {'vehicle_id': 1, 'date': start + timedelta(days=i), 'mileage': i * 100,
+         'driver': rnd.choice(['Петров П.П.', 'Сидоров С.С.', None]), 'notes': None}
+        for i in range(count)
+    ])
+    db.session.commit()
+
+def legacy_path(model, provider):
+    started = time.perf_counter()
+    rows = model.query.order_by(model.id).all()
+    fetched = time.perf_counter()
+    items = [row.to_dict() for row in rows]
+    built = time.perf_counter()
+    body = provider.dumps(items, separators=(',', ':'))
+    return body, (fetched - started, built - fetched, time.perf_counter() - built)
+
+def tuples_path(model, provider):
+    columns = [getattr(model, f) for f in model.API_FIELDS]
+    started = time.perf_counter()
+    rows = db.session.query(*columns).order_by(model.id).all()
+    fetched = time.perf_counter()
+    items = serialize_tuples(columns, rows, model.API_FIELDS)
+    built = time.perf_counter()
+    body = provider.dumps(items, separators=(',', ':'))
+    return body, (fetched - started, built - fetched, time.perf_counter() - built)
+
+def best(path, model, provider, repeat):
+    # Сессия очищается перед каждым замером: объекты моделей загружаются заново
+    results = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        results.append(path(model, provider))
+    return min(results, key=lambda result: sum(result[1]))
+
+def same(body, baseline_body):
+    if body == baseline_body:
+        return 'bytes'
+    return 'content' if json.loads(body) == json.loads(baseline_body) else 'NO'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--database-url', default='sqlite:///json_bench.db')
+    args = parser.parse_args()
+    
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url
+        NOTIFICATION_WORKER_ENABLED = False
+    
+    app = create_app(BenchConfig)
+    paths = [
+        ('to_dict+json', legacy_path, DefaultJSONProvider(app)),
+        ('tuples+json', tuples_path, DefaultJSONProvider(app)),
+    ]
+    if orjson is not None:
+        # orjson выбирается только без экранирования не-ASCII: тело в UTF-8, совпадает по содержимому
+        paths.append(('tuples+orjson', tuples_path, OrjsonProvider(app)))
+    else:
+        print('orjson не установлен: путь tuples+orjson пропущен')
+    
+    print(f"{'model':<12}{'rows':>8}  {'path':<15}{'fetch, ms':>10}{'build, ms':>10}{'encode, ms':>11}"
+          f"{'total, ms':>10}{'speedup':>8}{'MB':>6}  same")
+    with app.app_context():
+        for count in args.rows:
+            fill(count)
+            for model in (Maintenance, MileageLog):
+                baseline_body, baseline_total = None, None
+                for name, path, provider in paths:
+                    body, timings = best(path, model, provider, args.repeat)
+                    total = sum(timings)
+                    if baseline_body is None:
+                        baseline_body, baseline_total = body, total
+                    fetch, build, encode = (t * 1000 for t in timings)
+                    print(f'{model.__tablename__:<12}{count:>8}  {name:<15}{fetch:>10.1f}{build:>10.1f}{encode:>11.1f}'
+                          f'{total * 1000:>10.1f}{baseline_total / total:>7.1f}x{len(body) / 1e6:>6.1f}  '
+                          f'{same(body, baseline_body)}')
+
+if __name__ == '__main__':
+    main()
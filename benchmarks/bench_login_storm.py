@@ -0,0 +1,97 @@
+"""
+Поток входов (смена смены): пропускная способность /api/auth/login и задержки
+остальных эндпоинтов во время потока входов. Сравниваются проверка пароля в
+потоке запроса (LOGIN_HASH_WORKERS=0, прежнее поведение) и ограниченный пул
+хэширования. Для каждого режима приложение поднимается в процессе (как в
+benchmarks.load_test), замер идет в две фазы: только фоновые клиенты, затем
+фоновые клиенты вместе с клиентами, непрерывно выполняющими вход.
+Ограничение частоты входов в замере отключено (все клиенты с одного IP).
+
+Запуск из корня проекта:
+    python -m benchmarks.fleet_generator --vehicles 500
+    python -m benchmarks.bench_login_storm --login-clients 16 --hash-workers 2 --duration 10
+"""
+import argparse
+import http.client
+import threading
+import time
+from benchmarks.load_test import Budget, Client, login, load_vehicle_ids, parse_mix, start_server, summarize, worker
+
+def login_worker(base_url, username, password, deadline, results):
+    client = Client(base_url)
+    payload = {'username': username, 'password': password}
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status = client.request('POST', '/api/auth/login', payload)[0]
+            except (http.client.HTTPException, OSError):
+                status = 0
+            results.append(('login', time.perf_counter() - started, status))
+            if status == 503:
+                # Клиент повторяет попытку после паузы, как по Retry-After
+                time.sleep(0.05)
+    finally:
+        client.close()
+
+def run_phase(base_url, token, args, vehicle_ids, login_clients):
+    background, logins = [], []
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(base_url, token, args.mix, vehicle_ids, args.seed + i,
+                                              deadline, Budget(None), background))
+        for i in range(args.clients)
+    ]
+    threads += [
+        threading.Thread(target=login_worker, args=(base_url, args.username, args.password, deadline, logins))
+        for _ in range(login_clients)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    statuses = {}
+    for _, _, status in logins:
+        statuses[status] = statuses.get(status, 0) + 1
+    return summarize(background, elapsed)['total'], (summarize(logins, elapsed)['total'] if logins else None), statuses
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default='sqlite:///fleet_bench.db')
+    parser.add_argument('--clients', type=int, default=4, help='Фоновые клиенты')
+    parser.add_argument('--login-clients', type=int, default=16)
+    parser.add_argument('--hash-workers', type=int, default=2)
+    parser.add_argument('--max-pending', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('vehicle=2,maintenance=1,prediction=2'))
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='password123')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    modes = [('inline', 0), (f'pool({args.hash_workers})', args.hash_workers)]
+    print(f"{'mode':<10}{'phase':<10}{'other p50':>10}{'p95':>9}{'p99':>9}{'req/s':>8}"
+          f"{'login/s':>9}{'login p50':>10}{'p99':>9}  login statuses")
+    for name, workers in modes:
+        base_url, server = start_server(
+            args.database_url, LOGIN_HASH_WORKERS=workers, LOGIN_HASH_MAX_PENDING=args.max_pending,
+            LOGIN_RATE_LIMIT_USER_FAILURES=0, LOGIN_RATE_LIMIT_IP_ATTEMPTS=0
+        )
+        try:
+            token = login(base_url, args.username, args.password)
+            vehicle_ids = load_vehicle_ids(base_url, token)
+            for phase, login_clients in (('baseline', 0), ('storm', args.login_clients)):
+                other, logins, statuses = run_phase(base_url, token, args, vehicle_ids, login_clients)
+                line = (f"{name:<10}{phase:<10}{other['p50_ms']:>10.1f}{other['p95_ms']:>9.1f}{other['p99_ms']:>9.1f}"
+                        f"{other['throughput_rps']:>8.1f}")
+                if logins:
+                    line += (f"{logins['throughput_rps']:>9.1f}{logins['p50_ms']:>10.1f}{logins['p99_ms']:>9.1f}  "
+                             + ', '.join(f'{status}: {count}' for status, count in sorted(statuses.items())))
+                print(line)
+        finally:
+            server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Бенчмарк экспорта в PDF: export_to_pdf против постраничного export_to_pdf_paginated
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_pdf_export --rows 1000 10000 50000 200000
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from app.export_utils import export_to_pdf, export_to_pdf_paginated
+
+def make_rows(count, seed=42):
+    rnd = random.Random(seed)
+    start = date(2020, 1, 1)
+    mileage = 0
+    rows = []
+    for i in range(count):
+        mileage += rnd.randint(10, 500)
+        rows.append({
+            'id': i + 1,
+            'vehicle_id': rnd.randint(1, 500),
+            'date': (start + timedelta(days=i % 2000)).isoformat(),
+            'mileage': mileage,
+            'driver': rnd.choice(['Петров П.П.', 'Сидоров С.С.', 'Иванов И.И.'])
+        })
+    return rows
+
+def measure(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, len(result.getvalue())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 50000, 200000])
+    parser.add_argument('--workers', type=int, default=None, help='Число процессов (по умолчанию - по числу CPU)')
+    parser.add_argument('--legacy-max-rows', type=int, default=50000,
+                        help='Максимальный размер, на котором запускается export_to_pdf')
+    args = parser.parse_args()
+    
+    print(f"{'rows':>8} {'legacy, s':>10} {'paged, s':>10} {'parallel, s':>12} {'paged, MB':>10}")
+    for count in args.rows:
+        data = make_rows(count)
+        
+        legacy = '-'
+        if count <= args.legacy_max_rows:
+            legacy = f'{measure(export_to_pdf, data, "Benchmark")[0]:.2f}'
+        
+        paged, size = measure(export_to_pdf_paginated, data, 'Benchmark', parallel_min_rows=count + 1)
+        parallel, _ = measure(export_to_pdf_paginated, data, 'Benchmark',
+                              workers=args.workers, parallel_min_rows=0)
+        print(f'{count:>8} {legacy:>10} {paged:>10.2f} {parallel:>12.2f} {size / 1e6:>10.1f}')
+
+if __name__ == '__main__':
+    main()
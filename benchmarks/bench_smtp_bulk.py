@@ -0,0 +1,92 @@
+"""
+Бенчмарк массовой отправки писем: send_email (соединение на каждое письмо)
+против пула соединений SMTPSender.send_bulk.
+Письма принимает локальный отладочный SMTP-сервер, запускаемый в этом же процессе.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_smtp_bulk --messages 2000 --pool-sizes 1 2 4
+"""
+import argparse
+import socketserver
+import threading
+import time
+from app import create_app
+from app.email_utils import SMTPSender, send_email
+from config import Config
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Минимальный SMTP-сервер, принимающий и отбрасывающий письма"""
+    
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+    
+    def handle(self):
+        self.reply('220 localhost SMTP sink')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 localhost')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.received += 1
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    received = 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--pool-sizes', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+    
+    sink = SMTPSink(('127.0.0.1', 0), SMTPSinkHandler)
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    host, port = sink.server_address
+    
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        SMTP_HOST = host
+        SMTP_PORT = port
+        SMTP_USER = 'fleet@localhost'
+        SMTP_PASSWORD = ''
+        SMTP_USE_TLS = False
+    
+    app = create_app(BenchConfig)
+    messages = [
+        (f'driver{i}@localhost', f'Напоминание о ТО #{i}', f'<p>Сообщение {i}</p>', f'Сообщение {i}')
+        for i in range(args.messages)
+    ]
+    
+    with app.app_context():
+        started = time.perf_counter()
+        for message in messages:
+            send_email(*message)
+        elapsed = time.perf_counter() - started
+        print(f'send_email (connection per message): {len(messages) / elapsed:8.0f} msg/s')
+        
+        for pool_size in args.pool_sizes:
+            with SMTPSender.from_config(app.config, pool_size=pool_size,
+                                        max_messages_per_connection=len(messages)) as sender:
+                started = time.perf_counter()
+                errors = [e for e in sender.send_bulk(messages) if e is not None]
+                elapsed = time.perf_counter() - started
+            print(f'SMTPSender pool_size={pool_size}: {len(messages) / elapsed:8.0f} msg/s, errors: {len(errors)}')
+    
+    print(f'Received by sink: {sink.received}')
+    sink.shutdown()
+
+if __name__ == '__main__':
+    main()
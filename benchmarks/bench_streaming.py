@@ -0,0 +1,127 @@
+"""
+Бенчмарк ответа с полным журналом пробега одного ТС (GET /api/vehicles/<id>/mileage
+без limit): ответ, собранный в памяти (JSON_STREAM_CHUNK_SIZE=0), против потокового
+JSON-массива, без сжатия и со сжатием gzip / br. Для каждого режима измеряются время
+до заголовков и до первого байта тела (TTFB), полное время, объем переданных данных;
+с --trace-memory - пиковый объем памяти Python-объектов процесса (tracemalloc,
+замедляет замер). Приложение поднимается в процессе (как в benchmarks.load_test).
+ВНИМАНИЕ: таблицы указанной базы пересоздаются, если в ней нет журнала нужного размера
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_streaming --rows 1000000
+"""
+import argparse
+import http.client
+import time
+import tracemalloc
+import zlib
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+from sqlalchemy import func, insert
+from app import create_app, db
+from app.compression import brotli
+from app.models import User, UserRole, Vehicle, VehicleType, MileageLog
+from benchmarks.load_test import login, start_server
+from config import Config
+
+VEHICLE_ID = 1
+
+def prepare(database_url, count, per_day, batch_size=50000):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        NOTIFICATION_WORKER_ENABLED = False
+    
+    app = create_app(BenchConfig)
+    with app.app_context():
+        if db.session.query(func.count(MileageLog.id)).filter(MileageLog.vehicle_id == VEHICLE_ID).scalar() == count:
+            return
+        db.drop_all()
+        db.create_all()
+        admin = User(username='admin', email='admin@example.com', role=UserRole.ADMIN, full_name='Администратор')
+        admin.set_password('password123')
+        db.session.add(admin)
+        db.session.execute(insert(Vehicle), [{
+            'id': VEHICLE_ID, 'brand': 'КАМАЗ', 'model': '5490', 'year': 2020, 'vin': 'XTC00000000000001',
+            'reg_number': 'Т000001', 'purchase_date': date(2020, 1, 1), 'initial_mileage': 0,
+            'current_mileage': count, 'vehicle_type': VehicleType.TRUCK, 'status': 'active'
+        }])
+        start = date.today() - timedelta(days=count // per_day + 1)
+        for offset in range(0, count, batch_size):
+            db.session.execute(insert(MileageLog), [
+                {'vehicle_id': VEHICLE_ID, 'date': start + timedelta(days=i // per_day), 'mileage': i,
+                 'driver': 'Телематика', 'notes': None}
+                for i in range(offset, min(offset + batch_size, count))
+            ])
+        db.session.commit()
+
+def decompressor(encoding):
+    if encoding == 'gzip':
+        return zlib.decompressobj(31).decompress
+    if encoding == 'br':
+        return brotli.Decompressor().process
+    return lambda data: data
+
+def fetch(base_url, token, encoding):
+    """(до заголовков, до первого байта тела, полное время, байт передано, байт JSON)"""
+    connection = http.client.HTTPConnection(urlsplit(base_url).netloc, timeout=600)
+    headers = {'Authorization': f'Bearer {token}', 'Accept-Encoding': encoding or 'identity'}
+    try:
+        started = time.perf_counter()
+        connection.request('GET', f'/api/vehicles/{VEHICLE_ID}/mileage', headers=headers)
+        response = connection.getresponse()
+        headers_at = time.perf_counter() - started
+        if response.status != 200:
+            raise SystemExit(f'Request failed ({response.status}): {response.read()[:200]!r}')
+        decompress = decompressor(response.getheader('Content-Encoding'))
+        first_byte_at = None
+        transferred = size = 0
+        while True:
+            chunk = response.read1(65536)
+            if not chunk:
+                break
+            if first_byte_at is None:
+                first_byte_at = time.perf_counter() - started
+            transferred += len(chunk)
+            size += len(decompress(chunk))
+        return headers_at, first_byte_at, time.perf_counter() - started, transferred, size
+    finally:
+        connection.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--per-day', type=int, default=24, help='Показаний пробега в день')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='JSON_STREAM_CHUNK_SIZE потокового режима')
+    parser.add_argument('--encodings', nargs='+', default=['identity', 'gzip', 'br'])
+    parser.add_argument('--trace-memory', action='store_true', help='Пиковая память (tracemalloc)')
+    parser.add_argument('--database-url', default='sqlite:///streaming_bench.db')
+    args = parser.parse_args()
+    
+    prepare(args.database_url, args.rows, args.per_day)
+    encodings = [e for e in args.encodings if e != 'br' or brotli is not None]
+    if len(encodings) < len(args.encodings):
+        print('brotli не установлен: режим br пропущен')
+    
+    print(f"{'mode':<10}{'encoding':<10}{'headers, ms':>12}{'TTFB, ms':>10}{'total, s':>10}"
+          f"{'sent, MB':>10}{'JSON, MB':>10}" + (f"{'peak, MB':>10}" if args.trace_memory else ''))
+    for mode, chunk_size in (('buffered', 0), ('streamed', args.chunk_size)):
+        base_url, server = start_server(args.database_url, JSON_STREAM_CHUNK_SIZE=chunk_size)
+        try:
+            token = login(base_url, 'admin', 'password123')
+            for encoding in encodings:
+                if args.trace_memory:
+                    tracemalloc.start()
+                headers_at, first_byte_at, total, transferred, size = fetch(
+                    base_url, token, None if encoding == 'identity' else encoding
+                )
+                peak = ''
+                if args.trace_memory:
+                    peak = f'{tracemalloc.get_traced_memory()[1] / 1e6:>10.1f}'
+                    tracemalloc.stop()
+                print(f'{mode:<10}{encoding:<10}{headers_at * 1000:>12.1f}{first_byte_at * 1000:>10.1f}{total:>10.2f}'
+                      f'{transferred / 1e6:>10.1f}{size / 1e6:>10.1f}{peak}')
+        finally:
+            server.shutdown()
+
+if __name__ == '__main__':
+    main()
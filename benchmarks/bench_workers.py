@@ -0,0 +1,176 @@
+"""
+Масштабирование пропускной способности API по числу рабочих процессов сервера.
+Для каждого значения --workers запускается сервер (gunicorn -c gunicorn.conf.py
+wsgi:app, при отсутствии gunicorn - собственный prefork-сервер на werkzeug с тем же
+числом процессов), затем клиенты из нескольких процессов нагружают смесь
+эндпоинтов app/routes.py (как в benchmarks.load_test). Выводятся запросы/с,
+p50/p95/p99 и ускорение относительно первого значения.
+Данные - база benchmarks.fleet_generator. На одном ядре рост не ожидается:
+рабочие процессы и клиенты делят процессор.
+
+Запуск из корня проекта:
+    python -m benchmarks.fleet_generator --vehicles 2000
+    python -m benchmarks.bench_workers --workers 1 2 4 8 --duration 20 --output workers.json
+"""
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from benchmarks.load_test import DEFAULT_MIX, Budget, Client, login, load_vehicle_ids, parse_mix, summarize, worker
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def serve_prefork(port, workers, database_url):
+    """
+    Prefork-сервер без gunicorn: общий слушающий сокет, приложение создается
+    в каждом дочернем процессе после fork
+    """
+    from werkzeug.serving import make_server
+    
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('127.0.0.1', port))
+    listener.listen(1024)
+    os.environ['DATABASE_URL'] = database_url
+    
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            from wsgi import app
+            server = make_server('127.0.0.1', port, app, threaded=True, fd=listener.fileno())
+            server.serve_forever()
+            os._exit(0)
+        children.append(pid)
+    
+    def stop(signum, frame):
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+        sys.exit(0)
+    
+    signal.signal(signal.SIGTERM, stop)
+    for pid in children:
+        os.waitpid(pid, 0)
+
+def start_server(kind, port, workers, threads, database_url):
+    env = dict(os.environ, DATABASE_URL=database_url, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+               GUNICORN_BIND=f'127.0.0.1:{port}')
+    if kind == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning', 'wsgi:app']
+    else:
+        command = [sys.executable, '-m', 'benchmarks.bench_workers', '--serve', str(port),
+                   '--workers', str(workers), '--database-url', database_url]
+    return subprocess.Popen(command, env=env, stderr=subprocess.DEVNULL)
+
+def wait_ready(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'Server exited with code {process.returncode}')
+        try:
+            client = Client(base_url)
+            client.request('GET', '/login')
+            client.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit('Server did not start in time')
+
+def client_process(args):
+    """Клиенты одного процесса: потоки с keep-alive соединениями"""
+    base_url, token, mix, vehicle_ids, seed, threads, duration, warmup = args
+    results = []
+    
+    def run(deadline, sink):
+        pool = [threading.Thread(target=worker, args=(base_url, token, mix, vehicle_ids, seed + i,
+                                                      deadline, Budget(None), sink))
+                for i in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+    
+    run(time.perf_counter() + warmup, [])
+    run(time.perf_counter() + duration, results)
+    return results
+
+def measure(base_url, args):
+    token = login(base_url, args.username, args.password)
+    vehicle_ids = load_vehicle_ids(base_url, token)
+    processes = min(args.client_processes, args.concurrency)
+    jobs = [
+        (base_url, token, args.mix, vehicle_ids, args.seed + i * 1000,
+         args.concurrency // processes + (i < args.concurrency % processes), args.duration, args.warmup)
+        for i in range(processes)
+    ]
+    with multiprocessing.Pool(processes) as pool:
+        results = [row for chunk in pool.map(client_process, jobs) for row in chunk]
+    return summarize(results, args.duration)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=4, help='Потоков в рабочем процессе (gunicorn gthread)')
+    parser.add_argument('--server', choices=['gunicorn', 'prefork'],
+                        default='gunicorn' if importlib.util.find_spec('gunicorn') else 'prefork')
+    parser.add_argument('--database-url', default='sqlite:///fleet_bench.db')
+    parser.add_argument('--concurrency', type=int, default=16, help='Одновременных клиентов')
+    parser.add_argument('--client-processes', type=int, default=max(1, min(4, os.cpu_count() or 1)))
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='password123')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Файл для сохранения результатов (JSON)')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.serve:
+        serve_prefork(args.serve, args.workers[0], args.database_url)
+        return
+    
+    # Относительный путь SQLite разрешается приложением в каталоге instance
+    print(f"server: {args.server}, threads per worker: {args.threads}, clients: {args.concurrency}, cpus: {os.cpu_count()}")
+    print(f"{'workers':>8}{'req/s':>10}{'speedup':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    runs = []
+    for workers in args.workers:
+        port = free_port()
+        process = start_server(args.server, port, workers, args.threads, args.database_url)
+        try:
+            base_url = f'http://127.0.0.1:{port}'
+            wait_ready(base_url, process)
+            summary = measure(base_url, args)
+        finally:
+            process.terminate()
+            process.wait()
+        
+        total = summary['total']
+        speedup = total['throughput_rps'] / runs[0]['endpoints']['total']['throughput_rps'] if runs else 1.0
+        print(f"{workers:>8}{total['throughput_rps']:>10.1f}{speedup:>8.2f}x{total['p50_ms']:>9.2f}"
+              f"{total['p95_ms']:>9.2f}{total['p99_ms']:>9.2f}{total['errors']:>8}")
+        runs.append({'workers': workers, 'endpoints': summary})
+    
+    if args.output:
+        report = {
+            'meta': {'server': args.server, 'threads': args.threads, 'concurrency': args.concurrency,
+                     'duration_s': args.duration, 'cpus': os.cpu_count(), 'mix': args.mix,
+                     'database_url': args.database_url},
+            'runs': runs,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'Results written to {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+"""
+Нагрузочный тест основных эндпоинтов API: параллельные клиенты (потоки с
+keep-alive соединениями) выполняют запросы по взвешенной смеси эндпоинтов.
+По каждому эндпоинту считаются p50/p95/p99 задержки и пропускная способность,
+результат сохраняется в JSON как базовая линия для сравнения между версиями.
+
+По умолчанию приложение поднимается в этом же процессе (многопоточный сервер
+werkzeug) поверх базы, заполненной benchmarks.fleet_generator; клиенты и сервер
+делят GIL, поэтому для абсолютных цифр запускайте приложение отдельно и
+передавайте --base-url.
+
+Запуск из корня проекта:
+    python -m benchmarks.fleet_generator --vehicles 2000
+    python -m benchmarks.load_test --concurrency 16 --duration 30 --output baseline.json
+    python -m benchmarks.load_test --mix vehicle=3,mileage=2,prediction=1 --compare baseline.json
+    python -m benchmarks.load_test --base-url http://127.0.0.1:5000 --requests 5000
+"""
+import argparse
+import http.client
+import json
+import logging
+import math
+import random
+import subprocess
+import threading
+import time
+from datetime import date, datetime
+from urllib.parse import urlsplit, quote
+
+# Эндпоинты: имя -> (метод, шаблон пути); {id} - случайное ТС
+ENDPOINTS = {
+    'vehicles': ('GET', '/api/vehicles?limit=100'),
+    'vehicle': ('GET', '/api/vehicles/{id}'),
+    'maintenance': ('GET', '/api/vehicles/{id}/maintenance?limit=50'),
+    'repairs': ('GET', '/api/vehicles/{id}/repairs?limit=50'),
+    'mileage': ('GET', '/api/vehicles/{id}/mileage?limit=30&fields=date,mileage'),
+    'prediction': ('GET', '/api/vehicles/{id}/prediction'),
+    'upcoming': ('GET', '/api/maintenance/upcoming'),
+    'maintenance_all': ('GET', '/api/maintenance/all?limit=50'),
+    'dashboard': ('GET', '/api/fleet/dashboard'),
+    'bundle': ('GET', '/api/vehicles/{id}/bundle'),
+    'export_mileage': ('GET', '/api/export/mileage?format=ndjson&vehicle_id={id}'),
+    'log_mileage': ('POST', '/api/vehicles/{id}/mileage'),
+}
+DEFAULT_MIX = 'vehicles=1,vehicle=3,maintenance=2,repairs=1,mileage=2,prediction=3,upcoming=1,maintenance_all=1'
+
+def parse_mix(value):
+    """Разбор смеси вида "vehicle=3,prediction=1" в {эндпоинт: вес}"""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}', expected one of: {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError('Mix must have a positive weight')
+    return mix
+
+def percentile(sorted_values, q):
+    """Перцентиль по ближайшему рангу"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+class Client:
+    """Клиент с постоянным соединением и собственным токеном"""
+    
+    def __init__(self, base_url, token=None):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=60)
+        self.prefix = parts.path.rstrip('/')
+        self.headers = {'Authorization': f'Bearer {token}'} if token else {}
+    
+    def request(self, method, path, payload=None):
+        headers = dict(self.headers)
+        body = None
+        if payload is not None:
+            body = json.dumps(payload)
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            # Соединение разорвано сервером - переподключаемся при следующем запросе
+            self.connection.close()
+            raise
+        return response.status, response.headers, data
+    
+    def close(self):
+        self.connection.close()
+
+def login(base_url, username, password):
+    client = Client(base_url)
+    try:
+        status, _, data = client.request('POST', '/api/auth/login', {'username': username, 'password': password})
+    finally:
+        client.close()
+    if status != 200:
+        raise SystemExit(f'Login failed ({status}): {data[:200]!r}')
+    return json.loads(data)['access_token']
+
+def load_vehicle_ids(base_url, token):
+    client = Client(base_url, token)
+    ids, cursor = [], None
+    try:
+        while True:
+            path = '/api/vehicles?limit=500&fields=id' + (f'&cursor={quote(cursor)}' if cursor else '')
+            status, headers, data = client.request('GET', path)
+            if status != 200:
+                raise SystemExit(f'Cannot list vehicles ({status}): {data[:200]!r}')
+            ids.extend(item['id'] for item in json.loads(data))
+            cursor = headers.get('X-Next-Cursor')
+            if not cursor:
+                break
+    finally:
+        client.close()
+    if not ids:
+        raise SystemExit('No vehicles found, generate a fleet with benchmarks.fleet_generator first')
+    return ids
+
+def worker(base_url, token, mix, vehicle_ids, seed, deadline, budget, results):
+    """Цикл одного клиента: записи (эндпоинт, задержка в секундах, статус)"""
+    rnd = random.Random(seed)
+    names, weights = zip(*((name, weight) for name, weight in mix.items() if weight > 0))
+    client = Client(base_url, token)
+    mileage = 10_000_000 + seed * 1_000_000
+    today = date.today().isoformat()
+    
+    try:
+        while time.perf_counter() < deadline and budget.acquire():
+            name = rnd.choices(names, weights)[0]
+            method, template = ENDPOINTS[name]
+            path = template.format(id=rnd.choice(vehicle_ids))
+            payload = None
+            if name == 'log_mileage':
+                mileage += rnd.randint(10, 500)
+                payload = {'date': today, 'mileage': mileage, 'driver': 'load-test'}
+            
+            started = time.perf_counter()
+            try:
+                status = client.request(method, path, payload)[0]
+            except (http.client.HTTPException, OSError):
+                status = 0
+            results.append((name, time.perf_counter() - started, status))
+    finally:
+        client.close()
+
+class Budget:
+    """Общий счетчик запросов для режима --requests"""
+    
+    def __init__(self, total):
+        self.remaining = total
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        if self.remaining is None:
+            return True
+        with self.lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+def summarize(results, elapsed):
+    """Сводка по эндпоинтам и итог: задержки в миллисекундах, пропускная способность в запросах/с"""
+    grouped = {}
+    for name, latency, status in results:
+        grouped.setdefault(name, []).append((latency, status))
+    grouped['total'] = [(latency, status) for _, latency, status in results]
+    
+    summary = {}
+    for name, samples in grouped.items():
+        latencies = sorted(latency * 1000 for latency, _ in samples)
+        errors = sum(1 for _, status in samples if not 200 <= status < 400)
+        summary[name] = {
+            'requests': len(samples),
+            'errors': errors,
+            'throughput_rps': round(len(samples) / elapsed, 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 3),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'max_ms': round(latencies[-1], 3),
+        }
+    return summary
+
+def print_summary(summary, baseline=None):
+    header = f"{'endpoint':<16}{'requests':>9}{'errors':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    if baseline:
+        header += f"{'p95 vs base':>13}"
+    print(header)
+    for name, row in sorted(summary.items(), key=lambda item: list(ENDPOINTS).index(item[0]) if item[0] in ENDPOINTS else len(ENDPOINTS)):
+        line = (f"{name:<16}{row['requests']:>9}{row['errors']:>7}{row['throughput_rps']:>9.1f}"
+                f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}")
+        base = (baseline or {}).get(name)
+        if base and base.get('p95_ms'):
+            line += f"{(row['p95_ms'] / base['p95_ms'] - 1) * 100:>+12.1f}%"
+        print(line)
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def start_server(database_url, **settings):
+    """
+    Приложение в фоновом потоке процесса, settings переопределяют настройки Config.
+    Возвращает (base_url, сервер)
+    """
+    from werkzeug.serving import make_server
+    from app import create_app
+    from config import Config
+    
+    class LoadTestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        NOTIFICATION_WORKER_ENABLED = False
+    
+    for key, value in settings.items():
+        setattr(LoadTestConfig, key, value)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, create_app(LoadTestConfig), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', help='Адрес запущенного приложения; без него приложение поднимается в процессе')
+    parser.add_argument('--database-url', default='sqlite:///fleet_bench.db',
+                        help='База для приложения в процессе (по умолчанию - база fleet_generator)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help='Длительность, секунд')
+    parser.add_argument('--requests', type=int, help='Общее число запросов (вместо ограничения по времени)')
+    parser.add_argument('--warmup', type=float, default=2, help='Прогрев перед замером, секунд')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'Веса эндпоинтов, по умолчанию {DEFAULT_MIX}; доступны: {", ".join(ENDPOINTS)}')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='password123')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Файл для сохранения результатов (JSON)')
+    parser.add_argument('--compare', help='Файл базовой линии для сравнения p95')
+    args = parser.parse_args()
+    
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        base_url, server = start_server(args.database_url)
+    
+    try:
+        token = login(base_url, args.username, args.password)
+        vehicle_ids = load_vehicle_ids(base_url, token)
+        
+        def run(deadline, budget):
+            results = []
+            threads = [
+                threading.Thread(target=worker, args=(base_url, token, args.mix, vehicle_ids, args.seed + i,
+                                                      deadline, budget, results))
+                for i in range(args.concurrency)
+            ]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return results, time.perf_counter() - started
+        
+        if args.warmup:
+            run(time.perf_counter() + args.warmup, Budget(None))
+        deadline = time.perf_counter() + (args.duration if args.requests is None else float('inf'))
+        results, elapsed = run(deadline, Budget(args.requests))
+    finally:
+        if server:
+            server.shutdown()
+    
+    summary = summarize(results, elapsed)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['endpoints']
+    print_summary(summary, baseline)
+    
+    if args.output:
+        report = {
+            'meta': {
+                'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+                'git_revision': git_revision(),
+                'base_url': args.base_url or f'in-process ({args.database_url})',
+                'vehicles': len(vehicle_ids),
+                'concurrency': args.concurrency,
+                'duration_s': round(elapsed, 3),
+                'mix': args.mix,
+                'seed': args.seed,
+            },
+            'endpoints': summary,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'Results written to {args.output}')
+
+if __name__ == '__main__':
+    main()
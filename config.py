@@ -8,11 +8,21 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     # Используем SQLite по умолчанию для простоты запуска
     DATABASE_URL = os.environ.get('DATABASE_URL')
-    if DATABASE_URL and DATABASE_URL.startswith('postgresql'):
+    if DATABASE_URL and DATABASE_URL.startswith(('postgresql', 'sqlite')):
         SQLALCHEMY_DATABASE_URI = DATABASE_URL
     else:
         SQLALCHEMY_DATABASE_URI = 'sqlite:///fleet.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool per worker process (SQLALCHEMY_ENGINE_OPTIONS are built from these in app.database)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 5)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 10)
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 30)  # seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 1800)  # seconds
+    DB_POOL_PRE_PING = (os.environ.get('DB_POOL_PRE_PING') or 'true').lower() == 'true'
+    DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT') or 10)  # seconds, PostgreSQL
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS') or 0)  # PostgreSQL, 0 - no limit (gunicorn.conf.py sets 30s)
+    SQLITE_WAL = (os.environ.get('SQLITE_WAL') or 'true').lower() == 'true'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS') or 5000)
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-change-in-production'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
@@ -22,11 +32,97 @@ class Config:
     SMTP_PORT = int(os.environ.get('SMTP_PORT') or 587)
     SMTP_USER = os.environ.get('SMTP_USER') or ''
     SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD') or ''
+    SMTP_USE_TLS = (os.environ.get('SMTP_USE_TLS') or 'true').lower() == 'true'
+    SMTP_TIMEOUT = int(os.environ.get('SMTP_TIMEOUT') or 30)  # seconds
+    SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE') or 2)  # Connections for bulk sends
+    SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.environ.get('SMTP_MAX_MESSAGES_PER_CONNECTION') or 100)
+    
+    # Notification outbox
+    NOTIFICATION_WORKER_ENABLED = (os.environ.get('NOTIFICATION_WORKER_ENABLED') or 'true').lower() == 'true'
+    NOTIFICATION_POLL_INTERVAL = int(os.environ.get('NOTIFICATION_POLL_INTERVAL') or 5)  # seconds
+    NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE') or 50)
+    NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS') or 5)
+    NOTIFICATION_RETRY_BASE_SECONDS = int(os.environ.get('NOTIFICATION_RETRY_BASE_SECONDS') or 30)
+    NOTIFICATION_LOCK_TIMEOUT = int(os.environ.get('NOTIFICATION_LOCK_TIMEOUT') or 600)  # seconds
+    
+    # Maintenance reminders (statuses that trigger a reminder when a vehicle enters them)
+    REMINDER_STATUSES = ('warning', 'urgent')
+    REMINDER_RECIPIENT_ROLES = ('admin', 'mechanic')
+    REMINDER_SCHEDULER_ENABLED = (os.environ.get('REMINDER_SCHEDULER_ENABLED') or 'false').lower() == 'true'
+    REMINDER_INTERVAL_SECONDS = int(os.environ.get('REMINDER_INTERVAL_SECONDS') or 3600)
+    
+    # Mileage log storage tiers: raw rows are kept for MILEAGE_RAW_RETENTION_DAYS (0 - forever),
+    # older data is rolled up into daily summaries, daily summaries older than
+    # MILEAGE_DAILY_RETENTION_DAYS into monthly ones (flask rollup-mileage-logs)
+    MILEAGE_RAW_RETENTION_DAYS = int(os.environ.get('MILEAGE_RAW_RETENTION_DAYS') or 0)
+    MILEAGE_DAILY_RETENTION_DAYS = int(os.environ.get('MILEAGE_DAILY_RETENTION_DAYS') or 730)
+    # PostgreSQL only: monthly partitions are created ahead by flask rollup-mileage-logs, which should
+    # be scheduled (e.g. daily) on a partitioned log even when MILEAGE_RAW_RETENTION_DAYS is 0
+    MILEAGE_PARTITION_MONTHS_AHEAD = int(os.environ.get('MILEAGE_PARTITION_MONTHS_AHEAD') or 3)
+    
+    # Request profiling: Server-Timing header, /metrics (Prometheus), N+1 detection,
+    # cProfile dumps of slow requests for a PROFILING_SAMPLE_RATE share of requests
+    PROFILING_ENABLED = (os.environ.get('PROFILING_ENABLED') or 'false').lower() == 'true'
+    PROFILING_METRICS_PATH = os.environ.get('PROFILING_METRICS_PATH') or '/metrics'
+    # Client addresses or networks allowed to read metrics (comma-separated, e.g. 10.0.0.0/8); counters are
+    # per worker process, so behind several gunicorn workers each scrape sees one worker's share of requests
+    PROFILING_METRICS_ALLOW = [a.strip() for a in (os.environ.get('PROFILING_METRICS_ALLOW') or '127.0.0.1,::1').split(',') if a.strip()]
+    PROFILING_N_PLUS_ONE_THRESHOLD = int(os.environ.get('PROFILING_N_PLUS_ONE_THRESHOLD') or 5)  # Identical statements per request
+    PROFILING_SLOW_REQUEST_MS = int(os.environ.get('PROFILING_SLOW_REQUEST_MS') or 500)
+    PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE') or 0)  # 0..1
+    PROFILING_PROFILE_DIR = os.environ.get('PROFILING_PROFILE_DIR') or ''  # Default: instance/profiles
+    
+    # JSON encoder for API responses: auto (orjson if installed, otherwise stdlib json), orjson, json
+    JSON_BACKEND = (os.environ.get('JSON_BACKEND') or 'auto').lower()
+    # Escape non-ASCII characters as \uXXXX (byte-identical to stdlib json); false - UTF-8 text, smaller
+    # responses. Unset: false with orjson (it cannot escape), true with stdlib json; true with auto selects stdlib json
+    JSON_ENSURE_ASCII = os.environ.get('JSON_ENSURE_ASCII')
+    if JSON_ENSURE_ASCII is not None:
+        JSON_ENSURE_ASCII = JSON_ENSURE_ASCII.lower() == 'true'
+    
+    # Rows per chunk of streamed JSON arrays (list endpoints without limit); 0 - build responses in memory
+    JSON_STREAM_CHUNK_SIZE = int(os.environ.get('JSON_STREAM_CHUNK_SIZE') or 1000)
+    
+    # Response compression negotiated via Accept-Encoding; br requires the optional brotli package
+    COMPRESSION_ENABLED = (os.environ.get('COMPRESSION_ENABLED') or 'true').lower() == 'true'
+    COMPRESSION_ENCODINGS = [e.strip() for e in (os.environ.get('COMPRESSION_ENCODINGS') or 'br,gzip').split(',') if e.strip()]  # In order of preference
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL') or 6)  # 1..9
+    COMPRESSION_BROTLI_LEVEL = int(os.environ.get('COMPRESSION_BROTLI_LEVEL') or 4)  # 0..11
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE') or 1024)  # bytes; streamed responses are always compressed
     
     # Google Maps API (optional)
     GOOGLE_MAPS_API_KEY = os.environ.get('GOOGLE_MAPS_API_KEY') or ''
     
+    # Prediction cache
+    PREDICTION_CACHE_ENABLED = (os.environ.get('PREDICTION_CACHE_ENABLED') or 'true').lower() == 'true'
+    PREDICTION_CACHE_TTL = int(os.environ.get('PREDICTION_CACHE_TTL') or 300)  # seconds
+    PREDICTION_CACHE_MAX_SIZE = int(os.environ.get('PREDICTION_CACHE_MAX_SIZE') or 10000)
+    # Import path of the backend class (must implement get_many/set/delete/clear)
+    PREDICTION_CACHE_BACKEND = os.environ.get('PREDICTION_CACHE_BACKEND') or 'app.cache.MemoryCacheBackend'
+    # Shared backend URL passed to the backend (app.cache.RedisCacheBackend, requires redis): with several
+    # worker processes the in-process backend of other workers keeps an entry up to PREDICTION_CACHE_TTL
+    PREDICTION_CACHE_URL = os.environ.get('PREDICTION_CACHE_URL') or ''
+    
+    # Password hashing: werkzeug method with cost; older hashes are upgraded on successful login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:600000'
+    # Login verification runs in a bounded thread pool (0 - on the request thread);
+    # requests beyond workers + max pending are rejected with 503
+    LOGIN_HASH_WORKERS = int(os.environ.get('LOGIN_HASH_WORKERS') or 2)
+    LOGIN_HASH_MAX_PENDING = int(os.environ.get('LOGIN_HASH_MAX_PENDING') or 16)
+    LOGIN_HASH_TIMEOUT = int(os.environ.get('LOGIN_HASH_TIMEOUT') or 10)  # seconds
+    # Login rate limits per window (0 - no limit): failed attempts per username, all attempts per IP
+    LOGIN_RATE_LIMIT_WINDOW = int(os.environ.get('LOGIN_RATE_LIMIT_WINDOW') or 60)  # seconds
+    LOGIN_RATE_LIMIT_USER_FAILURES = int(os.environ.get('LOGIN_RATE_LIMIT_USER_FAILURES') or 10)
+    LOGIN_RATE_LIMIT_IP_ATTEMPTS = int(os.environ.get('LOGIN_RATE_LIMIT_IP_ATTEMPTS') or 50)
+    # Number of reverse proxies in front of the app: the client address is taken from
+    # X-Forwarded-For (werkzeug ProxyFix). 0 - REMOTE_ADDR as is; behind a proxy without this
+    # setting all clients share the proxy address and the per-IP login limit
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR') or 0)
+    
+    # Account state (active flag, role) cache used by role checks
+    USER_STATE_CACHE_TTL = int(os.environ.get('USER_STATE_CACHE_TTL') or 30)  # seconds, 0 - disabled
+    USER_STATE_CACHE_MAX_SIZE = int(os.environ.get('USER_STATE_CACHE_MAX_SIZE') or 10000)
+    
     # Maintenance intervals (in km)
     MAINTENANCE_INTERVAL_KM = 10000  # Standard maintenance interval
     MAINTENANCE_INTERVAL_DAYS = 180  # Maximum days between maintenance
-
@@ -0,0 +1,38 @@
+"""
+Настройки gunicorn: gunicorn -c gunicorn.conf.py wsgi:app
+
+Число процессов и потоков задается переменными окружения WEB_CONCURRENCY и
+GUNICORN_THREADS. У каждого процесса свой пул соединений с БД (DB_POOL_SIZE +
+DB_MAX_OVERFLOW), поэтому суммарно сервер может открыть до
+WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW) соединений. Это значение должно
+укладываться в max_connections PostgreSQL. DB_POOL_SIZE не имеет смысла делать
+больше GUNICORN_THREADS: запрос занимает одно соединение.
+За обратным прокси (nginx) нужно задать PROXY_FIX_X_FOR - число прокси перед
+приложением, иначе все клиенты имеют адрес прокси и делят одно ограничение
+попыток входа по IP (LOGIN_RATE_LIMIT_IP_ATTEMPTS).
+Кэш прогнозов по умолчанию свой у каждого процесса: изменение, сделанное в другом
+процессе, видно не позже чем через PREDICTION_CACHE_TTL. Общий кэш -
+PREDICTION_CACHE_BACKEND=app.cache.RedisCacheBackend и PREDICTION_CACHE_URL.
+Метрики /metrics (PROFILING_ENABLED) тоже считаются в каждом процессе отдельно.
+"""
+import multiprocessing
+import os
+
+# Ограничение времени SQL-запроса только для веб-процессов: CLI-команды
+# (пересчет статистики, сводки журнала) работают без него
+os.environ.setdefault('DB_STATEMENT_TIMEOUT_MS', '30000')
+
+bind = os.environ.get('GUNICORN_BIND') or '0.0.0.0:5001'
+workers = int(os.environ.get('WEB_CONCURRENCY') or multiprocessing.cpu_count() * 2 + 1)
+threads = int(os.environ.get('GUNICORN_THREADS') or 4)
+worker_class = 'gthread'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT') or 60)
+graceful_timeout = 30
+keepalive = 5
+# Периодический перезапуск процессов ограничивает рост памяти
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS') or 2000)
+max_requests_jitter = max_requests // 10
+# Приложение создается в каждом процессе: пул соединений не разделяется после fork
+preload_app = False
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
@@ -1,10 +1,32 @@
 """
-Главный файл для запуска приложения
+Главный файл для запуска приложения (сервер разработки).
+Production: gunicorn -c gunicorn.conf.py wsgi:app (см. wsgi.py)
 """
+import os
 from app import create_app
+from app.notifications import start_outbox_worker
+from app.reminders import start_reminder_scheduler
 
 app = create_app()
 
+def start_background_jobs(app):
+    """
+    Фоновые потоки сервера разработки. Только при запуске python run.py: при импорте
+    (flask --app run <команда>) CLI-задачи работают без параллельного обработчика
+    """
+    # Фоновая отправка уведомлений из очереди (можно вместо этого запустить
+    # отдельный обработчик: flask --app run process-outbox --loop)
+    if app.config['NOTIFICATION_WORKER_ENABLED']:
+        start_outbox_worker(app)
+    
+    # Периодический расчет напоминаний о ТО (или по расписанию cron:
+    # flask --app run send-maintenance-reminders)
+    if app.config['REMINDER_SCHEDULER_ENABLED']:
+        start_reminder_scheduler(app)
+
 if __name__ == '__main__':
+    # Перезагрузчик (debug=True) запускает сервер в дочернем процессе с WERKZEUG_RUN_MAIN;
+    # родительский процесс только следит за файлами - потоки в нем не нужны
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_jobs(app)
     app.run(debug=True, host='0.0.0.0', port=5001)
-
@@ -3,6 +3,7 @@
 """
 from app import create_app, db
 from app.models import User, Vehicle, Maintenance, Repair, MileageLog, UserRole, VehicleType, MaintenanceType, RepairStatus
+from app.utils import rebuild_mileage_stats
 from datetime import datetime, date, timedelta
 import random
 
@@ -134,6 +135,9 @@ def seed_database():
         db.session.commit()
         print(f"Создано {mileage_logs_count} записей в журнале пробега")
         
+        rebuild_mileage_stats()
+        db.session.commit()
+        
         # Создание истории ТО за последние 2 года
         print("Создание истории ТО...")
         maintenance_count = 0
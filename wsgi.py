@@ -0,0 +1,12 @@
+"""
+Точка входа для production-сервера (WSGI):
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Рабочие процессы обслуживают только HTTP. Очередь уведомлений и напоминания
+о ТО запускаются отдельными процессами, а не в каждом рабочем процессе:
+    flask --app wsgi process-outbox --loop
+    flask --app wsgi send-maintenance-reminders   (по расписанию cron)
+"""
+from app import create_app
+
+app = create_app()